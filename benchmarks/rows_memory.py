@@ -0,0 +1,46 @@
+'''Compare the memory used by list-of-lists rows with compact rows.
+
+Usage: python benchmarks/rows_memory.py [nrows] [ncols]
+
+Only the row containers are counted (cell values are shared between the two
+layouts so are the same in both cases).
+'''
+import os
+import sys
+
+# run from a checkout: import datautil from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from datautil.tabular import TabularData
+from datautil.tabular.rows import compact
+
+
+def container_bytes(data):
+    return sys.getsizeof(data) + sum(sys.getsizeof(row) for row in data)
+
+def make_rows(nrows, ncols):
+    values = [ str(ii) for ii in range(ncols) ]
+    rows = []
+    for ii in xrange(nrows):
+        # build up rows by appending as csv.reader does
+        row = []
+        for value in values:
+            row.append(value)
+        rows.append(row)
+    return rows
+
+def main(nrows=1000000, ncols=10):
+    header = [ 'col%s' % ii for ii in range(ncols) ]
+    td = TabularData(data=make_rows(nrows, ncols), header=header)
+    lists = container_bytes(td.data)
+    compacted = container_bytes(compact(td).data)
+    print 'rows: %s columns: %s' % (nrows, ncols)
+    print 'list of lists: %10d bytes (%.1f per row)' % (lists,
+            float(lists) / nrows)
+    print 'compact rows:  %10d bytes (%.1f per row)' % (compacted,
+            float(compacted) / nrows)
+    print 'saving: %.1f%%' % (100.0 * (lists - compacted) / lists)
+
+if __name__ == '__main__':
+    main(*[ int(arg) for arg in sys.argv[1:] ])
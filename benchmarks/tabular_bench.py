@@ -0,0 +1,258 @@
+'''Benchmarks for the readers and writers in datautil.tabular.
+
+Usage::
+
+    # time everything on synthetic tables of 10k and 100k rows
+    python benchmarks/tabular_bench.py run 10000,100000 results.json
+
+    # only some benchmarks (names as in READERS / WRITERS)
+    python benchmarks/tabular_bench.py run 1000000 results.json CsvReader,CsvWriter
+
+    # compare two result files (exit status 1 if anything is more than
+    # 10% slower)
+    python benchmarks/tabular_bench.py compare old.json new.json 0.1
+
+Tables have mixed column types (int, float, string, date, bool). Each
+benchmark runs in a fresh process so that its peak RSS can be recorded.
+Results are written as JSON.
+
+XlsReader needs xlrd plus xlwt (to generate input) and is skipped for sizes
+beyond the xls row limit.
+'''
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import datetime
+import platform
+import resource
+import tempfile
+import multiprocessing
+
+# run from a checkout: import datautil from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import datautil.tabular as tabular
+from datautil.clitools import _main
+
+XLS_MAX_ROWS = 65535
+
+def _make_table(nrows, seed=0):
+    rnd = random.Random(seed)
+    header = [ 'id', 'amount', 'name', 'date', 'flag' ]
+    start = datetime.date(1990, 1, 1).toordinal()
+    data = [ [ ii,
+        round(rnd.uniform(-1e6, 1e6), 4),
+        'name %s' % rnd.randint(0, 10000),
+        datetime.date.fromordinal(start + rnd.randint(0, 10000)).isoformat(),
+        rnd.random() < 0.5,
+        ] for ii in xrange(nrows) ]
+    return tabular.TabularData(data=data, header=header)
+
+def _write_xls(table, path):
+    import xlwt
+    book = xlwt.Workbook()
+    sheet = book.add_sheet('data')
+    for rx, row in enumerate([ table.header ] + table.data):
+        for cx, value in enumerate(row):
+            sheet.write(rx, cx, value)
+    book.save(path)
+
+def _read(reader_cls, ext):
+    def bench(path):
+        reader = reader_cls()
+        mode = 'rb' if ext in ('xls', 'col') else 'r'
+        with open(path, mode) as fileobj:
+            table = reader.read(fileobj)
+            for row in table.data:
+                pass
+    return bench
+
+def _write(writer_cls):
+    def bench(table, path):
+        fileobj = open(path, 'wb')
+        writer_cls().write(table, fileobj)
+        fileobj.close()
+    return bench
+
+def _fanout(table, path):
+    # the usual release exports (to path.csv etc) in one pass
+    writers = [ (tabular.CsvWriter(), 'csv'), (tabular.JsonWriter(), 'json'),
+        (tabular.HtmlWriter(), 'html'), (tabular.LatexWriter(), 'tex') ]
+    outputs = [ (writer, open('%s.%s' % (path, ext), 'wb'))
+        for writer, ext in writers ]
+    tabular.FanoutWriter(outputs).write(table)
+    for writer, fileobj in outputs:
+        fileobj.close()
+
+# name: (file extension, benchmark function)
+READERS = {
+    'CsvReader': ('csv', _read(tabular.CsvReader, 'csv')),
+    'JsonReader': ('json', _read(tabular.JsonReader, 'json')),
+    'NdjsonReader': ('ndjson', _read(tabular.NdjsonReader, 'ndjson')),
+    'HtmlReader': ('html', _read(tabular.HtmlReader, 'html')),
+    'XlsReader': ('xls', _read(tabular.XlsReader, 'xls')),
+    'ColumnFileReader': ('col', _read(tabular.ColumnFileReader, 'col')),
+    }
+WRITERS = {
+    'CsvWriter': ('csv', _write(tabular.CsvWriter)),
+    'JsonWriter': ('json', _write(tabular.JsonWriter)),
+    'NdjsonWriter': ('ndjson', _write(tabular.NdjsonWriter)),
+    'HtmlWriter': ('html', _write(tabular.HtmlWriter)),
+    'LatexWriter': ('tex', _write(tabular.LatexWriter)),
+    'TxtWriter': ('txt', _write(tabular.TxtWriter)),
+    'ColumnFileWriter': ('col', _write(tabular.ColumnFileWriter)),
+    'FanoutWriter': ('out', _fanout),
+    }
+
+def _peak_rss_kb():
+    # ru_maxrss is in kilobytes on linux (bytes on mac os x)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss = rss // 1024
+    return rss
+
+def _child(name, nrows, workdir, queue):
+    try:
+        if name in READERS:
+            ext, func = READERS[name]
+            args = (os.path.join(workdir, 'input.%s' % ext),)
+        else:
+            ext, func = WRITERS[name]
+            args = (_make_table(nrows),
+                os.path.join(workdir, 'output-%s.%s' % (name, ext)))
+        setup_rss = _peak_rss_kb()
+        start = time.time()
+        func(*args)
+        seconds = time.time() - start
+        queue.put({
+            'name': name,
+            'rows': nrows,
+            'seconds': seconds,
+            'rows_per_sec': nrows / seconds if seconds else None,
+            'setup_rss_kb': setup_rss,
+            'peak_rss_kb': _peak_rss_kb(),
+            })
+    except Exception, inst:
+        queue.put({ 'name': name, 'rows': nrows, 'error': repr(inst) })
+
+def _run_one(name, nrows, workdir):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_child,
+            args=(name, nrows, workdir, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def _prepare_inputs(names, nrows, workdir):
+    '''Write the input files needed by the readers in names.
+
+    @return: names of readers which must be skipped (with reasons).
+    '''
+    table = _make_table(nrows)
+    skipped = {}
+    for name in names:
+        if name not in READERS:
+            continue
+        ext = READERS[name][0]
+        path = os.path.join(workdir, 'input.%s' % ext)
+        if ext == 'xls':
+            if nrows > XLS_MAX_ROWS:
+                skipped[name] = 'more rows than xls supports'
+                continue
+            try:
+                _write_xls(table, path)
+            except ImportError:
+                skipped[name] = 'xlwt not installed'
+            continue
+        writer = {
+            'csv': tabular.CsvWriter,
+            'json': tabular.JsonWriter,
+            'ndjson': tabular.NdjsonWriter,
+            'html': tabular.HtmlWriter,
+            'col': tabular.ColumnFileWriter,
+            }[ext]()
+        fileobj = open(path, 'wb')
+        writer.write(table, fileobj)
+        fileobj.close()
+    return skipped
+
+def run(sizes='10000,100000', output='-', names=None):
+    '''Run the benchmarks and write JSON results to output ('-' for stdout).
+
+    @param sizes: comma separated list of numbers of rows.
+    @param names: comma separated list of benchmarks (default all).
+    '''
+    sizes = [ int(size) for size in sizes.split(',') ]
+    if names:
+        names = names.split(',')
+    else:
+        names = sorted(READERS) + sorted(WRITERS)
+    results = []
+    for nrows in sizes:
+        workdir = tempfile.mkdtemp(prefix='datautil-bench-')
+        try:
+            skipped = _prepare_inputs(names, nrows, workdir)
+            for name in names:
+                if name in skipped:
+                    result = { 'name': name, 'rows': nrows,
+                        'skipped': skipped[name] }
+                else:
+                    result = _run_one(name, nrows, workdir)
+                sys.stderr.write('%s\n' % json.dumps(result))
+                results.append(result)
+        finally:
+            shutil.rmtree(workdir)
+    out = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.datetime.now().isoformat(),
+            },
+        'results': results,
+        }
+    if output == '-':
+        json.dump(out, sys.stdout, indent=2)
+    else:
+        json.dump(out, open(output, 'w'), indent=2)
+
+def compare(old, new, threshold='0.1'):
+    '''Compare two result files and report regressions.
+
+    Exits with status 1 if any benchmark has slowed down by more than
+    threshold (fraction of the old rows/sec).
+    '''
+    threshold = float(threshold)
+    def load(path):
+        results = json.load(open(path))['results']
+        return dict(((res['name'], res['rows']), res) for res in results
+            if res.get('rows_per_sec'))
+    old = load(old)
+    new = load(new)
+    regressions = 0
+    print '%-12s %10s %14s %14s %8s %12s' % ('benchmark', 'rows',
+            'old rows/s', 'new rows/s', 'change', 'peak rss')
+    for key in sorted(set(old) & set(new)):
+        before = old[key]
+        after = new[key]
+        change = after['rows_per_sec'] / before['rows_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = ' REGRESSION'
+            regressions += 1
+        rss = '%+d kB' % (after['peak_rss_kb'] - before['peak_rss_kb'])
+        print '%-12s %10d %14.0f %14.0f %+7.1f%% %12s%s' % (key[0], key[1],
+                before['rows_per_sec'], after['rows_per_sec'], change * 100,
+                rss, flag)
+    for key in sorted(set(old) ^ set(new)):
+        print '%-12s %10d only in %s' % (key[0], key[1],
+                'old' if key in old else 'new')
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    _main(locals())
@@ -20,6 +20,70 @@ v0.5 2011-??-??
 ---------------
 
   * Minor improvements to cache
+  * CsvReader: streaming (CsvReader.iter_rows and read(stream=True)) with
+    header sniffing from a bounded sample
+  * tabular/columnar.py: ColumnarTabularData column store with typed array
+    storage
+  * tabular/lazy.py: LazyTable for lazy, chainable (select, filter, map,
+    rename, limit) transformations fused into a single pass
+  * tabular/schema.py: per-column type inference and bulk conversion
+    (infer_types option for CsvReader, JsonReader and HtmlReader)
+  * tabular/parallel.py: parallel csv parsing across processes
+    (CsvReader.read(filepath, parallel=N))
+  * tabular/indexed.py: IndexedCsv for random access to rows of large csv
+    files via a memory map and a persistent row offset index
+  * CsvWriter: streaming interface (open/write_rows/close, usable as a
+    context manager), buffered output and unicode support
+  * tabular/rows.py: compact tuple based rows with O(1) lookup by column
+    name (benchmarks/rows_memory.py compares memory use with lists)
+  * benchmarks/tabular_bench.py: benchmark suite for tabular readers and
+    writers with JSON results and a compare mode
+  * pivot: aggregate duplicate cells with reducers (sum, count, mean, min,
+    max, first, last) and optional sparse output
+  * project: zero copy column projection in the order requested
+    (select_columns no longer transposes or sorts its cols argument in
+    place); CsvReader.read(columns=...)
+  * tabular/groupby.py: group_by hash aggregation spilling to disk beyond a
+    configurable number of groups
+  * tabular/join.py: inner, left and anti joins (hash join falling back to
+    an external sort-merge join)
+  * tabular/sorting.py: sort_table external merge sort by multiple columns
+    with directions and key functions (floatify, FlexiDate ordering)
+  * tabular/colfile.py: binary column file format (ColumnFileWriter,
+    ColumnFileReader) with dictionary encoded strings, per column compression
+    and loading of individual columns
+  * tabular/misc.py: transpose_blocked transposes streamed matrices of any
+    size in bounded memory (spilling column blocks to temporary files)
+  * tabular/filters.py: declarative row filters (Col comparisons, isin,
+    between, is_null, &, |, ~) compiled to a single function.
+    CsvReader.read(where=...) (also when parallel) and XlsReader.read(where=...)
+    drop rows as they are parsed. XlsReader reads raw row values instead of
+    creating a Cell object per cell
+  * tabular/dedupe.py: dedupe removes duplicate rows (or keys) from streams,
+    exactly (64-bit hashes, spilling to disk) or approximately (BloomFilter)
+  * tabular/profiling.py: profile computes per column statistics (nulls,
+    min/max, mean/variance, HyperLogLog distinct count, quantiles, top values)
+    in one pass; profiles merge so profile_csv can profile chunks in parallel
+  * TxtWriter writes rows as they are formatted (iter_lines) with column
+    widths from a configurable sample_size or a full prescan
+  * HtmlWriter writes rows as they are formatted; iter_html generates the
+    table in fragments (e.g. for a WSGI response). No longer modifies the
+    header passed to it when there are row headings
+  * LatexWriter writes row by row without modifying its input, has a
+    longtable mode (header repeated on every page, optional rows_per_page)
+    and write_files to split a table across several include files
+  * JsonWriter writes the header and then one row per line (no indent by
+    default); JsonReader.read(stream=True) / iter_rows parse the data array a
+    row at a time. New NdjsonReader and NdjsonWriter (one row per line)
+  * WriterBase.value_formatter / row_formatter: per column formatters built
+    once from the column type (or schema) which the writers that convert
+    values to text now use for data rows: Html, Txt, Latex and Csv when
+    round_ndigits is set. Csv without rounding (csv.writer writes floats in
+    full) and the Json, Ndjson and column file writers keep values as they
+    are
+  * FanoutWriter writes one (possibly streamed) table with several writers in
+    a single pass, sharing value conversion between writers that agree on
+    it. Writers gain iter_write (output generated in fragments)
 
 v0.4 2011-01-05
 ---------------
@@ -2,6 +2,16 @@ from base import *
 from misc import *
 from xls import XlsReader
 from html import *
-from tabular_json import JsonReader, JsonWriter
+from tabular_json import JsonReader, JsonWriter, NdjsonReader, NdjsonWriter
 from txt import TxtWriter
+from columnar import ColumnarTabularData
+from colfile import ColumnFileReader, ColumnFileWriter
+from lazy import LazyTable
+from groupby import group_by
+from join import join
+from sorting import sort_table
+from dedupe import dedupe
+from profiling import profile
+from filters import Col
+from fanout import FanoutWriter
 
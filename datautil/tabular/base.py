@@ -1,20 +1,32 @@
 """
 Tools for dealing with tabular data
 """
+import re
+import datetime
+import itertools
+from operator import itemgetter
+
+import schema
+from filters import compile_where, Predicate
+from parallel import is_splittable, iter_rows as parallel_iter_rows
 
 class TabularData(object):
     """Holder for tabular data
 
     NB:
       * Assume data organized in rows.
-      * No type conversion so all data will be as entered.
+      * No type conversion so all data will be as entered (unless requested
+        from the reader, see ReaderBase.convert_types).
 
     Properties:
-      * data: data itself provided as array of arrays
+      * data: data itself provided as array of arrays. For large datasets
+        this may instead be an iterator over rows (see e.g. CsvReader.read
+        with stream=True) in which case it can only be iterated once.
       * header: associated header columns (if they exist)
-
-    TODO: handling of large datasets (iterators?)
+      * schema: list of column types (see schema.TYPES) if these were
+        inferred when reading, None otherwise.
     """
+    schema = None
 
     def __init__(self, data=None, header=None):
         """
@@ -37,8 +49,11 @@ class TabularData(object):
         out = []
         if self.header:
             out.append(self.header)
-        # limit to 10 items
-        out += self.data[0:10]
+        if isinstance(self.data, list):
+            # limit to 10 items
+            out += self.data[0:10]
+        else: # do not consume a streamed data iterator
+            out.append('...')
         return repr(out)
 
     def __str__(self):
@@ -52,13 +67,35 @@ class TabularData(object):
         return TabularData(header=list_[0], data=list_[1:])
 
     def to_list(self):
+        data = self.data
+        if not isinstance(data, list):
+            data = list(data)
         if self.header:
-            return [ self.header ] + self.data
+            return [ self.header ] + data
         else:
-            return self.data
+            return data
+
+
+def column_index(header, col):
+    '''Return the index of column col (a header name or an index).'''
+    if isinstance(col, int):
+        return col
+    return header.index(col)
+
+def row_projector(indices):
+    '''Return a function selecting the values at indices (in that order)
+    from a row as a list.'''
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: [ row[index] ]
+    getter = itemgetter(*indices)
+    return lambda row: list(getter(row))
 
 
 class ReaderBase(object):
+    # number of rows sampled when inferring column types
+    type_sample_size = 100
+
     def __init__(self, filepath_or_fileobj=None, encoding='utf8'):
         self.filepath = None
         self.fileobj = None
@@ -78,6 +115,32 @@ class ReaderBase(object):
     def read(self, filepath_or_fileobj=None):
         self._filepath_or_fileobj(filepath_or_fileobj)
 
+    def convert_types(self, tabular_data):
+        '''Infer column types for tabular_data and convert its data.
+
+        Types are inferred from the first `type_sample_size` rows and each
+        column is then converted in bulk (see the schema module). The
+        inferred types are stored in self.schema and tabular_data.schema.
+
+        Works with streamed data (an iterator) as well as lists.
+
+        @return: tabular_data (converted in place).
+        '''
+        rows = tabular_data.data
+        if isinstance(rows, list):
+            types = schema.infer_types(rows, self.type_sample_size)
+            rows = schema.convert_columns(rows, types)
+        else:
+            rows = iter(rows)
+            sample = list(itertools.islice(rows, self.type_sample_size))
+            types = schema.infer_types(sample, self.type_sample_size)
+            rows = itertools.imap(schema.compile_row_converter(types),
+                    itertools.chain(sample, rows))
+        tabular_data.data = rows
+        tabular_data.schema = types
+        self.schema = types
+        return tabular_data
+
 
 class WriterBase(object):
     '''
@@ -101,25 +164,160 @@ class WriterBase(object):
         holder.seek(0)
         return holder.read()
 
+    def iter_write(self, tabular_data, *args, **kwargs):
+        '''Generate the output of write (called with the same arguments)
+        in fragments, reading rows only as they are needed.
+
+        Writers which cannot stream produce all their output at once (this
+        default implementation).
+        '''
+        yield self.write_str(tabular_data, *args, **kwargs)
+
+    # function applied to the text of every value (e.g. to escape it)
+    escape_text = None
+    # whether write converts values to text (see value_formatter)
+    formats_values = False
+
+    def format_key(self):
+        '''Key identifying how this writer converts values to text: writers
+        with equal keys give the same text for every value (None if the
+        writer does not convert values to text).'''
+        if not self.formats_values:
+            return None
+        return (type(self).value_to_str.im_func, self.round_ndigits,
+                self.escape_text)
+
     def value_to_str(self, value):
         '''Convert value to text (rounding floats/ints as necessary).
         '''
-        if value is None:
-            return ''
-        if self.round_ndigits is not None and \
-                (isinstance(value, int) or isinstance(value, float)):
-            roundedResult = round(value, self.round_ndigits)
-            if self.round_ndigits <= 0: # o/w will have in .0 at end
-                roundedResult = int(roundedResult)
-            roundedResult = str(roundedResult)
-            # deal with case when rounding has added unnecessary digits
-            if len(str(value)) < len(roundedResult):
-                return str(value)
-            else:
-                return roundedResult
+        text = _value_to_str(value, self.round_ndigits)
+        if self.escape_text is not None:
+            text = self.escape_text(text)
+        return text
+
+    def value_formatter(self, value_type=None):
+        '''Return a function converting values to text exactly as
+        value_to_str does but specialised for values of one type so the type
+        checks and choice of conversion happen once rather than per value.
+
+        @param value_type: python type or schema type name ('int', 'float',
+            'bool', 'date' or 'string'). Values of other types (e.g. None)
+            are converted as by value_to_str.
+        '''
+        if type(self).value_to_str.im_func is not \
+                WriterBase.value_to_str.im_func:
+            # subclass does its own conversion
+            return self.value_to_str
+        value_type = _SCHEMA_PYTYPES.get(value_type, value_type)
+        ndigits = self.round_ndigits
+        def generic(value):
+            return _value_to_str(value, ndigits)
+        if not isinstance(value_type, type) or value_type is type(None):
+            formatter = generic
+        elif ndigits is not None and value_type in (int, float):
+            as_int = ndigits <= 0
+            def formatter(value):
+                if value.__class__ is not value_type:
+                    return generic(value)
+                rounded = round(value, ndigits)
+                if as_int:
+                    rounded = int(rounded)
+                rounded = str(rounded)
+                text = str(value)
+                if len(text) < len(rounded):
+                    return text
+                return rounded
+        elif ndigits is not None and issubclass(value_type, (int, float)):
+            # e.g. bool (which is rounded like an int)
+            formatter = generic
+        elif value_type is unicode:
+            def formatter(value):
+                if value.__class__ is unicode:
+                    return value
+                return generic(value)
         else:
-            return unicode(value)
-
+            def formatter(value):
+                if value.__class__ is value_type:
+                    return unicode(value)
+                return generic(value)
+        escape = self.escape_text
+        if escape is None:
+            return formatter
+        return lambda value: escape(formatter(value))
+
+    def row_formatter(self, types=None, sample_row=None):
+        '''Return a function converting a row to a list of text values
+        (as value_to_str would) using a L{value_formatter} per column.
+
+        @param types: list of column types (e.g. the schema of a
+            L{TabularData} read with infer_types).
+        @param sample_row: if types is None use the types of the values in
+            this row (typically the first row).
+        '''
+        if types is None:
+            types = [ type(value) for value in sample_row or [] ]
+        formatters = [ self.value_formatter(value_type)
+            for value_type in types ]
+        generic = self.value_formatter()
+        def format_row(row):
+            if len(row) > len(formatters):
+                formatters.extend([ generic ] *
+                        (len(row) - len(formatters)))
+            return [ formatter(value) for formatter, value in
+                itertools.izip(formatters, row) ]
+        return format_row
+
+    def iter_formatted(self, rows, types=None):
+        '''Iterate over rows converted to lists of text values.
+
+        Formatters are built (see row_formatter) from types or, if it is
+        None, the first row.
+        '''
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return
+        format_row = self.row_formatter(types, first)
+        yield format_row(first)
+        for row in rows:
+            yield format_row(row)
+
+    def _formatted_data(self, tabular_data):
+        '''Rows of tabular_data converted to text (using its schema, if it
+        has one, for the column types). If tabular_data.formatted is set the
+        rows have already been converted by a writer with the same format_key
+        (see L{FanoutWriter}).'''
+        if getattr(tabular_data, 'formatted', False):
+            return iter(tabular_data.data)
+        return self.iter_formatted(tabular_data.data,
+                getattr(tabular_data, 'schema', None))
+
+
+# python types of the values of schema types
+_SCHEMA_PYTYPES = {
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'date': datetime.date,
+    'string': unicode,
+    }
+
+def _value_to_str(value, round_ndigits=None):
+    if value is None:
+        return ''
+    if round_ndigits is not None and \
+            (isinstance(value, int) or isinstance(value, float)):
+        roundedResult = round(value, round_ndigits)
+        if round_ndigits <= 0: # o/w will have in .0 at end
+            roundedResult = int(roundedResult)
+        roundedResult = str(roundedResult)
+        # deal with case when rounding has added unnecessary digits
+        if len(str(value)) < len(roundedResult):
+            return str(value)
+        else:
+            return roundedResult
+    else:
+        return unicode(value)
 
 import csv
 import codecs
@@ -153,90 +351,385 @@ class CsvReader(ReaderBase):
     > <http://docs.python.org/lib/module-csv.html>
     """
 
-    def read(self, filepath_or_fileobj=None, encoding=None, **kwargs):
+    # number of bytes read from the start of the file when sniffing for a
+    # header (the rest of the file is never read up front)
+    sample_size = 64 * 1024
+
+    def read(self, filepath_or_fileobj=None, encoding=None, stream=False,
+            sample_size=None, infer_types=False, parallel=None, columns=None,
+            where=None, **kwargs):
         """Read in a csv file and return a TabularData object.
 
         @param fileobj: file like object.
         @param encoding: if set use this instead of default encoding set in
             __init__ to decode the file like object. NB: will check if fileobj
             already in unicode in which case this is ignored.
+        @param stream: if True the data attribute of the returned TabularData
+            is an iterator over the rows (read lazily from the underlying
+            file) rather than a list. NB: it can only be iterated once.
+        @param sample_size: number of bytes to use for sniffing the header
+            (defaults to `CsvReader.sample_size`).
+        @param infer_types: infer column types and convert values to them
+            (see `ReaderBase.convert_types`).
+        @param parallel: number of processes to use for parsing. The file is
+            split into chunks at record boundaries which are parsed in a
+            process pool and reassembled in order (see the parallel module).
+            Only used when reading from a file path in an ascii compatible
+            encoding (e.g. utf-8 or latin-1) -- otherwise ignored.
+        @param columns: only return these columns (header names or indexes,
+            in the order given). Other fields are dropped as soon as each
+            line is parsed (before type conversion or being sent back from a
+            parallel worker).
+        @param where: only return rows matching this filter (a
+            L{filters.Predicate}, e.g. Col('Year', int) > 2000, or a function
+            taking a row). Rows are tested as soon as they are parsed, before
+            any other processing. Filters may use any column (not just those
+            selected). With parallel the filter is applied in the worker
+            processes (a function must then be picklable).
         @param kwargs: all further kwargs are passed to the underlying `csv.reader` function
         @return tabular data object (all values encoded as utf-8).
         """
+        rows = self.iter_rows(filepath_or_fileobj, encoding=encoding,
+                sample_size=sample_size, columns=columns, where=where,
+                **kwargs)
+        if parallel > 1 and self.filepath and is_splittable(self.encoding):
+            rows = parallel_iter_rows(self.filepath, parallel,
+                    skip_header=bool(self.header), encoding=self.encoding,
+                    columns=self.column_indices, where=self.where,
+                    **self._csv_kwargs(kwargs))
+        if not stream:
+            rows = list(rows)
+        tabData = TabularData(data=rows, header=self.header)
+        if infer_types:
+            self.convert_types(tabData)
+        return tabData
+
+    def iter_rows(self, filepath_or_fileobj=None, encoding=None,
+            sample_size=None, columns=None, where=None, **kwargs):
+        """Return an iterator over the rows of a csv file.
+
+        Only the first `sample_size` bytes of the file are used to sniff for a
+        header. If one is found it is stored in self.header and the iterator
+        yields data rows only. Rows are read lazily so memory use is constant
+        whatever the size of the file.
+
+        Arguments are as for `read`.
+        """
         super(CsvReader, self).read(filepath_or_fileobj)
         if encoding:
             self.encoding = encoding
-        tabData = TabularData()
+        if sample_size is None:
+            sample_size = self.sample_size
 
-        sample = self.fileobj.read()
+        sample = self.fileobj.read(sample_size)
+        truncated = len(sample) >= sample_size
         # first do a simple test -- maybe sample is already unicode
         if type(sample) == unicode:
             encoded_fo = UTF8Recoder(self.fileobj, None)
         else:
-            sample = sample.decode(self.encoding)
+            # incremental decoder copes with a multibyte character cut in two
+            # at the end of the sample
+            decoder = codecs.getincrementaldecoder(self.encoding)()
+            sample = decoder.decode(sample)
             encoded_fo = UTF8Recoder(self.fileobj, self.encoding)
+        if truncated:
+            # drop the (probably) partial last line
+            lastline = sample.rfind('\n')
+            if lastline > 0:
+                sample = sample[:lastline + 1]
         sample = sample.encode('utf-8')
         sniffer = csv.Sniffer()
         hasHeader = sniffer.has_header(sample)
 
         self.fileobj.seek(0)
+        reader = csv.reader(encoded_fo, **self._csv_kwargs(kwargs))
+        self.header = []
+        if hasHeader:
+            self.header = reader.next()
+        rows = reader
+        # filter with column names resolved (so it can be sent to parallel
+        # workers)
+        self.where = where
+        if isinstance(where, Predicate):
+            self.where = where.resolve(self.header)
+        if where is not None:
+            rows = itertools.ifilter(compile_where(self.where), rows)
+        self.column_indices = None
+        if columns is not None:
+            self.column_indices = [ column_index(self.header, col)
+                for col in columns ]
+            project = row_projector(self.column_indices)
+            if self.header:
+                self.header = project(self.header)
+            return itertools.imap(project, rows)
+        return rows
+
+    def _csv_kwargs(self, kwargs):
         ourkwargs = {
             'skipinitialspace': True
         }
         if kwargs:
             ourkwargs.update(kwargs)
-
-        reader = csv.reader(encoded_fo, **ourkwargs)
-        if hasHeader:
-            tabData.header = reader.next()
-        for row in reader:
-            tabData.data.append(row)
-        return tabData
+        return ourkwargs
 
 # for backwards compatibility
 ReaderCsv = CsvReader
 
+class _WriteBuffer(object):
+    '''File-like object collecting writes and passing them on to fileobj in
+    large blocks.'''
+    def __init__(self, fileobj, size):
+        self.fileobj = fileobj
+        self.size = size
+        self._parts = []
+        self._length = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self.fileobj.write(''.join(self._parts))
+            self._parts = []
+            self._length = 0
+
+
+class _Fragments(list):
+    '''File-like object collecting the text written to it.'''
+    def write(self, text):
+        self.append(text)
+
+    def flush(self):
+        pass
+
+    def pop_all(self):
+        text = ''.join(self)
+        del self[:]
+        return text
+
+
 class CsvWriter(WriterBase):
-    # TODO: unicode support a la CsvReader
+    '''Write tabular data as csv.
+
+    As well as writing a complete L{TabularData} with write() rows can be
+    streamed from any iterator::
+
+        with CsvWriter().open(fileobj, header) as writer:
+            writer.write_rows(rows)
+
+    Unicode values are encoded (using the encoding given to open/write).
+    Values are written as they are (by csv.writer, which writes floats in
+    full) unless round_ndigits is set in which case they are converted by
+    per column formatters (see WriterBase.row_formatter) so numbers are
+    rounded as by value_to_str.
+    Output is buffered and passed to fileobj in blocks of buffer_size bytes.
+    '''
+    buffer_size = 1 << 20
+    # number of rows written per fragment by iter_write
+    fragment_rows = 1000
+
+    @property
+    def formats_values(self):
+        return self.round_ndigits is not None
+
     def write(self, tabular_data, fileobj, encoding='utf-8'):
-        writer = csv.writer(fileobj)
-        if tabular_data.header:
-            writer.writerow(tabular_data.header)
-        for row in tabular_data.data:
-            writer.writerow(row)
-        fileobj.flush()
+        self.open(fileobj, tabular_data.header, encoding)
+        self._write_rows(self._data_rows(tabular_data))
+        self.close()
+
+    def iter_write(self, tabular_data, encoding='utf-8'):
+        fragments = _Fragments()
+        self.open(fragments, tabular_data.header, encoding)
+        rows = self._data_rows(tabular_data)
+        while True:
+            batch = list(itertools.islice(rows, self.fragment_rows))
+            self._write_rows(batch)
+            if len(batch) < self.fragment_rows:
+                break
+            self._buffer.flush()
+            yield fragments.pop_all()
+        self.close()
+        yield fragments.pop_all()
+
+    def open(self, fileobj, header=None, encoding='utf-8'):
+        '''Start writing to fileobj (writing header if not empty).
+
+        @return: self (so can be used as a context manager).
+        '''
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self._buffer = _WriteBuffer(fileobj, self.buffer_size)
+        self._writer = csv.writer(self._buffer)
+        if header:
+            self.write_row(header)
+        return self
+
+    def write_row(self, row):
+        if self.round_ndigits is not None:
+            row = [ self.value_to_str(value) for value in row ]
+        self._writer.writerow(self._encode_row(row))
+
+    def write_rows(self, rows, types=None):
+        '''Write all rows from the iterable rows.
+
+        @param types: column types used when rounding (see
+            WriterBase.row_formatter).
+        '''
+        if self.round_ndigits is not None:
+            rows = self.iter_formatted(rows, types)
+        self._write_rows(rows)
+
+    def _write_rows(self, rows):
+        self._writer.writerows(itertools.imap(self._encode_row, rows))
+
+    def _data_rows(self, tabular_data):
+        if self.round_ndigits is None:
+            return iter(tabular_data.data)
+        return self._formatted_data(tabular_data)
+
+    def close(self):
+        '''Flush all output to fileobj (which is left open).'''
+        self._buffer.flush()
+        self.fileobj.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _encode_row(self, row):
+        encoding = self.encoding
+        return [ value.encode(encoding) if isinstance(value, unicode)
+            else value for value in row ]
 
 
 ## --------------------------------
 ## Converting to Latex
 
 class LatexWriter(WriterBase):
+    '''Write tabular data as the rows of a LaTeX table (to be \\input into
+    a tabular environment) or as a complete longtable environment.
+
+    Rows are written as they are formatted so tables of any size (and
+    streamed data) can be written.
+    '''
+    # characters which are escaped with a backslash
+    escape_chars = [ '&', '%' ]
+    has_row_headings = False
+    formats_values = True
+
+    def __init__(self, round_ndigits=None, longtable=False, colspec=None,
+            rows_per_page=None, **kwargs):
+        '''
+        @param round_ndigits: see L{WriterBase}.
+        @param longtable: write a complete longtable environment (in which
+            the header is repeated at the top of every page).
+        @param colspec: longtable column specification (default 'l' for
+            every column).
+        @param rows_per_page: (longtable) start a new page after this many
+            rows.
+        '''
+        super(LatexWriter, self).__init__(round_ndigits, **kwargs)
+        self.longtable = longtable
+        self.colspec = colspec
+        self.rows_per_page = rows_per_page
+        self._escape_re = re.compile('([%s])' % ''.join([ re.escape(ch)
+            for ch in self.escape_chars ]))
 
     def write(self, tabular_data, fileobj, has_row_headings=False):
+        for text in self.iter_write(tabular_data, has_row_headings):
+            fileobj.write(text)
+
+    def iter_write(self, tabular_data, has_row_headings=False):
         self.has_row_headings = has_row_headings
-        matrix = tabular_data.data
-        has_header = len(tabular_data.header) > 0
-        if has_header: 
-            matrix.insert(0, tabular_data.header)
-        out = self._write(matrix, has_header)
-        fileobj.write(out)
-    
+        return self.iter_latex(tabular_data)
+
+    def write_files(self, tabular_data, path_pattern, rows_per_file,
+            has_row_headings=False):
+        '''Split the table across several files (e.g. one per page, to be
+        \\input separately), each starting with the header.
+
+        @param path_pattern: pattern for file paths, formatted with the file
+            number (from 1), e.g. 'appendix-%03d.tex'.
+        @return: list of the paths written.
+        '''
+        paths = []
+        rows = iter(tabular_data.data)
+        while True:
+            chunk = list(itertools.islice(rows, rows_per_file))
+            if not chunk and paths:
+                break
+            path = path_pattern % (len(paths) + 1)
+            fileobj = open(path, 'w')
+            try:
+                self.write(TabularData(data=chunk,
+                    header=tabular_data.header), fileobj, has_row_headings)
+            finally:
+                fileobj.close()
+            paths.append(path)
+            if len(chunk) < rows_per_file:
+                break
+        return paths
+
+    def iter_latex(self, tabular_data):
+        '''Generate the output a row at a time.'''
+        rows = self._formatted_data(tabular_data)
+        if self.longtable:
+            return self._iter_longtable(rows, tabular_data.header)
+        return self._iter_rows(rows, tabular_data.header)
+
     def _write(self, matrix, has_header=True):
         if len(matrix) == 0: return
+        rows = iter(matrix)
+        header = None
+        if has_header:
+            header = rows.next()
+        return ''.join(self._iter_rows(self.iter_formatted(rows), header))
+
+    def _iter_rows(self, rows, header=None):
+        # rows: values already converted to text
         # no hline on first row as this seems to mess up latex \input
         # http://groups.google.com/group/comp.text.tex/browse_thread/thread/1e1db553a958ebd8/0e590a22cb59f43d
-        out = '%s' % self.process_row(matrix[0], has_header)
-        for row in matrix[1:]:
-            out += self.process_row(row) 
-        return out
+        if header:
+            yield self.process_row(header, True)
+        process_texts = self._process_texts
+        for texts in rows:
+            yield process_texts(texts)
+
+    def _iter_longtable(self, rows, header):
+        colspec = self.colspec
+        if colspec is None:
+            first = next(rows, None)
+            if first is not None:
+                rows = itertools.chain([ first ], rows)
+            colspec = 'l' * max(len(header or []), len(first or []))
+        yield '\\begin{longtable}{%s}\n' % colspec
+        if header:
+            heading = self.process_row(header, True)
+            yield heading + '\\endfirsthead\n' + heading + '\\endhead\n'
+        for ii, texts in enumerate(rows):
+            if self.rows_per_page and ii and ii % self.rows_per_page == 0:
+                yield '\\newpage\n'
+            yield self._process_texts(texts)
+        yield '\\end{longtable}\n'
 
     def process_row(self, row, heading=False):
-        if len(row) == 0: return
-        out = '%s' % self.process_cell(row[0], heading or self.has_row_headings)
-        for cell in row[1:]:
-            out += ' & %s' % self.process_cell(cell, heading)
-        out += ' \\\\\n\hline\n'
-        return out
+        return self._process_texts([ self.value_to_str(cell) for cell in row ],
+                heading)
+
+    def _process_texts(self, texts, heading=False):
+        # texts: the row's values already converted to text
+        if len(texts) == 0: return ''
+        cells = [ self.escape(text) for text in texts ]
+        if heading:
+            cells = [ '\\textbf{%s}' % cell for cell in cells ]
+        elif self.has_row_headings:
+            cells[0] = '\\textbf{%s}' % cells[0]
+        return ' & '.join(cells) + ' \\\\\n\hline\n'
 
     def process_cell(self, cell, heading=False):
         cell_text = self.value_to_str(cell)
@@ -247,11 +740,8 @@ class LatexWriter(WriterBase):
             return cell_text
 
     def escape(self, text):
-        escape_chars = [ '&', '%' ]
-        out = text
-        for ch in escape_chars:
-            out = out.replace(ch, '\\%s' % ch)
-        return out
+        # single pass over text
+        return self._escape_re.sub(r'\\\1', text)
     
 
 # TODO: 2009-08-05 deprecate
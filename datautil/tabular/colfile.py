@@ -0,0 +1,382 @@
+'''Binary column file format for fast saving and reloading of tables.
+
+    ColumnFileWriter(codec='zlib').write(table, open('cache.col', 'wb'))
+    table = ColumnFileReader().read('cache.col')
+    table = ColumnFileReader().read('cache.col', columns=['Year', 'Value'])
+
+Tables are stored column by column as (optionally compressed) blocks of raw
+array data, so reloading needs no parsing or type conversion of individual
+values. The file layout is::
+
+    magic ('DUCF')
+    column blocks
+    footer: the header, number of rows and the offset and length of the
+        blocks of every column (JSON)
+    footer length (8 byte little-endian unsigned int)
+    magic ('DUCF')
+
+The reader memory maps the file and only loads the blocks of the columns it
+is asked for. Loading copies a block once, straight from the map into the
+column's array (with no parsing), so loaded columns do not refer to the
+file. Column encodings are:
+
+  * int / float columns: array of values
+  * str / unicode columns: dictionary encoded (array of codes plus the JSON
+    list of distinct values) when values repeat, otherwise a packed
+    character buffer plus an array of offsets
+  * other or mixed columns: pickled list of values
+
+plus a null mask for columns containing None. Arrays are stored
+little-endian. Files are portable between platforms with the same sizes of C
+long and unicode character (array typecodes 'l' and 'u').
+
+NB: reading a column of the third kind unpickles it, which can execute
+arbitrary code, so only read files from trusted sources (or read just the
+int, float and string columns).
+'''
+import sys
+import mmap
+import array
+import struct
+import cPickle
+import zlib
+import bz2
+
+from base import ReaderBase, WriterBase, column_index
+from columnar import ColumnarTabularData, NullColumn, TypedColumn, \
+    StringColumn, DictColumn, ListColumn
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+MAGIC = 'DUCF'
+VERSION = 2
+
+# name: (compress, decompress)
+CODECS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'bz2': (bz2.compress, bz2.decompress),
+    }
+
+_footer_length = struct.Struct('<Q')
+
+_PYTYPES = {
+    'int': int,
+    'float': float,
+    'str': str,
+    'unicode': unicode,
+    }
+
+
+def _array_bytes(values):
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tostring()
+
+def _codes_typecode(size):
+    if size <= 1 << 8:
+        return 'B'
+    elif size <= 1 << 16:
+        return 'H'
+    return 'L'
+
+
+class ColumnFileWriter(WriterBase):
+    '''Write tabular data in the column file format (see module docstring).
+    '''
+    # dictionary encode string columns with at most this proportion of
+    # distinct values
+    dictionary_ratio = 0.5
+
+    def __init__(self, codec=None, **kwargs):
+        '''
+        @param codec: compression applied to column blocks: None, a name in
+            CODECS or a dict mapping columns (header names or indices) to
+            codecs.
+        '''
+        super(ColumnFileWriter, self).__init__(**kwargs)
+        self.codec = codec
+
+    def write(self, tabular_data, fileobj):
+        '''
+        @param tabular_data: L{TabularData} (converted to a
+            L{ColumnarTabularData} if it is not one already).
+        @param fileobj: file opened in binary mode.
+        '''
+        if not isinstance(tabular_data, ColumnarTabularData):
+            tabular_data = ColumnarTabularData(data=tabular_data.data,
+                    header=list(tabular_data.header))
+        header = list(tabular_data.header)
+        codecs = self._column_codecs(header, len(tabular_data.columns))
+
+        self._fileobj = fileobj
+        self._offset = 0
+        self._write(MAGIC)
+        index = []
+        for column, codec in zip(tabular_data.columns, codecs):
+            meta, blocks = self._encode_column(column)
+            meta['codec'] = codec
+            meta['blocks'] = dict((name, self._write_block(data, codec))
+                for name, data in blocks.items())
+            index.append(meta)
+        footer = {
+            'version': VERSION,
+            'header': header,
+            'nrows': tabular_data.nrows,
+            'columns': index,
+            'lengths': None,
+            }
+        if tabular_data._lengths is not None:
+            footer['lengths'] = self._write_block(
+                    _array_bytes(tabular_data._lengths), None)
+            footer['lengths']['itemsize'] = tabular_data._lengths.itemsize
+        footer = json.dumps(footer)
+        self._write(footer)
+        self._write(_footer_length.pack(len(footer)))
+        self._write(MAGIC)
+        del self._fileobj
+
+    def _column_codecs(self, header, ncols):
+        if not isinstance(self.codec, dict):
+            codecs = [ self.codec ] * ncols
+        else:
+            codecs = [ None ] * ncols
+            for col, codec in self.codec.items():
+                codecs[column_index(header, col)] = codec
+        for codec in codecs:
+            if codec is not None and codec not in CODECS:
+                raise ValueError('Unknown codec: %s' % codec)
+        return codecs
+
+    def _write(self, data):
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+    def _write_block(self, data, codec):
+        if codec is not None:
+            data = CODECS[codec][0](data)
+        block = { 'offset': self._offset, 'length': len(data) }
+        self._write(data)
+        return block
+
+    def _encode_column(self, column):
+        '''@return: (column metadata, dict of block name to data).'''
+        blocks = {}
+        nulls = getattr(column, 'nulls', None)
+        if nulls is not None:
+            blocks['nulls'] = str(nulls)
+        if isinstance(column, NullColumn):
+            meta = { 'kind': 'null' }
+        elif isinstance(column, TypedColumn):
+            meta = { 'kind': column.pytype.__name__,
+                'itemsize': column.values.itemsize }
+            blocks['values'] = _array_bytes(column.values)
+        elif isinstance(column, DictColumn):
+            meta, blocks2 = self._encode_dictionary(column.dictionary,
+                    column.codes)
+            blocks.update(blocks2)
+        elif isinstance(column, StringColumn):
+            dictionary = self._dictionary(column)
+            if dictionary is not None:
+                lookup = dict((value, code) for code, value in
+                        enumerate(dictionary))
+                lookup[None] = 0
+                codes = array.array(_codes_typecode(len(dictionary)),
+                        [ lookup[value] for value in column ])
+                meta, blocks2 = self._encode_dictionary(dictionary, codes)
+                blocks.update(blocks2)
+            else:
+                meta = { 'kind': column.pytype.__name__,
+                    'itemsize': column.buffer.itemsize,
+                    'offsetsize': column.offsets.itemsize }
+                blocks['buffer'] = _array_bytes(column.buffer)
+                blocks['offsets'] = _array_bytes(column.offsets)
+        else:
+            meta = { 'kind': 'pickle' }
+            blocks['values'] = cPickle.dumps(list(column), 2)
+        return meta, blocks
+
+    def _encode_dictionary(self, dictionary, codes):
+        meta = { 'kind': 'dictionary', 'typecode': codes.typecode,
+            'itemsize': codes.itemsize }
+        blocks = { 'codes': _array_bytes(codes) }
+        is_str = bytearray([ isinstance(value, str) for value in dictionary ])
+        if any(is_str):
+            # str values (of any encoding) round trip through latin-1
+            blocks['str'] = str(is_str)
+            dictionary = [ value.decode('latin-1') if isinstance(value, str)
+                else value for value in dictionary ]
+        blocks['dictionary'] = json.dumps(list(dictionary))
+        return meta, blocks
+
+    def _dictionary(self, column):
+        '''Distinct values of column if there are few enough of them to be
+        worth dictionary encoding (else None).'''
+        limit = int(len(column) * self.dictionary_ratio)
+        seen = set()
+        dictionary = []
+        for value in column:
+            if value not in seen and value is not None:
+                if len(dictionary) >= limit:
+                    return None
+                seen.add(value)
+                dictionary.append(value)
+        return dictionary
+
+
+class ColumnFileReader(ReaderBase):
+    '''Read files written by L{ColumnFileWriter}.
+
+    read() loads a whole table (or some of its columns) and closes the file.
+    Alternatively open() a file and load individual columns with
+    read_column() as needed, then close() it (or use the reader as a context
+    manager)::
+
+        with ColumnFileReader() as reader:
+            reader.open('cache.col')
+            values = reader.read_column('Value')
+
+    Properties (once a file has been opened):
+      * header: header of the table
+      * nrows: number of rows
+    '''
+    def read(self, filepath_or_fileobj=None, columns=None):
+        '''
+        @param columns: list of columns (header names or indices) to load.
+            Default all. Rows of tables with rows of differing lengths are
+            padded with None when only some columns are loaded.
+        @return: L{ColumnarTabularData}.
+        '''
+        self.open(filepath_or_fileobj)
+        try:
+            if columns is None:
+                indices = range(len(self._index['columns']))
+            else:
+                indices = [ column_index(self.header, col)
+                    for col in columns ]
+            loaded = [ self.read_column(idx) for idx in indices ]
+            if columns is None or not self.header:
+                header = self.header
+            else:
+                header = [ self.header[idx] for idx in indices ]
+            lengths = None
+            if columns is None and self._index['lengths'] is not None:
+                info = self._index['lengths']
+                lengths = self._array('L', info['itemsize'],
+                        self._block(info, None))
+        finally:
+            self.close()
+        return ColumnarTabularData.from_columns(loaded, header=header,
+                lengths=lengths)
+
+    def open(self, filepath_or_fileobj=None):
+        '''Open a file and read its footer.
+
+        @param filepath_or_fileobj: path (the file is closed by close()) or
+            file object opened in binary mode (left open).
+        '''
+        self.close()
+        self._own_fileobj = isinstance(filepath_or_fileobj, basestring)
+        if self._own_fileobj:
+            filepath_or_fileobj = open(filepath_or_fileobj, 'rb')
+        self._filepath_or_fileobj(filepath_or_fileobj)
+        try:
+            self._buffer = mmap.mmap(self.fileobj.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        except (AttributeError, EnvironmentError, ValueError):
+            # not a real file (or an empty one)
+            self.fileobj.seek(0)
+            self._buffer = self.fileobj.read()
+        buf = self._buffer
+        tail = len(MAGIC) + _footer_length.size
+        if len(buf) < len(MAGIC) + tail or buf[:len(MAGIC)] != MAGIC or \
+                buf[-len(MAGIC):] != MAGIC:
+            raise ValueError('Not a column file')
+        size = _footer_length.unpack(buf[-tail:-len(MAGIC)])[0]
+        try:
+            self._index = json.loads(buf[-tail-size:-tail])
+        except ValueError:
+            raise ValueError('Not a column file (or one written by an '
+                'older version)')
+        if self._index['version'] > VERSION:
+            raise ValueError('Unsupported column file version: %s' %
+                    self._index['version'])
+        self.header = self._index['header']
+        self.nrows = self._index['nrows']
+
+    def close(self):
+        '''Release the memory map (and close the file if it was opened from
+        a path).'''
+        buf = getattr(self, '_buffer', None)
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+        self._buffer = None
+        if getattr(self, '_own_fileobj', False):
+            self.fileobj.close()
+            self._own_fileobj = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def read_column(self, index_or_name):
+        '''Load a single column of the opened file.
+
+        @return: column container (as in L{ColumnarTabularData}.columns).
+        '''
+        meta = self._index['columns'][column_index(self.header,
+            index_or_name)]
+        kind = meta['kind']
+        codec = meta['codec']
+        blocks = dict((name, self._block(info, codec))
+            for name, info in meta['blocks'].items())
+        nulls = None
+        if 'nulls' in blocks:
+            nulls = bytearray(blocks['nulls'])
+        if kind == 'null':
+            return NullColumn(self.nrows)
+        elif kind == 'pickle':
+            return ListColumn(cPickle.loads(str(blocks['values'])))
+        elif kind == 'dictionary':
+            codes = self._array(meta['typecode'], meta['itemsize'],
+                    blocks['codes'])
+            dictionary = json.loads(str(blocks['dictionary']))
+            if 'str' in blocks:
+                dictionary = [ value.encode('latin-1') if is_str else value
+                    for value, is_str in zip(dictionary,
+                        bytearray(blocks['str'])) ]
+            return DictColumn(dictionary, codes, nulls)
+        pytype = _PYTYPES[kind]
+        if pytype in TypedColumn.typecodes:
+            values = self._array(TypedColumn.typecodes[pytype],
+                    meta['itemsize'], blocks['values'])
+            return TypedColumn(pytype, values, nulls)
+        buffer = self._array(StringColumn.typecodes[pytype], meta['itemsize'],
+                blocks['buffer'])
+        offsets = self._array('L', meta['offsetsize'], blocks['offsets'])
+        return StringColumn(pytype, buffer, offsets, nulls)
+
+    def _block(self, info, codec):
+        # a buffer (rather than a slice) so the data is not copied until
+        # it is loaded into an array (or decompressed)
+        data = buffer(self._buffer, info['offset'], info['length'])
+        if codec is not None:
+            data = CODECS[codec][1](data)
+        return data
+
+    def _array(self, typecode, itemsize, data):
+        values = array.array(str(typecode))
+        if values.itemsize != itemsize:
+            raise ValueError('Column file written with %s byte values for '
+                'array typecode %s (%s bytes here)' % (itemsize, typecode,
+                    values.itemsize))
+        values.fromstring(data)
+        if sys.byteorder == 'big' and values.itemsize > 1:
+            values.byteswap()
+        return values
+
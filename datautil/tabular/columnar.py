@@ -0,0 +1,399 @@
+'''Column-oriented storage for tabular data.
+
+L{ColumnarTabularData} holds the same information as L{TabularData} but
+stores each column in a compact typed container rather than keeping a list
+of lists:
+
+  * int columns: array.array('l')
+  * float columns: array.array('d')
+  * str / unicode columns: all values packed into a single character array
+    plus an array of offsets (or, when loaded from a column file, a
+    dictionary of distinct values plus an array of codes)
+  * anything else (mixed types, dates etc): a plain list
+
+None values are allowed in every column (they are recorded in a separate
+null mask). Rows are presented as light-weight read-only views so code that
+uses the header/data/__iter__ interface of TabularData continues to work::
+
+    td = CsvReader().read(fileobj)
+    ctd = ColumnarTabularData.from_tabular(td)
+    ctd.data[0][1]              # value in row 0, column 1
+    sum(ctd.column('Value'))    # column scan at array speed
+    td = ctd.to_tabular()       # back to list of lists
+'''
+import array
+
+from base import TabularData
+
+
+class NullColumn(object):
+    '''Column whose values are (so far) all None.'''
+    def __init__(self, size=0):
+        self.size = size
+
+    def accepts(self, value):
+        return value is None
+
+    def append(self, value):
+        self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return None
+
+    def __iter__(self):
+        return iter([None] * self.size)
+
+
+class _MaskedColumn(object):
+    '''Base for columns with a (lazily created) null mask.'''
+    nulls = None
+
+    def _append_null(self):
+        if self.nulls is None:
+            self.nulls = bytearray(len(self))
+        self.nulls.append(1)
+
+    def _append_not_null(self):
+        if self.nulls is not None:
+            self.nulls.append(0)
+
+    def __iter__(self):
+        for ii in xrange(len(self)):
+            yield self[ii]
+
+
+class TypedColumn(_MaskedColumn):
+    '''Column of ints or floats held in an array.array.'''
+    typecodes = { int: 'l', float: 'd' }
+
+    def __init__(self, pytype, values=None, nulls=None):
+        self.pytype = pytype
+        if values is None:
+            values = array.array(self.typecodes[pytype])
+        self.values = values
+        self.nulls = nulls
+
+    def accepts(self, value):
+        return value is None or type(value) is self.pytype
+
+    def append(self, value):
+        if value is None:
+            self._append_null()
+            self.values.append(0)
+        else:
+            self._append_not_null()
+            self.values.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if self.nulls is not None and self.nulls[index]:
+            return None
+        return self.values[index]
+
+    def __iter__(self):
+        if self.nulls is None:
+            return iter(self.values)
+        return super(TypedColumn, self).__iter__()
+
+
+class StringColumn(_MaskedColumn):
+    '''Column of strings packed into a single character buffer.
+
+    Value ii is buffer[offsets[ii]:offsets[ii+1]].
+    '''
+    typecodes = { str: 'c', unicode: 'u' }
+
+    def __init__(self, pytype, buffer=None, offsets=None, nulls=None):
+        self.pytype = pytype
+        if buffer is None:
+            buffer = array.array(self.typecodes[pytype])
+            offsets = array.array('L', [0])
+        self.buffer = buffer
+        self.offsets = offsets
+        self.nulls = nulls
+        if pytype is str:
+            self._extend = self.buffer.fromstring
+        else:
+            self._extend = self.buffer.fromunicode
+
+    def accepts(self, value):
+        return value is None or type(value) is self.pytype
+
+    def append(self, value):
+        if value is None:
+            self._append_null()
+        else:
+            self._append_not_null()
+            self._extend(value)
+        self.offsets.append(len(self.buffer))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if self.nulls is not None and self.nulls[index]:
+            return None
+        out = self.buffer[self.offsets[index]:self.offsets[index+1]]
+        if self.pytype is str:
+            return out.tostring()
+        return out.tounicode()
+
+
+class DictColumn(_MaskedColumn):
+    '''Column of (repeated) strings stored as codes indexing a dictionary
+    of the distinct values.'''
+    def __init__(self, dictionary=None, codes=None, nulls=None):
+        self.dictionary = dictionary if dictionary is not None else []
+        self.codes = codes if codes is not None else array.array('L')
+        self.nulls = nulls
+        self._lookup = None
+
+    def accepts(self, value):
+        return value is None or isinstance(value, basestring)
+
+    def append(self, value):
+        if value is None:
+            self._append_null()
+            self.codes.append(0)
+            return
+        self._append_not_null()
+        if self._lookup is None:
+            self._lookup = dict((item, code) for code, item in
+                enumerate(self.dictionary))
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+            if code >> (8 * self.codes.itemsize):
+                # too many values for the current code size
+                self.codes = array.array('L', self.codes)
+        self.codes.append(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if self.nulls is not None and self.nulls[index]:
+            return None
+        return self.dictionary[self.codes[index]]
+
+
+class ListColumn(list):
+    '''Fallback column for mixed or other types.'''
+    def accepts(self, value):
+        return True
+
+
+def _new_column(value, existing=None):
+    '''Create a column suitable for storing value.
+
+    @param existing: column whose contents should be copied into the new one.
+    '''
+    if value is None:
+        column = NullColumn()
+    elif type(value) in TypedColumn.typecodes:
+        column = TypedColumn(type(value))
+    elif type(value) in StringColumn.typecodes:
+        column = StringColumn(type(value))
+    else:
+        column = ListColumn()
+    if existing is not None:
+        for item in existing:
+            column.append(item)
+    return column
+
+
+class RowView(object):
+    '''Read-only view of a single row of a L{ColumnarTabularData}.'''
+    __slots__ = [ '_table', '_index' ]
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __len__(self):
+        return self._table._rowlength(self._index)
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [ self[ii] for ii in xrange(*col.indices(len(self))) ]
+        length = len(self)
+        if col < 0:
+            col += length
+        if not 0 <= col < length:
+            raise IndexError('row index out of range')
+        return self._table.columns[col][self._index]
+
+    def __iter__(self):
+        index = self._index
+        for column in self._table.columns[:len(self)]:
+            yield column[index]
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _RowsView(object):
+    '''Sequence of L{RowView}s (the data attribute of ColumnarTabularData).'''
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return self._table.nrows
+
+    def __getitem__(self, index):
+        nrows = len(self)
+        if isinstance(index, slice):
+            return [ RowView(self._table, ii) for ii in
+                xrange(*index.indices(nrows)) ]
+        if index < 0:
+            index += nrows
+        if not 0 <= index < nrows:
+            raise IndexError('data index out of range')
+        return RowView(self._table, index)
+
+    def __iter__(self):
+        for ii in xrange(len(self)):
+            yield RowView(self._table, ii)
+
+    def __repr__(self):
+        return repr(self[:10])
+
+
+class ColumnarTabularData(TabularData):
+    '''Column store alternative to L{TabularData}.
+
+    Properties:
+      * header: header columns (as for TabularData)
+      * data: read-only sequence of row views. Assigning a list of rows to
+        data replaces the contents of the table.
+      * columns: the underlying column containers
+      * nrows: number of rows
+
+    Rows may be of differing lengths (as e.g. produced by HtmlReader): short
+    rows are padded with None internally but their views keep the original
+    length.
+    '''
+
+    def __init__(self, data=None, header=None):
+        self.header = []
+        if header is not None:
+            self.header = header
+        self.data = data
+
+    def _get_data(self):
+        return _RowsView(self)
+
+    def _set_data(self, data):
+        self.columns = []
+        self.nrows = 0
+        self._lengths = None
+        if data is not None:
+            self.extend(data)
+
+    data = property(_get_data, _set_data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __repr__(self):
+        out = []
+        if self.header:
+            out.append(self.header)
+        out += [ list(row) for row in self.data[0:10] ]
+        return repr(out)
+
+    def append(self, row):
+        '''Append a row (any sequence) to the table.'''
+        columns = self.columns
+        ncols = len(columns)
+        rowlen = len(row)
+        if rowlen > ncols:
+            if self.nrows and self._lengths is None:
+                self._lengths = array.array('L', [ncols]) * self.nrows
+            for ii in range(ncols, rowlen):
+                column = NullColumn(self.nrows)
+                columns.append(column)
+        if self._lengths is not None:
+            self._lengths.append(rowlen)
+        elif rowlen < ncols:
+            self._lengths = array.array('L', [ncols]) * self.nrows
+            self._lengths.append(rowlen)
+        for ii, column in enumerate(columns):
+            value = row[ii] if ii < rowlen else None
+            if not column.accepts(value):
+                if isinstance(column, NullColumn):
+                    column = _new_column(value, column)
+                else:
+                    column = _new_column(object(), column)
+                columns[ii] = column
+            column.append(value)
+        self.nrows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _rowlength(self, index):
+        if self._lengths is None:
+            return len(self.columns)
+        return self._lengths[index]
+
+    def column(self, index_or_name):
+        '''Return the values of a column.
+
+        For int and float columns without nulls this is the underlying
+        array.array itself so it can be scanned at full speed.
+
+        @param index_or_name: column index or header name.
+        '''
+        if not isinstance(index_or_name, int):
+            index_or_name = self.header.index(index_or_name)
+        column = self.columns[index_or_name]
+        if isinstance(column, TypedColumn) and column.nulls is None:
+            return column.values
+        return column
+
+    @classmethod
+    def from_columns(cls, columns, header=None, lengths=None):
+        '''Create from a list of column containers (of equal length).
+
+        @param lengths: array of row lengths (if the rows are ragged).
+        '''
+        table = cls(header=header)
+        table.columns = list(columns)
+        if columns:
+            table.nrows = len(columns[0])
+        table._lengths = lengths
+        return table
+
+    @classmethod
+    def from_tabular(cls, tabular_data):
+        '''Create from a L{TabularData} (or any object with header and data).
+        '''
+        return cls(data=tabular_data.data, header=list(tabular_data.header))
+
+    def to_tabular(self):
+        '''Convert to a (row oriented) L{TabularData}.'''
+        return TabularData(data=[ list(row) for row in self.data ],
+                header=list(self.header))
+
+    def to_list(self):
+        return self.to_tabular().to_list()
+
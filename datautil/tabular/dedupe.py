@@ -0,0 +1,161 @@
+'''Remove duplicate rows from (possibly huge, streamed) tabular data.
+
+    dedupe(table)                           # whole rows
+    dedupe(table, ['Name', 'Date'])         # first row for each key
+    dedupe(rows, approximate=True, capacity=50000000, error_rate=0.0001)
+
+Exact mode remembers a 64-bit hash (from md5) of the key of every distinct
+row. Once max_hashes hashes are held, rows with new keys are partitioned by
+hash into temporary files which are then de-duplicated in turn, so memory
+use is bounded whatever the number of distinct rows. (Two different keys
+with the same 64-bit hash would be treated as duplicates: the chance of this
+is about n**2 / 2**65 for n distinct keys, i.e. 3e-6 for 10 million.)
+
+Approximate mode uses a L{BloomFilter} instead: memory is fixed in advance
+and nothing is written to disk but (once capacity distinct keys have been
+seen) a fraction error_rate of distinct rows are wrongly dropped as
+duplicates.
+
+Either way the first row for each key is kept and rows are produced as they
+are read (except for rows spilled to disk, which come at the end, as lists).
+'''
+import math
+import struct
+import hashlib
+import marshal
+from operator import itemgetter
+
+from base import TabularData, column_index
+from lazy import LazyTable
+from spill import run_partitioned
+
+_hash64 = struct.Struct('<q')
+_hash128 = struct.Struct('<QQ')
+
+
+def key_bytes(key):
+    '''Serialise key (a tuple of values) to a string such that equal keys
+    (of the same types) give equal strings.'''
+    try:
+        # version 0 as later versions encode interned strings differently
+        return marshal.dumps(key, 0)
+    except ValueError: # e.g. dates
+        return repr(key)
+
+
+class BloomFilter(object):
+    '''Set membership test with a fixed memory size (of capacity *
+    -ln(error_rate) / ln(2)**2 bits) and a false positive rate of at most
+    error_rate while holding at most capacity items. Items are strings.
+    '''
+    def __init__(self, capacity, error_rate=0.001):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError('capacity must be positive and error_rate '
+                'between 0 and 1')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        nbits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.nbits = max(8, int(math.ceil(nbits)))
+        self.nhashes = max(1, int(round(self.nbits * math.log(2) /
+            capacity)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: the ith position is h1 + i * h2
+        h1, h2 = _hash128.unpack(hashlib.md5(item).digest())
+        nbits = self.nbits
+        return [ (h1 + ii * h2) % nbits for ii in xrange(self.nhashes) ]
+
+    def add(self, item):
+        '''Add item.
+
+        @return: True if item was (probably) already present.
+        '''
+        bits = self.bits
+        present = True
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                present = False
+                bits[pos >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        '''Number of distinct items added (approximately).'''
+        return self.count
+
+
+def dedupe(table, keys=None, approximate=False, capacity=10000000,
+        error_rate=0.001, max_hashes=10000000, partitions=16, header=None):
+    '''Remove duplicate rows from table.
+
+    @param table: L{TabularData} (possibly streamed or a L{LazyTable}) or any
+        iterable of rows. Rows are only iterated over once.
+    @param keys: column (header name or index) or list of columns which
+        identify duplicates (default the whole row).
+    @param approximate: use a L{BloomFilter} of size capacity and
+        error_rate rather than exact hashes.
+    @param max_hashes: (exact mode) maximum number of hashes to hold in
+        memory before spilling rows to disk.
+    @param partitions: (exact mode) number of temporary files to spill to.
+    @param header: header for table (default table.header if it exists).
+    @return: L{LazyTable} of the first row for each distinct key.
+    '''
+    if header is None:
+        header = getattr(table, 'header', None) or []
+    if keys is None:
+        keyfunc = tuple
+    else:
+        if isinstance(keys, (basestring, int)):
+            keys = [ keys ]
+        indices = [ column_index(header, key) for key in keys ]
+        if len(indices) == 1:
+            index = indices[0]
+            keyfunc = lambda row: (row[index],)
+        else:
+            keyfunc = itemgetter(*indices)
+    rows = table.data if isinstance(table, TabularData) else table
+    if approximate:
+        out = _dedupe_approximate(rows, keyfunc, BloomFilter(capacity,
+            error_rate))
+    else:
+        if max_hashes < 1:
+            raise ValueError('max_hashes must be at least 1')
+        out = _dedupe_exact(_hashed(rows, keyfunc), max_hashes, partitions)
+    return LazyTable(out, header=header)
+
+def _dedupe_approximate(rows, keyfunc, bloom):
+    for row in rows:
+        if not bloom.add(key_bytes(keyfunc(row))):
+            yield row
+
+def _hashed(rows, keyfunc):
+    for row in rows:
+        digest = hashlib.md5(key_bytes(keyfunc(row))).digest()
+        yield _hash64.unpack_from(digest)[0], row
+
+def _dedupe_exact(hashed_rows, max_hashes, partitions):
+    def process(hashed_rows, spill):
+        seen = set()
+        for rowhash, row in hashed_rows:
+            if rowhash in seen:
+                continue
+            if len(seen) >= max_hashes:
+                # as a list so rows read back are the same type as those
+                # kept in memory (and a smaller pickle than e.g. a compact
+                # row)
+                spill(rowhash, (rowhash, list(row)))
+                continue
+            seen.add(rowhash)
+            yield row
+    return run_partitioned(process, hashed_rows, partitions)
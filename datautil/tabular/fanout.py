@@ -0,0 +1,105 @@
+'''Write a table in several formats with a single pass over its rows.
+
+    FanoutWriter([
+        (CsvWriter(), open('out.csv', 'wb')),
+        (JsonWriter(), open('out.json', 'w')),
+        (HtmlWriter(), open('out.html', 'w'), { 'caption': 'Results' }),
+        (LatexWriter(longtable=True), open('out.tex', 'w')),
+        ]).write(CsvReader().read('big.csv', stream=True))
+
+The rows are read from the source once (so streamed data is not re-read)
+and shared between the writers, which are advanced together batch_size rows
+at a time using their iter_write generators. Only the rows between the
+slowest and the fastest writer are held in memory -- except that writers
+which cannot stream (see WriterBase.iter_write) need the whole table.
+
+Writers which convert values to text in the same way (equal format_key,
+e.g. two HtmlWriters with the same round_ndigits) share the conversion:
+each value is converted once for all of them.
+'''
+import itertools
+
+from base import TabularData
+
+
+class _Counted(object):
+    '''Iterator over rows counting how many have been read.'''
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        try:
+            row = self.rows.next()
+        except StopIteration:
+            self.done = True
+            raise
+        self.count += 1
+        return row
+
+
+class FanoutWriter(object):
+    '''Write tabular data with several writers at once (see module
+    docstring).'''
+    # number of rows each writer is advanced by at a time
+    batch_size = 1000
+
+    def __init__(self, outputs):
+        '''
+        @param outputs: list of (writer, fileobj) or (writer, fileobj,
+            kwargs) tuples. Each writer writes to its fileobj, passing kwargs
+            (e.g. caption for a L{HtmlWriter}) to its write method.
+        '''
+        self.outputs = [ tuple(output) + ({},) * (3 - len(output))
+            for output in outputs ]
+
+    def write(self, tabular_data):
+        '''Write tabular_data (a L{TabularData}, possibly streamed) to every
+        output.'''
+        schema = getattr(tabular_data, 'schema', None)
+        running = []
+        groups = self._groups()
+        branches = itertools.tee(iter(tabular_data.data), len(groups))
+        for group, rows in zip(groups, branches):
+            formatted = len(group) > 1
+            if formatted:
+                rows = group[0][0].iter_formatted(rows, schema)
+            for (writer, fileobj, kwargs), rows in zip(group,
+                    itertools.tee(rows, len(group))):
+                counted = _Counted(rows)
+                table = TabularData(data=counted, header=tabular_data.header)
+                table.schema = schema
+                table.formatted = formatted
+                running.append((writer.iter_write(table, **kwargs), fileobj,
+                    counted))
+        target = 0
+        while running:
+            target += self.batch_size
+            for output in list(running):
+                fragments, fileobj, counted = output
+                try:
+                    # once the rows are exhausted finish the output
+                    while counted.done or counted.count < target:
+                        fileobj.write(fragments.next())
+                except StopIteration:
+                    running.remove(output)
+
+    def _groups(self):
+        '''Group outputs whose writers convert values to text in the same
+        way (writers which do not convert values are on their own).'''
+        groups = []
+        by_key = {}
+        for output in self.outputs:
+            key = output[0].format_key()
+            if key is None:
+                groups.append([ output ])
+            elif key in by_key:
+                by_key[key].append(output)
+            else:
+                by_key[key] = [ output ]
+                groups.append(by_key[key])
+        return groups
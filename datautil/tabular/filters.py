@@ -0,0 +1,304 @@
+'''Declarative row filters which readers can apply while parsing.
+
+    where = (Col('Country') == 'UK') & Col('Year', int).between(2000, 2010)
+    where = Col('Code').isin(['A', 'B']) | ~Col('Value').is_null()
+    table = CsvReader().read('big.csv', where=where)
+
+    test = where.compile(header)
+    rows = [ row for row in rows if test(row) ]
+
+Columns are header names or indexes. A filter is compiled (for a given
+header) into a single python function so testing a row costs no more than a
+hand written lambda.
+
+Semantics:
+  * Col(col, convert) applies convert (e.g. int, float or misc.floatify) to
+    values before comparing them. Csv values are strings so numeric
+    comparisons normally need a convert function.
+  * comparisons (and isin / between) are false if the value is missing (the
+    row is too short), cannot be converted or (for ordering comparisons) is
+    None.
+  * is_null() is true for None, blank and placeholder values (see
+    datautil.misc.placeholders) and missing values.
+'''
+import operator
+
+from datautil.misc import placeholders
+
+_null_strings = frozenset(placeholders)
+
+def _is_null(value):
+    return value is None or (isinstance(value, basestring) and
+            value.strip() in _null_strings)
+
+# exceptions meaning a row does not match (rather than a bug)
+_NO_MATCH_ERRORS = (IndexError, ValueError, TypeError)
+
+
+def compile_where(where, header=None):
+    '''Return a function testing rows for where (a L{Predicate} or already a
+    function taking a row).'''
+    if isinstance(where, Predicate):
+        return where.compile(header)
+    return where
+
+
+class Predicate(object):
+    '''Base class for filters. Combine them with & (and), | (or) and ~
+    (not).'''
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __nonzero__(self):
+        raise TypeError('Filters cannot be used as booleans: combine them '
+            'with &, | and ~ rather than and, or and not')
+
+    def resolve(self, header):
+        '''Return an equivalent filter referring to columns by index.'''
+        raise NotImplementedError
+
+    def compile(self, header=None):
+        '''Compile to a function taking a row and returning True or False.
+
+        @param header: header used to look up column names.
+        '''
+        predicate = self.resolve(header or [])
+        namespace = { '_is_null': _is_null, '_errors': _NO_MATCH_ERRORS,
+            '_slow': predicate._evaluate }
+        source = ('def test(row):\n'
+            '    try:\n'
+            '        return %s\n'
+            '    except _errors:\n'
+            # redo the tests one by one (each treating errors as no match)
+            '        return _slow(row)\n') % predicate._source(namespace)
+        exec source in namespace
+        return namespace['test']
+
+    def _source(self, namespace):
+        '''Python expression (for a row called row) for this test. Values
+        are added to namespace.'''
+        raise NotImplementedError
+
+    def _evaluate(self, row):
+        '''Test row (errors count as not matching).'''
+        raise NotImplementedError
+
+
+def _add(namespace, value):
+    name = '_v%s' % len(namespace)
+    namespace[name] = value
+    return name
+
+
+class Col(object):
+    '''A column (header name or index) which filters are built from.'''
+    # comparison operators return filters
+    __hash__ = None
+
+    def __init__(self, col, convert=None):
+        '''
+        @param convert: function applied to values before testing them.
+        '''
+        self.col = col
+        self.convert = convert
+
+    def resolve(self, header):
+        if isinstance(self.col, int):
+            return self
+        return Col(list(header).index(self.col), self.convert)
+
+    def _source(self, namespace):
+        source = 'row[%d]' % self.col
+        if self.convert is not None:
+            source = '%s(%s)' % (_add(namespace, self.convert), source)
+        return source
+
+    def value(self, row):
+        value = row[self.col]
+        if self.convert is not None:
+            value = self.convert(value)
+        return value
+
+    def __eq__(self, value):
+        return Compare(self, '==', value)
+
+    def __ne__(self, value):
+        return Compare(self, '!=', value)
+
+    def __lt__(self, value):
+        return Compare(self, '<', value)
+
+    def __le__(self, value):
+        return Compare(self, '<=', value)
+
+    def __gt__(self, value):
+        return Compare(self, '>', value)
+
+    def __ge__(self, value):
+        return Compare(self, '>=', value)
+
+    def isin(self, values):
+        return IsIn(self, values)
+
+    def between(self, low, high):
+        '''Inclusive range test: low <= value <= high.'''
+        return Between(self, low, high)
+
+    def is_null(self):
+        return IsNull(self)
+
+    def not_null(self):
+        return Not(IsNull(self))
+
+
+class Compare(Predicate):
+    operators = {
+        '==': operator.eq,
+        '!=': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+        }
+
+    def __init__(self, col, op, value):
+        self.col = col
+        self.op = op
+        self.value = value
+
+    def resolve(self, header):
+        return Compare(self.col.resolve(header), self.op, self.value)
+
+    def _source(self, namespace):
+        value = _add(namespace, self.value)
+        if self.op in ('==', '!='):
+            return '%s %s %s' % (self.col._source(namespace), self.op,
+                    value)
+        if self.col.convert is None:
+            cell = self.col._source(namespace)
+            return '%s is not None and %s %s %s' % (cell, cell, self.op,
+                    value)
+        # bind the converted value to a name so it is only computed once
+        return '(lambda _x: _x is not None and _x %s %s)(%s)' % (self.op,
+                value, self.col._source(namespace))
+
+    def _evaluate(self, row):
+        try:
+            value = self.col.value(row)
+            if value is None and self.op not in ('==', '!='):
+                return False
+            return self.operators[self.op](value, self.value)
+        except _NO_MATCH_ERRORS:
+            return False
+
+
+class IsIn(Predicate):
+    def __init__(self, col, values):
+        self.col = col
+        self.values = frozenset(values)
+
+    def resolve(self, header):
+        return IsIn(self.col.resolve(header), self.values)
+
+    def _source(self, namespace):
+        return '%s in %s' % (self.col._source(namespace),
+                _add(namespace, self.values))
+
+    def _evaluate(self, row):
+        try:
+            return self.col.value(row) in self.values
+        except _NO_MATCH_ERRORS:
+            return False
+
+
+class Between(Predicate):
+    def __init__(self, col, low, high):
+        self.col = col
+        self.low = low
+        self.high = high
+
+    def resolve(self, header):
+        return Between(self.col.resolve(header), self.low, self.high)
+
+    def _source(self, namespace):
+        return '%s <= %s <= %s' % (_add(namespace, self.low),
+                self.col._source(namespace), _add(namespace, self.high))
+
+    def _evaluate(self, row):
+        try:
+            value = self.col.value(row)
+            return value is not None and self.low <= value <= self.high
+        except _NO_MATCH_ERRORS:
+            return False
+
+
+class IsNull(Predicate):
+    def __init__(self, col):
+        self.col = col
+
+    def resolve(self, header):
+        return IsNull(self.col.resolve(header))
+
+    def _source(self, namespace):
+        return '_is_null(%s)' % self.col._source(namespace)
+
+    def _evaluate(self, row):
+        try:
+            return _is_null(self.col.value(row))
+        except IndexError:
+            return True
+        except _NO_MATCH_ERRORS:
+            return False
+
+
+class And(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def resolve(self, header):
+        return self.__class__(*[ predicate.resolve(header)
+            for predicate in self.predicates ])
+
+    def _source(self, namespace):
+        return '(%s)' % ' and '.join([ '(%s)' % predicate._source(namespace)
+            for predicate in self.predicates ])
+
+    def _evaluate(self, row):
+        for predicate in self.predicates:
+            if not predicate._evaluate(row):
+                return False
+        return True
+
+
+class Or(And):
+    def _source(self, namespace):
+        return '(%s)' % ' or '.join([ '(%s)' % predicate._source(namespace)
+            for predicate in self.predicates ])
+
+    def _evaluate(self, row):
+        for predicate in self.predicates:
+            if predicate._evaluate(row):
+                return True
+        return False
+
+
+class Not(Predicate):
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def resolve(self, header):
+        return Not(self.predicate.resolve(header))
+
+    def _source(self, namespace):
+        return 'not (%s)' % self.predicate._source(namespace)
+
+    def _evaluate(self, row):
+        return not self.predicate._evaluate(row)
+
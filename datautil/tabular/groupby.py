@@ -0,0 +1,106 @@
+'''Group rows of tabular data and aggregate each group.
+
+    group_by(table, 'Name', [ ('Value', 'sum'), ('Value', 'count') ])
+
+Aggregation is done with an in-memory hash table. Once the number of groups
+held in memory reaches max_groups, rows belonging to further groups are
+partitioned (by hash of their key) into temporary files which are then
+aggregated in turn. Memory use is therefore bounded whatever the number of
+groups.
+'''
+from operator import itemgetter
+
+from base import TabularData, column_index
+from reducers import get_reducer
+from spill import run_partitioned
+
+
+def group_by(table, keys, aggregations, header=None, max_groups=100000,
+        partitions=16):
+    '''Group table by the values in columns keys and aggregate each group.
+
+    @param table: L{TabularData} (possibly streamed or a L{LazyTable}) or any
+        iterable of rows. Rows are only iterated over once.
+    @param keys: column (header name or index) or list of columns to group
+        by.
+    @param aggregations: list of (column, reducer) or (column, reducer,
+        output name) tuples. reducer is a name from reducers.REDUCERS (e.g.
+        'sum', 'count', 'mean') or a Reducer subclass. column may be None for
+        'count'.
+    @param header: header for table (default table.header if it exists).
+    @param max_groups: maximum number of groups to hold in memory before
+        spilling rows to disk.
+    @param partitions: number of temporary files to spill to.
+    @return: L{TabularData} with one row per group holding the key values
+        followed by the aggregates. NB: groups are not in any particular
+        order.
+    '''
+    if max_groups < 1:
+        raise ValueError('max_groups must be at least 1')
+    if header is None:
+        header = getattr(table, 'header', None) or []
+    if isinstance(keys, (basestring, int)):
+        keys = [ keys ]
+    key_indices = [ column_index(header, key) for key in keys ]
+
+    reducers = []
+    value_indices = []
+    out_header = [ header[idx] if header else idx for idx in key_indices ]
+    for agg in aggregations:
+        col, reducer = agg[0], agg[1]
+        reducer = get_reducer(reducer)
+        reducers.append(reducer)
+        value_indices.append(None if col is None else
+                column_index(header, col))
+        if len(agg) > 2:
+            name = agg[2]
+        else:
+            name = '%s_%s' % (reducer.__name__.lower(),
+                    'all' if col is None else col)
+        out_header.append(name)
+
+    if len(key_indices) == 1:
+        index = key_indices[0]
+        keyfunc = lambda row: (row[index],)
+    else:
+        keyfunc = itemgetter(*key_indices)
+    rows = table.data if isinstance(table, TabularData) else table
+    aggregator = _HashAggregator(keyfunc, reducers, value_indices,
+            max_groups, partitions)
+    data = [ list(key) + results for key, results in aggregator.run(rows) ]
+    return TabularData(data=data, header=out_header)
+
+
+class _HashAggregator(object):
+    def __init__(self, keyfunc, reducers, value_indices, max_groups,
+            partitions):
+        self.keyfunc = keyfunc
+        self.reducers = reducers
+        self.value_indices = value_indices
+        self.max_groups = max_groups
+        self.partitions = partitions
+
+    def run(self, rows):
+        '''Aggregate rows yielding (key, results) pairs.'''
+        return run_partitioned(self._aggregate, rows, self.partitions)
+
+    def _aggregate(self, rows, spill):
+        keyfunc = self.keyfunc
+        reducers = self.reducers
+        columns = zip(range(len(reducers)), self.value_indices)
+        max_groups = self.max_groups
+        groups = {}
+        for row in rows:
+            key = keyfunc(row)
+            accs = groups.get(key)
+            if accs is None:
+                if len(groups) >= max_groups:
+                    # plain tuple (a smaller pickle than e.g. a compact row)
+                    spill(key, tuple(row))
+                    continue
+                accs = groups[key] = [ reducer() for reducer in reducers ]
+            for ii, col in columns:
+                accs[ii].add(None if col is None else row[col])
+        for key, accs in groups.iteritems():
+            yield key, [ acc.result() for acc in accs ]
+
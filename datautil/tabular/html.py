@@ -1,4 +1,6 @@
 import re
+import cgi
+import itertools
 from HTMLParser import HTMLParser
 
 from base import TabularData, ReaderBase, WriterBase
@@ -8,13 +10,16 @@ class HtmlReader(ReaderBase):
     '''Read data from HTML table into L{TabularData}.
 
     '''
-    def read(self, filepath_or_fileobj=None, table_index=0):
+    def read(self, filepath_or_fileobj=None, table_index=0,
+            infer_types=False):
         '''Read data from fileobj.
 
         NB: post read all tables extracted are in attribute named 'tables'.
 
         @arg table_index: if multiple tables in the html return table at this
             index.
+        @arg infer_types: infer column types of the returned table and
+            convert values to them (see `ReaderBase.convert_types`).
         @return: L{TabularData} object (all content in the data part, i.e. no
         header).
         '''
@@ -23,7 +28,10 @@ class HtmlReader(ReaderBase):
         parser.reset()
         parser.feed(self.fileobj.read())
         self.tables = parser.tables
-        return self.tables[table_index]
+        tab = self.tables[table_index]
+        if infer_types:
+            self.convert_types(tab)
+        return tab
 
 
 class _OurTableExtractor(HTMLParser):
@@ -67,6 +75,8 @@ class HtmlWriter(WriterBase):
     """
     Write tabular data to xhtml
     """
+    escape_text = staticmethod(cgi.escape)
+    formats_values = True
     
     def __init__(self, round_ndigits=2, pretty_print=False, table_attributes = {'class': 'data'}):
         """
@@ -83,15 +93,46 @@ class HtmlWriter(WriterBase):
         Write matrix of data to xhtml table.
         Allow for addition of row and column headings
         
-        @return xhtml table containing data
-        
+        Rows are written to fileobj as they are formatted (unless
+        pretty_print is set in which case the whole table has to be built
+        first).
+
         @param data: table of data that makes up table
         @param caption: the caption for the table (if empty no caption created)
         @param rowHeadings: additional headings for rows (separate from
         tabulardata)
         """
+        for fragment in self.iter_write(tabulardata, caption, rowHeadings):
+            fileobj.write(fragment)
+
+    def iter_write(self, tabulardata, caption = '', rowHeadings = []):
+        fragments = self.iter_html(tabulardata, caption, rowHeadings)
+        if self.pretty_print:
+            return iter([ self.prettyPrint(''.join(fragments)) ])
+        return fragments
+
+    def iter_html(self, tabulardata, caption = '', rowHeadings = [],
+            encoding=None):
+        """
+        Generate the xhtml table (arguments as for write) in fragments: the
+        start of the table, one fragment per row and then the end of the
+        table.
+
+        Data is read as it is needed so this can be used to stream a
+        large (or lazily read) table, e.g. as the response of a WSGI
+        application.
+
+        @param encoding: if set encode the fragments using this encoding
+            (WSGI requires byte strings).
+        """
+        fragments = self._iter_html(tabulardata, caption, rowHeadings)
+        if encoding is None:
+            return fragments
+        return ( fragment.encode(encoding) for fragment in fragments )
+
+    def _iter_html(self, tabulardata, caption, rowHeadings):
         columnHeadings = tabulardata.header
-        data = tabulardata.data
+        rows = iter(tabulardata.data)
         haveRowHeadings = (len(rowHeadings) > 0)
         
         htmlTable = '<table'
@@ -107,35 +148,34 @@ class HtmlWriter(WriterBase):
         # if we there are rowHeadings may want to add blank column at front
         numColHeads = len(columnHeadings)
         if numColHeads > 0:
-            if haveRowHeadings and numColHeads == len(data[0]):
-                # [[TODO: is this dangerous? should i make a copy ...]]
-                columnHeadings.insert(0, '')
+            if haveRowHeadings:
+                first = next(rows, None)
+                if first is not None:
+                    rows = itertools.chain([ first ], rows)
+                    if numColHeads == len(first):
+                        # copy rather than changing the caller's header
+                        columnHeadings = [ '' ] + list(columnHeadings)
             htmlTable += self.writeHeading(columnHeadings)
         
         htmlTable += '<tbody>'
         if self.pretty_print:
             htmlTable += '\n'
+        yield htmlTable
         
-        for ii in range(0, len(data)):
-            # have to add 1 as first row is headings
+        writeTexts = self._writeTexts
+        # convert values to text (unless already done, see
+        # WriterBase._formatted_data)
+        if not getattr(tabulardata, 'formatted', False):
+            rows = self.iter_formatted(rows,
+                    getattr(tabulardata, 'schema', None))
+        for ii, texts in enumerate(rows):
             if haveRowHeadings:
-                htmlTable += self.writeRow(data[ii], rowHeadings[ii])
+                yield writeTexts(texts, rowHeadings[ii])
             else:
-                htmlTable += self.writeRow(data[ii])
-        
-        htmlTable += '</tbody></table>'
-        
-        if self.pretty_print:
-            fileobj.write(self.prettyPrint(htmlTable))
-        else:
-            fileobj.write(htmlTable)
-
-    def value_to_str(self, value):
-        import cgi
-        out = super(HtmlWriter, self).value_to_str(value)
-        out = cgi.escape(out)
-        return out
+                yield writeTexts(texts)
         
+        yield '</tbody></table>'
+
     def writeHeading(self, row):
         """
         Write heading for html table (<thead>)
@@ -148,20 +188,23 @@ class HtmlWriter(WriterBase):
         return result
     
     def writeRow(self, row, rowHeading = ''):
+        return self._writeTexts([ self.value_to_str(value) for value in row ],
+                rowHeading)
+
+    def _writeTexts(self, texts, rowHeading = ''):
+        # texts: the row's values already converted to (escaped) text
         result = ''
         if rowHeading != '':
             result = '<th>%s</th>' % self.value_to_str(rowHeading)
-        result += self.writeGeneralRow(row, 'td')
+        result += ''.join([ '<td>%s</td>' % text for text in texts ])
         result = '<tr>%s</tr>' % result
         if self.pretty_print:
             result += '\n'
         return result
     
     def writeGeneralRow(self, row, tagName):
-        result = ''
-        for ii in range(len(row)):
-            result += '<%s>%s</%s>' % (tagName, self.value_to_str(row[ii]), tagName)
-        return result
+        return ''.join([ '<%s>%s</%s>' % (tagName, self.value_to_str(value),
+            tagName) for value in row ])
         
     def prettyPrint(self, html):
         """pretty print html using HTMLTidy"""
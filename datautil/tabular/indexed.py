@@ -0,0 +1,210 @@
+'''Random access to rows of (large) csv files.
+
+L{IndexedCsv} memory maps a csv file and builds an index holding the byte
+offset of every record. Individual rows and slices can then be read without
+parsing the rest of the file::
+
+    table = IndexedCsv('big.csv')
+    len(table)
+    table[5000000]
+    table[100:120]
+    for row in table.iter_rows(start=2500000): # resume part way through
+        ...
+
+The index is an array of unsigned longs (8 bytes per row on 64 bit
+platforms) and is saved next to the file (filepath + '.idx'). It is reused
+for as long as the size and modification time of the csv file are
+unchanged.
+'''
+import os
+import csv
+import codecs
+import mmap
+import array
+import struct
+from cStringIO import StringIO
+
+from base import TabularData, CsvReader
+from parallel import is_splittable, next_record_start
+
+
+class IndexedCsv(TabularData):
+    '''Csv file supporting len(), indexing and slicing of its rows.
+
+    Properties:
+      * header: header of the csv file (if it has one)
+      * data: the IndexedCsv itself (a read-only sequence of rows)
+      * offsets: array of record offsets (with the file size appended)
+    '''
+    # magic, typecode item size, file size, file mtime, number of offsets
+    _index_header = struct.Struct('<4sQQdQ')
+    _index_magic = 'DUIX'
+
+    def __init__(self, filepath, encoding='utf-8', has_header=None,
+            index_path=None, **kwargs):
+        '''
+        @param has_header: whether the file has a header row (if None sniff
+            for one as CsvReader does).
+        @param index_path: where to save the index (defaults to filepath +
+            '.idx'). Set to False not to persist the index.
+        @param kwargs: passed to csv.reader.
+        '''
+        if not is_splittable(encoding):
+            raise ValueError('Cannot index files encoded as %s' % encoding)
+        self.filepath = filepath
+        self.encoding = encoding
+        # rows are returned encoded as utf-8 (as by CsvReader)
+        self._recode = codecs.lookup(encoding).name != 'utf-8'
+        self.csvkwargs = CsvReader()._csv_kwargs(kwargs)
+        if index_path is None:
+            index_path = filepath + '.idx'
+        self.index_path = index_path
+
+        self.fileobj = open(filepath, 'rb')
+        size = os.fstat(self.fileobj.fileno()).st_size
+        if size:
+            self.mmap = mmap.mmap(self.fileobj.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        else: # cannot mmap an empty file
+            self.mmap = ''
+
+        self.header = []
+        if has_header is None and size:
+            reader = CsvReader()
+            reader.iter_rows(self.fileobj, encoding=encoding, **kwargs)
+            has_header = bool(reader.header)
+        start = 0
+        if has_header and size:
+            quotechar = self.csvkwargs.get('quotechar', '"')
+            start = next_record_start(self.fileobj, 0, quotechar=quotechar)
+            self.header = self._parse(0, start)[0]
+        self.offsets = self._load_index(start)
+
+    @property
+    def data(self):
+        return self
+
+    def close(self):
+        if self.mmap:
+            self.mmap.close()
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        nrows = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(nrows)
+            if step != 1:
+                return [ self[ii] for ii in xrange(start, stop, step) ]
+            if start >= stop:
+                return []
+            return self._parse(self.offsets[start], self.offsets[stop])
+        if index < 0:
+            index += nrows
+        if not 0 <= index < nrows:
+            raise IndexError('row index out of range')
+        return self._parse(self.offsets[index], self.offsets[index+1])[0]
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def iter_rows(self, start=0):
+        '''Iterate over rows beginning with row number start.'''
+        if start >= len(self):
+            return iter([])
+        lines = self._iter_lines(self.offsets[start])
+        if self._recode:
+            encoding = self.encoding
+            lines = ( line.decode(encoding).encode('utf-8') for line in lines )
+        return csv.reader(lines, **self.csvkwargs)
+
+    def _iter_lines(self, pos):
+        # track our own position (rather than mmap.readline) so several
+        # iterators can be used at once
+        mm = self.mmap
+        size = len(mm)
+        while pos < size:
+            end = mm.find('\n', pos)
+            end = size if end == -1 else end + 1
+            yield mm[pos:end]
+            pos = end
+
+    def _parse(self, start, end):
+        text = self.mmap[start:end]
+        if self._recode:
+            text = text.decode(self.encoding).encode('utf-8')
+        return list(csv.reader(StringIO(text), **self.csvkwargs))
+
+    def _file_stamp(self):
+        stat = os.stat(self.filepath)
+        return stat.st_size, stat.st_mtime
+
+    def _load_index(self, start):
+        size, mtime = self._file_stamp()
+        itemsize = array.array('L').itemsize
+        if self.index_path and os.path.exists(self.index_path):
+            fo = open(self.index_path, 'rb')
+            try:
+                header = fo.read(self._index_header.size)
+                if len(header) == self._index_header.size:
+                    magic, isize, fsize, fmtime, count = \
+                        self._index_header.unpack(header)
+                    if (magic, isize, fsize, fmtime) == \
+                            (self._index_magic, itemsize, size, mtime):
+                        offsets = array.array('L')
+                        offsets.fromfile(fo, count)
+                        if offsets and offsets[0] == start:
+                            return offsets
+            except EOFError: # truncated index
+                pass
+            finally:
+                fo.close()
+        offsets = self._build_index(start)
+        if self.index_path:
+            fo = open(self.index_path, 'wb')
+            try:
+                fo.write(self._index_header.pack(self._index_magic, itemsize,
+                    size, mtime, len(offsets)))
+                offsets.tofile(fo)
+            finally:
+                fo.close()
+        return offsets
+
+    def _build_index(self, start, blocksize=1 << 20):
+        '''Scan the file recording the offset at which each record starts.
+        '''
+        mm = self.mmap
+        size = len(mm)
+        quotechar = self.csvkwargs.get('quotechar', '"')
+        offsets = array.array('L', [ start ])
+        append = offsets.append
+        inquote = False
+        pos = start
+        while pos < size:
+            block = mm[pos:pos+blocksize]
+            begin = 0
+            while True:
+                newline = block.find('\n', begin)
+                if newline == -1:
+                    if block.count(quotechar, begin) % 2:
+                        inquote = not inquote
+                    break
+                if block.count(quotechar, begin, newline) % 2:
+                    inquote = not inquote
+                if not inquote:
+                    append(pos + newline + 1)
+                begin = newline + 1
+            pos += len(block)
+        if offsets[-1] != size:
+            # last record has no trailing newline
+            append(size)
+        return offsets
+
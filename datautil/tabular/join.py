@@ -0,0 +1,145 @@
+'''Join two tables on key columns.
+
+    join(csv_table, lookup_table, 'Code')
+    join(csv_table, lookup_table, ['Country', 'Year'], how='left')
+
+If the right hand table fits in memory (at most max_build_rows rows) a hash
+join is used: the right table is loaded into a dict keyed by the join key
+and the left table is streamed past it (so output is in left table order).
+
+Otherwise both tables are sorted on the key with an external sort (see
+spill.external_sort) and merged. Output is then in key order.
+
+Either way the result is a L{LazyTable} so joined rows are produced as they
+are iterated over.
+'''
+from itertools import groupby, chain
+from operator import itemgetter
+
+from base import TabularData, column_index
+from lazy import LazyTable
+from spill import external_sort
+
+JOIN_TYPES = [ 'inner', 'left', 'anti' ]
+
+
+def _key_function(header, cols):
+    if isinstance(cols, (basestring, int)):
+        cols = [ cols ]
+    indices = [ column_index(header, col) for col in cols ]
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indices)
+
+def join(left, right, left_on, right_on=None, how='inner',
+        max_build_rows=1000000):
+    '''Join tables left and right where the values in columns left_on (of
+    left) equal those in right_on (of right).
+
+    @param left, right: L{TabularData} (possibly streamed or a LazyTable) or
+        any iterable of rows.
+    @param left_on: column (header name or index) or list of columns.
+    @param right_on: columns of right to match (default same as left_on).
+    @param how: one of JOIN_TYPES:
+        * inner: rows of left joined with each matching row of right.
+        * left: as inner but left rows without a match are also returned
+          (padded with None for the right hand columns).
+        * anti: rows of left with no match in right (left columns only).
+    @param max_build_rows: maximum number of rows of right to hold in memory
+        for a hash join. Beyond this a sort-merge join is used.
+    @return: L{LazyTable} whose header is the header of left followed by
+        that of right (just that of left for an anti join).
+    '''
+    if how not in JOIN_TYPES:
+        raise ValueError('Unknown join type: %s' % how)
+    if right_on is None:
+        right_on = left_on
+    left_header = getattr(left, 'header', None) or []
+    right_header = getattr(right, 'header', None) or []
+    left_key = _key_function(left_header, left_on)
+    right_key = _key_function(right_header, right_on)
+    if how == 'anti':
+        header = list(left_header)
+    else:
+        header = list(left_header) + list(right_header)
+    rows = _join(_rows(left), _rows(right), left_key, right_key, how,
+            max_build_rows, len(right_header))
+    return LazyTable(rows, header=header)
+
+def _rows(table):
+    if isinstance(table, TabularData):
+        return iter(table.data)
+    return iter(table)
+
+def _join(left, right, left_key, right_key, how, max_build_rows,
+        right_width):
+    # (a generator so nothing is read until the result is iterated over)
+    # build a hash table from right unless it turns out to be too big
+    build = {}
+    count = 0
+    first = None
+    for row in right:
+        if count == 0:
+            first = row
+        count += 1
+        if count > max_build_rows:
+            # rows read so far come from build (grouped by key, so the
+            # stable sort of the merge join gives the same order)
+            read = chain.from_iterable(build.itervalues())
+            rows = _merge_join(left, chain(read, [ row ], right), left_key,
+                    right_key, how, max_build_rows,
+                    _width(first, right_width))
+            break
+        build.setdefault(right_key(row), []).append(row)
+    else:
+        rows = _hash_join(left, build, left_key, how,
+                _width(first, right_width))
+    del build, first
+    for row in rows:
+        yield row
+
+def _width(first, default):
+    if default or first is None:
+        return default
+    return len(first)
+
+def _hash_join(left, build, left_key, how, right_width):
+    padding = [ None ] * right_width
+    for row in left:
+        matches = build.get(left_key(row))
+        if how == 'anti':
+            if matches is None:
+                yield row
+        elif matches is not None:
+            for match in matches:
+                yield list(row) + list(match)
+        elif how == 'left':
+            yield list(row) + padding
+
+def _merge_join(left, right, left_key, right_key, how, max_rows,
+        right_width):
+    left_groups = groupby(external_sort(left, left_key, max_rows), left_key)
+    right_groups = groupby(external_sort(right, right_key, max_rows),
+            right_key)
+    rkey, rgroup = next(right_groups, (None, None))
+    padding = [ None ] * right_width
+    for lkey, lgroup in left_groups:
+        while rgroup is not None and rkey < lkey:
+            rkey, rgroup = next(right_groups, (None, None))
+        if rgroup is not None and rkey == lkey:
+            if how == 'anti':
+                continue
+            # only the rows for a single key are held in memory
+            matches = [ list(match) for match in rgroup ]
+            rkey, rgroup = next(right_groups, (None, None))
+            for row in lgroup:
+                for match in matches:
+                    yield list(row) + match
+        elif how == 'anti':
+            for row in lgroup:
+                yield row
+        elif how == 'left':
+            for row in lgroup:
+                yield list(row) + padding
+
@@ -0,0 +1,143 @@
+'''Lazy, chainable transformations of tabular data.
+
+A L{LazyTable} wraps an iterable of rows (for example a TabularData streamed
+from CsvReader.read(stream=True)) and records operations rather than
+performing them::
+
+    reader = CsvReader()
+    table = LazyTable(reader.read(fileobj, stream=True))
+    out = table.select('Year', 'Value').filter(lambda row: row[1] != '') \\
+        .rename({'Value': 'Amount'}).limit(1000)
+    CsvWriter().write(out, outfileobj)
+
+All the recorded operations are fused and applied in a single pass over the
+source when the table is iterated (or written by a writer) so memory use does
+not depend on the number of rows.
+'''
+from operator import itemgetter
+
+from base import TabularData, column_index
+
+_MAP = 0
+_FILTER = 1
+_LIMIT = 2
+
+
+class LazyTable(TabularData):
+    '''TabularData whose rows are computed on iteration.
+
+    Properties:
+      * header: header columns (with any select / rename applied).
+      * data: an iterator over the (transformed) rows. NB: if the source is
+        itself an iterator it can only be consumed once.
+
+    Every operation returns a new LazyTable and leaves the original
+    unchanged.
+    '''
+
+    def __init__(self, source=None, header=None):
+        '''
+        @param source: L{TabularData} or any iterable of rows.
+        @param header: header for the rows (defaults to source.header when
+            source is a TabularData).
+        '''
+        if source is None:
+            source = []
+        if header is None:
+            header = getattr(source, 'header', None) or []
+        if isinstance(source, TabularData):
+            source = source.data
+        self.source = source
+        self.header = header
+        self._steps = []
+
+    def _derive(self, kind=None, arg=None, header=None):
+        out = LazyTable.__new__(LazyTable)
+        out.source = self.source
+        out.header = self.header if header is None else header
+        out._steps = list(self._steps)
+        if kind is not None:
+            out._steps.append((kind, arg))
+        return out
+
+    @property
+    def data(self):
+        return iter(self)
+
+    def __iter__(self):
+        if not self._steps:
+            return iter(self.source)
+        return self._run()
+
+    def _run(self):
+        steps = self._steps
+        nsteps = len(steps)
+        counts = [ 0 ] * nsteps
+        for row in self.source:
+            exhausted = False
+            ii = 0
+            while ii < nsteps:
+                kind, arg = steps[ii]
+                if kind == _MAP:
+                    row = arg(row)
+                elif kind == _FILTER:
+                    if not arg(row):
+                        break
+                else: # _LIMIT
+                    if counts[ii] >= arg:
+                        return
+                    counts[ii] += 1
+                    # nothing further can get past this step so stop
+                    # without pulling another row from the source
+                    exhausted = counts[ii] >= arg
+                ii += 1
+            else:
+                yield row
+            if exhausted:
+                return
+
+    def select(self, *cols):
+        '''Select columns (by header name or index) in the given order.'''
+        indices = [ column_index(self.header, col) for col in cols ]
+        getter = itemgetter(*indices)
+        if len(indices) == 1:
+            func = lambda row: (getter(row),)
+        else:
+            func = getter
+        header = None
+        if self.header:
+            header = [ self.header[idx] for idx in indices ]
+        return self._derive(_MAP, func, header)
+
+    def filter(self, predicate):
+        '''Only keep rows for which predicate(row) is true.'''
+        return self._derive(_FILTER, predicate)
+
+    def map(self, func, header=None):
+        '''Replace each row by func(row).
+
+        @param header: new header if func changes the columns.
+        '''
+        return self._derive(_MAP, func, header)
+
+    def rename(self, names):
+        '''Rename header columns.
+
+        @param names: dict mapping old names to new names or a list of new
+            names.
+        '''
+        if isinstance(names, dict):
+            header = [ names.get(name, name) for name in self.header ]
+        else:
+            header = list(names)
+        return self._derive(header=header)
+
+    def limit(self, count):
+        '''Stop after count rows.'''
+        return self._derive(_LIMIT, count)
+
+    def to_tabular(self):
+        '''Run the pipeline and return the result as a L{TabularData}.'''
+        return TabularData(data=[ list(row) for row in self ],
+                header=list(self.header))
+
@@ -1,28 +1,134 @@
 '''General Helper methods for tabular data.
 '''
+import itertools
+
 from base import TabularData
+from reducers import get_reducer
+from lazy import LazyTable
+from spill import SpillFile
 
 def transpose(data):
     '''Transpose a list of lists.
     
     Or do it directy: data = zip(*data)
+
+    For matrices too large to hold in memory use L{transpose_blocked}.
     '''
     return zip(*data)
 
+def transpose_blocked(rows, max_cells=10000000, block_width=100, fill=None):
+    '''Transpose a matrix using a bounded amount of memory.
+
+    If the matrix has at most max_cells cells it is transposed in memory.
+    Otherwise rows are split into blocks of block_width columns which are
+    written to temporary files (see L{SpillFile}). The transposed rows are
+    then built from each block in turn, as many at once as fit in max_cells.
+
+    @param rows: list of lists, any iterable of rows (e.g. a streamed
+        L{TabularData}'s data) or a L{TabularData} (whose header, if it has
+        one, becomes the first column of the output). Rows are only iterated
+        over once.
+    @param max_cells: maximum number of cells to hold in memory (at least
+        one transposed row is always held).
+    @param block_width: number of columns per temporary file.
+    @param fill: value used to pad rows shorter than the longest row.
+    @return: iterator over the transposed rows (lists).
+    '''
+    if isinstance(rows, TabularData):
+        if rows.header:
+            rows = itertools.chain([ rows.header ], rows.data)
+        else:
+            rows = rows.data
+    return _transpose_blocked(iter(rows), max_cells, block_width, fill)
+
+def _transpose_blocked(rows, max_cells, block_width, fill):
+    # (a generator so nothing is read until the result is iterated over)
+    buffered = []
+    cells = 0
+    for row in rows:
+        buffered.append(row)
+        cells += len(row)
+        if cells > max_cells:
+            break
+    else:
+        width = max([ len(row) for row in buffered ] or [ 0 ])
+        for ii in xrange(width):
+            yield [ row[ii] if ii < len(row) else fill for row in buffered ]
+        return
+
+    spills = []
+    # number of rows before the first one long enough to reach each block
+    starts = []
+    nrows = 0
+    width = 0
+    try:
+        for row in _drain(buffered, rows):
+            rowlen = len(row)
+            while len(spills) * block_width < rowlen:
+                spills.append(SpillFile())
+                starts.append(nrows)
+            for block, spill in enumerate(spills):
+                offset = block * block_width
+                spill.write(tuple(row[offset:offset + block_width]))
+            nrows += 1
+            width = max(width, rowlen)
+        per_pass = max(1, max_cells // nrows)
+        for block, spill in enumerate(spills):
+            ncols = min(block_width, width - block * block_width)
+            for first in xrange(0, ncols, per_pass):
+                indices = range(first, min(first + per_pass, ncols))
+                out = [ [ fill ] * starts[block] for ii in indices ]
+                for chunk in spill:
+                    chunklen = len(chunk)
+                    for ii, col in zip(indices, out):
+                        col.append(chunk[ii] if ii < chunklen else fill)
+                for col in out:
+                    yield col
+                del out
+    finally:
+        for spill in spills:
+            spill.close()
+
+def _drain(buffered, rows):
+    # iterate over buffered (releasing its rows) and then rows
+    buffered.reverse()
+    while buffered:
+        yield buffered.pop()
+    for row in rows:
+        yield row
+
+def project(table, cols):
+    '''Return a view of table with only the columns in cols.
+
+    No data is copied: each row is projected (to a tuple) as it is iterated
+    over so the cost is proportional to the number of columns selected.
+
+    @param table: L{TabularData}, list of lists or any iterable of rows.
+    @param cols: column indexes (or header names if table has a header) in
+        the order they should appear.
+    @return: L{LazyTable}.
+    '''
+    return LazyTable(table).select(*cols)
+
 def select_columns(matrix, cols):
-    '''Return a matrix with only those column indexes in cols.'''
-    tsp = transpose(matrix)
-    out = []
-    cols.sort()
-    for c in cols:
-        out.append(tsp[c])
-    return transpose(out)
+    '''Return a matrix (list of tuples) with only those column indexes in
+    cols (in ascending order, see project for columns in a given order).'''
+    return list(project(matrix, sorted(cols)))
 
 
-def pivot(table, left, top, value):
+def pivot(table, left, top, value, reducer=None, sparse=False, missing=''):
     """Unnormalize (pivot) a normalised input set of tabular data.
 
-    @param table: simple list of lists or a L{TabularData} object.
+    @param table: simple list of lists or a L{TabularData} object (or any
+        iterable of rows -- rows are only iterated over once).
+    @param reducer: how to combine values when more than one row has the same
+        left and top values. Either the name of a reducer ('sum', 'count',
+        'mean', 'min', 'max', 'first', 'last') or a Reducer subclass (see the
+        reducers module). Default is to keep the last value.
+    @param sparse: rather than the full matrix return only the cells which
+        have a value, as a TabularData with columns left, top, value (sorted
+        by left then top).
+    @param missing: value used for empty cells of the (non sparse) result.
     
     Eg. To transform the tabular data like
     
@@ -47,6 +153,11 @@ def pivot(table, left, top, value):
         OR (requires header to exist):
 
         pivot(tabulardata, 'Year', 'Name', 'Value')
+
+    To total up the values where there are several rows for the same Year
+    and Name:
+
+        pivot(tabulardata, 'Year', 'Name', 'Value', reducer='sum')
     """
     if not isinstance(left, int):
         left = table.header.index(left)
@@ -55,24 +166,37 @@ def pivot(table, left, top, value):
     if not isinstance(value, int):
         value = table.header.index(value)
 
+    # single pass over the rows accumulating into a dict keyed by
+    # (left, top) values
+    cells = {}
+    if reducer is None:
+        for row in table:
+            cells[(row[left], row[top])] = row[value]
+    else:
+        reducer = get_reducer(reducer)
+        for row in table:
+            key = (row[left], row[top])
+            acc = cells.get(key)
+            if acc is None:
+                acc = cells[key] = reducer()
+            acc.add(row[value])
+        for key, acc in cells.iteritems():
+            cells[key] = acc.result()
+
+    header = getattr(table, 'header', None)
     rs = TabularData()
-    # construct double dict keyed by left values
-    tdict = {}
-    xvals = set()
-    yvals = set()
-    for row in table:
-        xval = row[left]
-        if not xval in tdict:
-            tdict[xval] = {}
-        tdict[xval][row[top]] = row[value]
-        xvals.add(xval)
-        yvals.add(row[top])
-    xvals = sorted(list(xvals))
-    yvals = sorted(list(yvals))
+    if sparse:
+        if header:
+            rs.header = [ header[left], header[top], header[value] ]
+        rs.data = [ [ x, y, cells[(x, y)] ] for (x, y) in sorted(cells) ]
+        return rs
+    xvals = sorted(set([ key[0] for key in cells ]))
+    yvals = sorted(set([ key[1] for key in cells ]))
     xhead = 'X'
-    if hasattr(table, 'header') and table.header:
-        xhead = table.header[left]
+    if header:
+        xhead = header[left]
     rs.header = [ xhead ] + yvals
-    rs.data = [ [x] + [ tdict[x].get(y, '') for y in yvals ] for x in xvals ]
+    rs.data = [ [x] + [ cells.get((x, y), missing) for y in yvals ]
+        for x in xvals ]
     return rs
 
@@ -0,0 +1,163 @@
+'''Parse large csv files in parallel across processes.
+
+The file is split into byte ranges whose boundaries fall at the end of a
+record (taking account of newlines inside quoted fields). Each range is
+parsed in a separate process and the rows are reassembled in order.
+
+Usually used via CsvReader.read(filepath, parallel=N) rather than directly.
+'''
+import csv
+import codecs
+import itertools
+import multiprocessing
+from cStringIO import StringIO
+
+from filters import compile_where
+
+# encodings in which a newline or quote byte is always a newline or quote
+# character (so files can be split at arbitrary record boundaries)
+_splittable_encodings = set([ 'utf-8', 'ascii', 'iso8859-1', 'iso8859-15',
+    'cp1252' ])
+
+def is_splittable(encoding):
+    return codecs.lookup(encoding).name in _splittable_encodings
+
+
+def next_record_start(fileobj, pos, inquote=False, quotechar='"',
+        blocksize=1 << 16):
+    '''Find the offset of the first record starting at or after pos.
+
+    @param inquote: whether pos is inside a quoted field.
+    @return: offset (the file size if there is no further record).
+    '''
+    fileobj.seek(pos)
+    while True:
+        block = fileobj.read(blocksize)
+        if not block:
+            return pos
+        start = 0
+        while True:
+            newline = block.find('\n', start)
+            if newline == -1:
+                if block.count(quotechar, start) % 2:
+                    inquote = not inquote
+                break
+            if block.count(quotechar, start, newline) % 2:
+                inquote = not inquote
+            if not inquote:
+                return pos + newline + 1
+            start = newline + 1
+        pos += len(block)
+
+def record_offsets(fileobj, nchunks, start=0, quotechar='"',
+        blocksize=1 << 20):
+    '''Split fileobj (from offset start) into roughly nchunks byte ranges
+    aligned to record boundaries.
+
+    NB: needs one sequential pass over the file to track quoting but this
+    only counts quote characters so is far cheaper than parsing.
+
+    @return: list of offsets [start, b1, ..., size]. Range ii is
+        offsets[ii]:offsets[ii+1].
+    '''
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    offsets = [ start ]
+    pos = start
+    inquote = False
+    for ii in range(1, nchunks):
+        target = start + (size - start) * ii // nchunks
+        if target <= pos:
+            continue
+        fileobj.seek(pos)
+        # track whether we are inside quotes up to the target
+        while pos < target:
+            block = fileobj.read(min(blocksize, target - pos))
+            if not block:
+                break
+            if block.count(quotechar) % 2:
+                inquote = not inquote
+            pos += len(block)
+        pos = next_record_start(fileobj, pos, inquote, quotechar)
+        inquote = False
+        if pos >= size:
+            break
+        offsets.append(pos)
+    if offsets[-1] < size:
+        offsets.append(size)
+    return offsets
+
+
+def _parse_chunk(args):
+    filepath, start, end, encoding, columns, where, csvkwargs = args
+    fileobj = open(filepath, 'rb')
+    try:
+        fileobj.seek(start)
+        text = fileobj.read(end - start)
+    finally:
+        fileobj.close()
+    if codecs.lookup(encoding).name != 'utf-8':
+        text = text.decode(encoding).encode('utf-8')
+    rows = csv.reader(StringIO(text), **csvkwargs)
+    if where is not None:
+        rows = itertools.ifilter(compile_where(where), rows)
+    if columns is not None:
+        from base import row_projector
+        return map(row_projector(columns), rows)
+    return list(rows)
+
+def iter_rows(filepath, processes, skip_header=False, encoding='utf-8',
+        chunks=None, columns=None, where=None, **csvkwargs):
+    '''Iterate over the rows of the csv file at filepath, parsing it in
+    parallel.
+
+    @param processes: number of worker processes.
+    @param skip_header: do not return the first record.
+    @param encoding: encoding of the file (must be ascii compatible, see
+        is_splittable). Rows are returned encoded as utf-8.
+    @param chunks: number of byte ranges to split the file into (defaults to
+        4 per process). Each process holds one range in memory at a time.
+    @param columns: if not None only return the columns at these indexes.
+    @param where: if not None only return rows matching this filter (a
+        L{filters.Predicate} using column indexes or a picklable function
+        taking a row). Rows are filtered before columns are selected.
+    @param csvkwargs: passed to csv.reader.
+    @return: iterator over rows in file order.
+    '''
+    if chunks is None:
+        chunks = processes * 4
+    tasks = chunk_tasks(filepath, chunks, skip_header, encoding, columns,
+            where, csvkwargs)
+    return _iter_results(tasks, processes)
+
+def chunk_tasks(filepath, chunks, skip_header=False, encoding='utf-8',
+        columns=None, where=None, csvkwargs=None):
+    '''Split the csv file at filepath into chunks and return the arguments
+    for parsing each with _parse_chunk (arguments as for iter_rows).'''
+    csvkwargs = csvkwargs or {}
+    quotechar = csvkwargs.get('quotechar', '"')
+    fileobj = open(filepath, 'rb')
+    try:
+        start = 0
+        if skip_header:
+            start = next_record_start(fileobj, 0, quotechar=quotechar)
+        offsets = record_offsets(fileobj, chunks, start, quotechar)
+    finally:
+        fileobj.close()
+    return [ (filepath, offsets[ii], offsets[ii+1], encoding, columns,
+        where, csvkwargs)
+        for ii in range(len(offsets) - 1) ]
+
+def _iter_results(tasks, processes):
+    pool = multiprocessing.Pool(processes)
+    try:
+        # imap preserves the order of the tasks
+        for rows in pool.imap(_parse_chunk, tasks):
+            for row in rows:
+                yield row
+        pool.close()
+    finally:
+        # also reached if the consumer stops iterating early
+        pool.terminate()
+        pool.join()
+
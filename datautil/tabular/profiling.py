@@ -0,0 +1,449 @@
+'''Per column statistics computed in a single pass with fixed memory.
+
+    prof = profile(table)               # TabularData or iterable of rows
+    prof['Value'].mean, prof['Value'].quantiles([0.5, 0.9])
+    prof['Country'].distinct, prof['Country'].top(5)
+    prof.as_dict()
+
+    # profile chunks of a large csv file in parallel and merge the results
+    prof = profile_csv('big.csv', processes=4)
+
+For every column a L{ColumnProfile} records:
+  * count: number of values, nulls (None) and placeholders (blank and
+    placeholder strings, see datautil.misc.placeholders)
+  * numeric values (ints, floats and strings which convert to floats):
+    count, min, max, mean and variance (Welford's algorithm)
+  * min / max of non-numeric values
+  * distinct: approximate number of distinct values (HyperLogLog)
+  * quantiles: approximate quantiles of numeric values (from a reservoir
+    sample, exact while there are no more values than the sample size)
+  * top: approximate most frequent values (Misra-Gries summary, counts are
+    lower bounds and exact while there are few distinct values)
+
+Profiles of different parts of a table can be combined with merge().
+'''
+import math
+import random
+import struct
+import hashlib
+import multiprocessing
+
+from datautil.misc import placeholders
+from base import TabularData, CsvReader, column_index
+from dedupe import key_bytes
+import parallel
+
+_placeholders = frozenset(placeholders)
+_hash64 = struct.Struct('<Q')
+
+
+class HyperLogLog(object):
+    '''Approximate distinct counter using 2**precision registers (relative
+    error about 1.04 / sqrt(2**precision), i.e. 1.6% for precision 12).
+    Items are strings.
+    '''
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        value = _hash64.unpack_from(hashlib.md5(item).digest())[0]
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLogs of different '
+                'precision')
+        registers = self.registers
+        for ii, rank in enumerate(other.registers):
+            if rank > registers[ii]:
+                registers[ii] = rank
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+    def estimate(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum([ 2.0 ** -rank
+            for rank in self.registers ])
+        zeros = self.registers.count('\x00')
+        if estimate <= 2.5 * size and zeros:
+            # small range correction (linear counting)
+            estimate = size * math.log(float(size) / zeros)
+        return estimate
+
+
+class ColumnProfile(object):
+    '''Statistics for one column (see module docstring).'''
+
+    def __init__(self, name=None, sample_size=1000, top_k=10, precision=12,
+            seed=0):
+        '''
+        @param sample_size: size of the sample of numeric values used for
+            quantiles.
+        @param top_k: number of frequent values to track (10 times as many
+            counters are used).
+        @param precision: HyperLogLog precision.
+        '''
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.placeholders = 0
+        # numeric values
+        self.numeric_count = 0
+        self.mean = None
+        self._m2 = 0.0
+        self.numeric_min = None
+        self.numeric_max = None
+        # other (non-null, non-numeric) values
+        self.other_min = None
+        self.other_max = None
+        self.sample_size = sample_size
+        self.sample = []
+        self._random = random.Random(seed)
+        self.top_k = top_k
+        self._max_counters = top_k * 10
+        self.counters = {}
+        self.hll = HyperLogLog(precision)
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        if isinstance(value, basestring):
+            if value.strip() in _placeholders:
+                self.placeholders += 1
+                return
+            try:
+                number = float(value.replace(',', ''))
+            except ValueError:
+                number = None
+            if isinstance(value, unicode):
+                self.hll.add(value.encode('utf-8'))
+            else:
+                self.hll.add(value)
+        else:
+            if isinstance(value, (int, long, float)) and \
+                    not isinstance(value, bool):
+                number = value
+            else:
+                number = None
+            self.hll.add(key_bytes((value,)))
+        if number is not None:
+            self._add_number(number)
+        else:
+            if self.other_min is None or value < self.other_min:
+                self.other_min = value
+            if self.other_max is None or value > self.other_max:
+                self.other_max = value
+        self._count_value(value)
+
+    def _add_number(self, number):
+        self.numeric_count += 1
+        count = self.numeric_count
+        if count == 1:
+            self.mean = float(number)
+            self.numeric_min = self.numeric_max = number
+        else:
+            if number < self.numeric_min:
+                self.numeric_min = number
+            elif number > self.numeric_max:
+                self.numeric_max = number
+        delta = number - self.mean
+        self.mean += delta / count
+        self._m2 += delta * (number - self.mean)
+        # reservoir sample
+        if len(self.sample) < self.sample_size:
+            self.sample.append(number)
+        else:
+            index = int(self._random.random() * count)
+            if index < self.sample_size:
+                self.sample[index] = number
+
+    def _count_value(self, value):
+        counters = self.counters
+        try:
+            current = counters.get(value)
+        except TypeError: # unhashable
+            return
+        if current is not None:
+            counters[value] = current + 1
+        elif len(counters) < self._max_counters:
+            counters[value] = 1
+        else:
+            # decrement every counter (the cost is paid for by the
+            # increments which must have preceded it)
+            for key, current in counters.items():
+                if current == 1:
+                    del counters[key]
+                else:
+                    counters[key] = current - 1
+
+    def merge(self, other):
+        '''Add the statistics of other (a profile of another part of the same
+        column) to this one.'''
+        self.count += other.count
+        self.nulls += other.nulls
+        self.placeholders += other.placeholders
+        self._merge_numeric(other)
+        for attr, better in [ ('other_min', min), ('other_max', max) ]:
+            values = [ value for value in (getattr(self, attr),
+                getattr(other, attr)) if value is not None ]
+            if values:
+                setattr(self, attr, better(values))
+        self.hll.merge(other.hll)
+        counters = self.counters
+        for value, count in other.counters.items():
+            counters[value] = counters.get(value, 0) + count
+        if len(counters) > self._max_counters:
+            # subtract the first count which does not fit and drop what is
+            # left with nothing
+            cutoff = sorted(counters.values(),
+                    reverse=True)[self._max_counters]
+            for value, count in counters.items():
+                if count <= cutoff:
+                    del counters[value]
+                else:
+                    counters[value] = count - cutoff
+
+    def _merge_numeric(self, other):
+        if not other.numeric_count:
+            return
+        if not self.numeric_count:
+            self.numeric_count = other.numeric_count
+            self.mean = other.mean
+            self._m2 = other._m2
+            self.numeric_min = other.numeric_min
+            self.numeric_max = other.numeric_max
+            self.sample = list(other.sample)
+            return
+        count1, count2 = self.numeric_count, other.numeric_count
+        count = count1 + count2
+        delta = other.mean - self.mean
+        self.mean += delta * count2 / count
+        self._m2 += other._m2 + delta * delta * count1 * count2 / count
+        self.numeric_min = min(self.numeric_min, other.numeric_min)
+        self.numeric_max = max(self.numeric_max, other.numeric_max)
+        # combine the samples in proportion to the numbers of values they
+        # represent
+        if len(self.sample) + len(other.sample) <= self.sample_size:
+            self.sample = self.sample + other.sample
+        else:
+            take = int(round(self.sample_size * float(count1) / count))
+            take = max(self.sample_size - len(other.sample),
+                    min(take, len(self.sample)))
+            self.sample = self._random.sample(self.sample, take) + \
+                self._random.sample(other.sample, min(len(other.sample),
+                    self.sample_size - take))
+        self.numeric_count = count
+
+    @property
+    def min(self):
+        '''Minimum numeric value (or non-numeric value if there are no
+        numeric ones).'''
+        if self.numeric_count:
+            return self.numeric_min
+        return self.other_min
+
+    @property
+    def max(self):
+        if self.numeric_count:
+            return self.numeric_max
+        return self.other_max
+
+    @property
+    def variance(self):
+        '''Sample variance of the numeric values.'''
+        if self.numeric_count < 2:
+            return None
+        return self._m2 / (self.numeric_count - 1)
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        if variance is None:
+            return None
+        return math.sqrt(variance)
+
+    @property
+    def distinct(self):
+        '''Approximate number of distinct non-null values.'''
+        return len(self.hll)
+
+    def quantiles(self, qs=(0.25, 0.5, 0.75)):
+        '''Approximate quantiles of the numeric values (linearly
+        interpolated).
+
+        @param qs: list of numbers between 0 and 1.
+        '''
+        sample = sorted(self.sample)
+        out = []
+        for q in qs:
+            if not sample:
+                out.append(None)
+                continue
+            pos = q * (len(sample) - 1)
+            lower = int(math.floor(pos))
+            upper = min(lower + 1, len(sample) - 1)
+            out.append(sample[lower] + (sample[upper] - sample[lower]) *
+                    (pos - lower))
+        return out
+
+    def top(self, k=None):
+        '''Most frequent values.
+
+        @return: list of (value, count) pairs, most frequent first.
+        '''
+        if k is None:
+            k = self.top_k
+        items = sorted(self.counters.items(), key=lambda item: -item[1])
+        return items[:k]
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'count': self.count,
+            'nulls': self.nulls,
+            'placeholders': self.placeholders,
+            'numeric_count': self.numeric_count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'variance': self.variance,
+            'distinct': self.distinct,
+            'quantiles': self.quantiles(),
+            'top': self.top(),
+            }
+
+
+class Profile(object):
+    '''Profiles of all the columns of a table.
+
+    Properties:
+      * header: header of the table profiled
+      * columns: list of L{ColumnProfile}
+      * nrows: number of rows
+    '''
+    def __init__(self, header=None, **kwargs):
+        '''
+        @param kwargs: passed to L{ColumnProfile}.
+        '''
+        self.header = list(header or [])
+        self.columns = []
+        self.nrows = 0
+        self.kwargs = kwargs
+
+    def _add_column(self):
+        index = len(self.columns)
+        name = self.header[index] if index < len(self.header) else index
+        self.columns.append(ColumnProfile(name, **self.kwargs))
+
+    def add_rows(self, rows):
+        columns = self.columns
+        ncols = len(columns)
+        nrows = 0
+        for row in rows:
+            nrows += 1
+            rowlen = len(row)
+            if rowlen > ncols:
+                for ii in range(ncols, rowlen):
+                    self._add_column()
+                    # missing from all rows so far
+                    for jj in xrange(self.nrows + nrows - 1):
+                        columns[ii].add(None)
+                ncols = rowlen
+            for column, value in zip(columns, row):
+                column.add(value)
+            for column in columns[rowlen:]:
+                column.add(None)
+        self.nrows += nrows
+
+    def merge(self, other):
+        '''Add the statistics of other (a profile of other rows of the same
+        table) to this one.'''
+        while len(self.columns) < len(other.columns):
+            self._add_column()
+            self.columns[-1].count = self.columns[-1].nulls = self.nrows
+        for ii, column in enumerate(self.columns):
+            if ii < len(other.columns):
+                column.merge(other.columns[ii])
+            else:
+                column.count += other.nrows
+                column.nulls += other.nrows
+        self.nrows += other.nrows
+
+    def __getitem__(self, index_or_name):
+        return self.columns[column_index(self.header, index_or_name)]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def as_dict(self):
+        return {
+            'nrows': self.nrows,
+            'columns': [ column.as_dict() for column in self.columns ],
+            }
+
+
+def profile(table, header=None, **kwargs):
+    '''Profile the columns of table in a single pass.
+
+    @param table: L{TabularData} (possibly streamed) or any iterable of rows.
+    @param header: header for table (default table.header if it exists).
+    @param kwargs: passed to L{ColumnProfile} (sample_size, top_k,
+        precision).
+    @return: L{Profile}.
+    '''
+    if header is None:
+        header = getattr(table, 'header', None) or []
+    rows = table.data if isinstance(table, TabularData) else table
+    prof = Profile(header, **kwargs)
+    prof.add_rows(rows)
+    return prof
+
+def _profile_chunk(args):
+    task, header, kwargs = args
+    return profile(parallel._parse_chunk(task), header, **kwargs)
+
+def profile_csv(filepath, processes=4, encoding='utf-8', chunks=None,
+        csvkwargs=None, **kwargs):
+    '''Profile a csv file by profiling chunks of it in parallel processes
+    and merging the results.
+
+    @param processes: number of worker processes.
+    @param encoding: encoding of the file (must be ascii compatible, see
+        parallel.is_splittable).
+    @param chunks: number of chunks (default 4 per process).
+    @param csvkwargs: passed to csv.reader.
+    @param kwargs: passed to L{ColumnProfile}.
+    @return: L{Profile}.
+    '''
+    if not parallel.is_splittable(encoding):
+        raise ValueError('Cannot split files encoded as %s' % encoding)
+    reader = CsvReader()
+    reader.iter_rows(filepath, encoding=encoding, **(csvkwargs or {}))
+    reader.fileobj.close()
+    header = reader.header
+    tasks = parallel.chunk_tasks(filepath, chunks or processes * 4,
+            skip_header=bool(header), encoding=encoding,
+            csvkwargs=reader._csv_kwargs(csvkwargs))
+    prof = Profile(header, **kwargs)
+    pool = multiprocessing.Pool(processes)
+    try:
+        for part in pool.imap(_profile_chunk, [ (task, header, kwargs)
+                for task in tasks ]):
+            prof.merge(part)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return prof
+
@@ -0,0 +1,163 @@
+'''Reducers for aggregating values (used by pivot and group_by).
+
+A reducer accumulates values one at a time with add() and returns the
+aggregate with result(). Reducers of the same type can be combined with
+merge() (e.g. when aggregating chunks of data separately)::
+
+    total = Sum()
+    for value in values:
+        total.add(value)
+    total.result()
+
+Reducers are normally referred to by name (see REDUCERS and get_reducer).
+
+Numeric reducers (sum, mean, min, max) convert strings using misc.floatify
+and ignore blanks and placeholders ('', '-', ...). All reducers other than
+count, first and last ignore None.
+'''
+from datautil.misc import floatify
+
+
+def _number(value):
+    if isinstance(value, (int, long, float)):
+        return value
+    number = floatify(value)
+    if number is not None and not isinstance(number, float):
+        raise ValueError('Cannot aggregate non-numeric value: %r' % (value,))
+    return number
+
+
+class Reducer(object):
+    def add(self, value):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Count(Reducer):
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return self.count
+
+
+class Sum(Reducer):
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        value = _number(value)
+        if value is not None:
+            self.total += value
+
+    def merge(self, other):
+        self.total += other.total
+
+    def result(self):
+        return self.total
+
+
+class Mean(Reducer):
+    '''Arithmetic mean (None if there were no values).'''
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        value = _number(value)
+        if value is not None:
+            self.total += value
+            self.count += 1
+
+    def merge(self, other):
+        self.total += other.total
+        self.count += other.count
+
+    def result(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+
+class Min(Reducer):
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        value = _number(value)
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+    def merge(self, other):
+        self.add(other.value)
+
+    def result(self):
+        return self.value
+
+
+class Max(Min):
+    def add(self, value):
+        value = _number(value)
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+
+class First(Reducer):
+    def __init__(self):
+        self.seen = False
+        self.value = None
+
+    def add(self, value):
+        if not self.seen:
+            self.value = value
+            self.seen = True
+
+    def merge(self, other):
+        if other.seen:
+            self.add(other.value)
+
+    def result(self):
+        return self.value
+
+
+class Last(First):
+    def add(self, value):
+        self.value = value
+        self.seen = True
+
+    def merge(self, other):
+        if other.seen:
+            self.add(other.value)
+
+
+REDUCERS = {
+    'count': Count,
+    'sum': Sum,
+    'mean': Mean,
+    'min': Min,
+    'max': Max,
+    'first': First,
+    'last': Last,
+    }
+
+def get_reducer(reducer):
+    '''Return the reducer class for reducer (a name in REDUCERS or a Reducer
+    subclass).'''
+    if isinstance(reducer, basestring):
+        try:
+            return REDUCERS[reducer]
+        except KeyError:
+            raise ValueError('Unknown reducer: %s' % reducer)
+    return reducer
+
@@ -0,0 +1,105 @@
+'''Compact row representation for L{TabularData}.
+
+Rows are normally mutable lists which (as they are built up by appending)
+carry spare capacity as well as the list overhead. For large tables the rows
+can instead be stored as instances of a tuple subclass generated from the
+header::
+
+    Row = row_class(['Name', 'Year', 'Value'])
+    row = Row(['x', 2004, 1])
+    row[1]              # 2004 (as for a list)
+    row.get('Year')     # 2004 (O(1): name -> index dict shared by all rows)
+    row.index(2004)     # 1 (rows are tuples)
+    row.Year            # 2004 (for headers which are valid identifiers)
+
+    td = compact(td)    # convert all rows of a TabularData
+
+Instances have no per-row __dict__ so take exactly the space of a tuple. Run
+benchmarks/rows_memory.py to compare against lists.
+
+Rows can be pickled: they are unpickled as instances of a row class
+generated (once per process) from the same header, which is equal to but not
+the same class as the original.
+'''
+import re
+from operator import itemgetter
+
+from base import TabularData
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def header_index(header):
+    '''Return dict mapping header names to column indices.'''
+    return dict((name, ii) for ii, name in enumerate(header))
+
+
+class RowBase(tuple):
+    '''Base class for generated row classes (see row_class).'''
+    __slots__ = ()
+    fields = ()
+    # column name -> index
+    field_index = {}
+
+    def __new__(cls, values=()):
+        return tuple.__new__(cls, values)
+
+    def get(self, name, default=None):
+        '''Return the value in column name (or default if no such column).'''
+        ii = self.field_index.get(name)
+        if ii is None or ii >= len(self):
+            return default
+        return self[ii]
+
+    def as_dict(self):
+        return dict(zip(self.fields, self))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+    def __reduce__(self):
+        # the generated class cannot be looked up by name so recreate it
+        return (_restore_row, (self.__class__.__name__, self.fields,
+            tuple(self)))
+
+
+def row_class(header, name='Row'):
+    '''Generate a compact row class for the given header.
+
+    @return: subclass of tuple (and RowBase) whose instances are rows.
+    '''
+    attrs = {
+        '__slots__': (),
+        'fields': tuple(header),
+        'field_index': header_index(header),
+        }
+    for ii, field in enumerate(header):
+        if isinstance(field, basestring) and _identifier.match(field) and \
+                not hasattr(RowBase, field):
+            attrs[str(field)] = property(itemgetter(ii))
+    return type(name, (RowBase,), attrs)
+
+
+# (class name, fields): row class, for unpickling
+_restored_classes = {}
+
+def _restore_row(name, fields, values):
+    row_cls = _restored_classes.get((name, fields))
+    if row_cls is None:
+        row_cls = _restored_classes[(name, fields)] = row_class(fields, name)
+    return row_cls(values)
+
+
+def compact(tabular_data, row_cls=None):
+    '''Return a new TabularData holding the rows of tabular_data as compact
+    rows.
+
+    Data may be a list or an iterator (which is consumed).
+
+    @param row_cls: row class to use (by default generated from the header).
+    '''
+    if row_cls is None:
+        row_cls = row_class(tabular_data.header)
+    data = map(row_cls, tabular_data.data)
+    return TabularData(data=data, header=tabular_data.header)
+
@@ -0,0 +1,192 @@
+'''Per-column type inference and bulk typed conversion.
+
+Readers produce cells as text (TabularData does no type conversion). Rather
+than trying float(), dates etc on every cell (see misc.floatify) this module
+decides a type for each column from a sample of rows and then converts whole
+columns with a converter compiled for that type::
+
+    schema = infer_types(rows)      # e.g. ['int', 'string', 'date']
+    rows = convert_columns(rows, schema)
+
+Supported types are those in TYPES. Blank and placeholder values (see
+datautil.misc.placeholders) in non-string columns are converted to None.
+Values which do not match the inferred type of their column are left
+unchanged. Non-scalar values (e.g. lists and dicts read from JSON) are typed
+as 'string'.
+'''
+import re
+import datetime
+from itertools import izip
+
+from datautil.misc import placeholders
+
+TYPES = [ 'int', 'float', 'bool', 'date', 'string' ]
+
+_nulls = frozenset(placeholders + [ None ])
+_int_re = re.compile(r'^\s*[+-]?(\d+|\d{1,3}(,\d{3})+)\s*$')
+_float_re = re.compile(
+    r'^\s*[+-]?((\d+|\d{1,3}(,\d{3})+)(\.\d*)?|\.\d+)([eE][+-]?\d+)?\s*$')
+_date_re = re.compile(r'^\s*\d{4}-\d{2}-\d{2}\s*$')
+_bools = {
+    'true': True, 'false': False,
+    'yes': True, 'no': False,
+    }
+
+
+def _in_nulls(value):
+    # (checking the type first as values may be unhashable e.g. lists)
+    return value is None or (isinstance(value, basestring) and
+            value in _nulls)
+
+def _is_null(value):
+    return _in_nulls(value) or \
+        (isinstance(value, basestring) and value.strip() in _nulls)
+
+def _value_type(value):
+    '''Return the narrowest type in TYPES matching value.'''
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, long)):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, datetime.date):
+        return 'date'
+    if not isinstance(value, basestring):
+        return 'string'
+    if _int_re.match(value):
+        return 'int'
+    if _float_re.match(value):
+        return 'float'
+    if value.strip().lower() in _bools:
+        return 'bool'
+    if _date_re.match(value):
+        return 'date'
+    return 'string'
+
+def _merge_types(type1, type2):
+    if type1 is None or type1 == type2:
+        return type2
+    if set([type1, type2]) == set(['int', 'float']):
+        return 'float'
+    return 'string'
+
+def infer_types(rows, sample_size=100):
+    '''Infer the type of each column from (up to) sample_size rows.
+
+    @return: list of type names (from TYPES), one per column. Columns with
+        no non-null values in the sample are typed as 'string'.
+    '''
+    types = []
+    for count, row in enumerate(rows):
+        if count >= sample_size:
+            break
+        if len(row) > len(types):
+            types += [ None ] * (len(row) - len(types))
+        for ii, value in enumerate(row):
+            if types[ii] == 'string' or _is_null(value):
+                continue
+            types[ii] = _merge_types(types[ii], _value_type(value))
+    return [ type_ or 'string' for type_ in types ]
+
+
+def _to_int(value):
+    if _in_nulls(value):
+        return None
+    return int(value)
+
+def _to_float(value):
+    if _in_nulls(value):
+        return None
+    return float(value)
+
+def _to_bool(value):
+    if _in_nulls(value):
+        return None
+    if value is True or value is False:
+        return value
+    return _bools[value.strip().lower()]
+
+def _to_date(value):
+    if _in_nulls(value):
+        return None
+    if isinstance(value, datetime.date):
+        return value
+    value = value.strip()
+    return datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+def _identity(value):
+    return value
+
+_converters = {
+    'int': _to_int,
+    'float': _to_float,
+    'bool': _to_bool,
+    'date': _to_date,
+    'string': _identity,
+    }
+
+def _make_safe(convert):
+    '''Wrap convert to cope with thousands separators, stray whitespace and
+    values not matching the column type.'''
+    if convert is _identity:
+        return convert
+    def safe_convert(value):
+        try:
+            return convert(value)
+        except (ValueError, TypeError, KeyError):
+            pass
+        if _is_null(value):
+            return None
+        if isinstance(value, basestring):
+            try:
+                return convert(value.replace(',', ''))
+            except (ValueError, TypeError, KeyError):
+                pass
+        return value
+    return safe_convert
+
+def get_converter(type_):
+    '''Return a function converting a single value to type_.'''
+    return _make_safe(_converters[type_])
+
+def convert_column(values, type_):
+    '''Convert a sequence of values to type_ in one pass.
+
+    @return: list of converted values.
+    '''
+    try:
+        # fast path: no exceptions expected for a cleanly typed column
+        return map(_converters[type_], values)
+    except (ValueError, TypeError, KeyError):
+        return map(get_converter(type_), values)
+
+def convert_columns(rows, types):
+    '''Convert a list of rows column by column.
+
+    @return: list of converted rows (lists).
+    '''
+    if not rows:
+        return rows
+    ncols = len(types)
+    if any(len(row) != ncols for row in rows):
+        # ragged rows so go row by row
+        return map(compile_row_converter(types), rows)
+    columns = [ convert_column(col, type_)
+        for col, type_ in izip(zip(*rows), types) ]
+    return map(list, zip(*columns))
+
+def compile_row_converter(types):
+    '''Return a function converting a single row according to types.
+
+    Suitable for converting streams of rows e.g. itertools.imap(func, rows).
+    '''
+    converters = [ get_converter(type_) for type_ in types ]
+    ncols = len(converters)
+    def convert_row(row):
+        out = [ convert(value) for convert, value in izip(converters, row) ]
+        if len(row) > ncols:
+            out.extend(row[ncols:])
+        return out
+    return convert_row
+
@@ -0,0 +1,121 @@
+'''Sort tables which may be larger than memory.
+
+    sort_table(table, [ 'Country', ('Year', 'desc', 'float') ])
+
+Rows are sorted in memory in runs of at most max_rows rows. If the table
+does not fit in a single run the sorted runs are written to temporary files
+and merged (see spill.external_sort) so tables of any size can be sorted
+with bounded memory. Works with streamed input (e.g. CsvReader.read(...,
+stream=True)) and produces a L{LazyTable}.
+'''
+from datautil.misc import floatify
+from datautil import date
+
+from base import TabularData, column_index
+from lazy import LazyTable
+from spill import external_sort
+
+
+def flexidate_key(value):
+    '''Sort key for (imprecise) dates: parse value as a FlexiDate and order
+    by FlexiDate.as_float(). Unparseable values sort first.'''
+    flexidate = date.parse(value)
+    if flexidate is None:
+        return None
+    return flexidate.as_float()
+
+# named key functions which can be used in sort specifications
+KEY_FUNCTIONS = {
+    'float': floatify,
+    'date': flexidate_key,
+    }
+
+
+class _Reversed(object):
+    '''Wrap a value so it sorts in reverse order.'''
+    __slots__ = [ 'value' ]
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+    def __le__(self, other):
+        return other.value <= self.value
+
+    def __ge__(self, other):
+        return other.value >= self.value
+
+
+def sort_key(header, keys):
+    '''Build a function returning the sort key for a row.
+
+    @param keys: see sort_table.
+    '''
+    if isinstance(keys, (basestring, int, tuple)):
+        keys = [ keys ]
+    parts = []
+    for spec in keys:
+        if not isinstance(spec, tuple):
+            spec = (spec,)
+        col = column_index(header, spec[0])
+        direction = spec[1] if len(spec) > 1 else 'asc'
+        if direction not in ('asc', 'desc'):
+            raise ValueError('Unknown sort direction: %s' % direction)
+        keyfunc = spec[2] if len(spec) > 2 else None
+        keyfunc = KEY_FUNCTIONS.get(keyfunc, keyfunc)
+        parts.append((col, direction == 'desc', keyfunc))
+
+    def key(row):
+        out = []
+        for col, reverse, keyfunc in parts:
+            value = row[col]
+            if keyfunc is not None:
+                value = keyfunc(value)
+            if reverse:
+                value = _Reversed(value)
+            out.append(value)
+        return out
+    if len(parts) == 1 and not parts[0][1]:
+        # common simple case
+        col, reverse, keyfunc = parts[0]
+        if keyfunc is None:
+            return lambda row: row[col]
+        return lambda row: keyfunc(row[col])
+    return key
+
+def sort_table(table, keys, max_rows=100000, header=None):
+    '''Sort table by one or more columns.
+
+    @param table: L{TabularData} (possibly streamed) or any iterable of rows.
+    @param keys: list of sort specifications (most significant first). Each
+        is a column (header name or index) or a tuple (column, direction) or
+        (column, direction, keyfunc) where direction is 'asc' or 'desc' and
+        keyfunc is a function applied to values before comparing them or
+        the name of one in KEY_FUNCTIONS (e.g. 'float' to use
+        misc.floatify, 'date' to order as FlexiDates).
+    @param max_rows: maximum number of rows to sort in memory at once.
+    @param header: header for table (default table.header if it exists).
+    @return: L{LazyTable} of the sorted rows. The sort is stable.
+    '''
+    if header is None:
+        header = getattr(table, 'header', None) or []
+    rows = table.data if isinstance(table, TabularData) else table
+    key = sort_key(header, keys)
+    return LazyTable(_sorted(rows, key, max_rows), header=header)
+
+def _sorted(rows, key, max_rows):
+    # generator so nothing is read until the result is iterated over
+    for row in external_sort(rows, key, max_rows):
+        yield row
+
@@ -0,0 +1,137 @@
+'''Temporary on-disk storage of rows for algorithms which must work within a
+memory budget (group_by, join, sort, ...).
+'''
+import heapq
+import tempfile
+import cPickle
+import itertools
+from itertools import islice
+
+
+class SpillFile(object):
+    '''Temporary file to which rows can be appended and then read back (as
+    often as needed).
+
+    Rows are pickled in batches and must be picklable. The underlying file is
+    deleted when closed (or garbage collected).
+    '''
+    batch_size = 1000
+
+    def __init__(self, dir=None):
+        self.fileobj = tempfile.TemporaryFile(dir=dir)
+        self._pickler = cPickle.Pickler(self.fileobj, 2)
+        # rows are never self referential so no need for the memo (which
+        # would otherwise hold on to every row written)
+        self._pickler.fast = True
+        self._batch = []
+        self.count = 0
+
+    def write(self, row):
+        self._batch.append(row)
+        self.count += 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._batch:
+            # reading may have moved us from the end of the file
+            self.fileobj.seek(0, 2)
+            self._pickler.dump(self._batch)
+            self._batch = []
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.flush()
+        self.fileobj.seek(0)
+        unpickler = cPickle.Unpickler(self.fileobj)
+        while True:
+            try:
+                batch = unpickler.load()
+            except EOFError:
+                break
+            pos = self.fileobj.tell()
+            for row in batch:
+                yield row
+            # something else may have read from the file in the meantime
+            self.fileobj.seek(pos)
+
+    def close(self):
+        self.fileobj.close()
+
+
+
+def external_sort(rows, key, max_rows=100000):
+    '''Sort rows by key(row) using at most max_rows rows of memory.
+
+    Rows are sorted in memory in runs of max_rows which (if there is more
+    than one run) are written to temporary files and merged.
+
+    @return: iterator over the sorted rows. The sort is stable. Rows which
+        have been written to temporary files are returned as lists.
+    '''
+    rows = iter(rows)
+    runs = []
+    while True:
+        run = list(islice(rows, max_rows))
+        run.sort(key=key)
+        if not runs and len(run) < max_rows:
+            # everything fitted in memory
+            return iter(run)
+        if run:
+            spill = SpillFile()
+            # plain tuples (smaller pickles than e.g. compact rows): rows
+            # read back are returned as lists
+            spill.write_rows(itertools.imap(tuple, run))
+            runs.append(spill)
+        if len(run) < max_rows:
+            break
+    return _merge_runs(runs, key)
+
+def _merge_runs(runs, key):
+    # heapq.merge has no key argument (before python 3.5) so decorate. The
+    # run number and position make entries unique so rows themselves are
+    # never compared (and the merge is stable).
+    def decorate(run_no, run):
+        for ii, row in enumerate(run):
+            yield key(row), run_no, ii, row
+    try:
+        for item in heapq.merge(*[ decorate(run_no, run)
+                for run_no, run in enumerate(runs) ]):
+            yield list(item[3])
+    finally:
+        for run in runs:
+            run.close()
+
+
+def run_partitioned(process, rows, partitions, depth=0):
+    '''Run a hash based algorithm (e.g. group_by) with bounded memory.
+
+    process(rows, spill) is a generator which handles what it can in memory
+    and passes any row it has no room for to spill(key, item). Items are
+    written to one of partitions temporary files chosen by a hash of key so
+    all items with the same key end up together. Once process has finished
+    each partition is processed in the same way in turn (and partitioned
+    again if it is still too big).
+
+    @return: iterator over the values yielded by process.
+    '''
+    spills = []
+    def spill(key, item):
+        if not spills:
+            spills.extend([ SpillFile() for ii in range(partitions) ])
+        # salt with depth so a partition is split differently if it has to
+        # be spilled again
+        spills[hash((depth, key)) % partitions].write(item)
+    for out in process(rows, spill):
+        yield out
+    for part in spills:
+        if len(part):
+            for out in run_partitioned(process, part, partitions, depth + 1):
+                yield out
+        part.close()
@@ -1,4 +1,18 @@
-'''JSON Reader and Writer'''
+'''JSON Reader and Writer
+
+Two formats are supported:
+
+  * JSON: a dict with header and data attributes (or a list whose first row
+    is the header). JsonWriter writes the header first and then the rows one
+    per line, and JsonReader can read the rows of the data array one at a
+    time (stream=True) so neither needs to hold the whole table.
+  * NDJSON (newline delimited JSON): one JSON array per line, the first
+    being the header -- or one JSON object per line mapping column names to
+    values. See NdjsonReader and NdjsonWriter.
+'''
+import re
+import codecs
+import itertools
 try:
     import json
 except ImportError:
@@ -6,36 +20,278 @@ except ImportError:
         import simplejson as json
     except ImportError: # simplejson not installed
         pass
+try:
+    from collections import OrderedDict
+except ImportError: # python < 2.7
+    OrderedDict = dict
 from base import TabularData, ReaderBase, WriterBase
 
 
+_whitespace = re.compile(r'\s*')
+
+class _JsonBuffer(object):
+    '''Text read from a file a chunk at a time and parsed one JSON value (or
+    punctuation character) at a time.'''
+    def __init__(self, fileobj, encoding, chunk_size):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.json_decoder = json.JSONDecoder()
+        self.text = u''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        '''Read more text (discarding what has been parsed).
+
+        @return: False if at the end of the file.
+        '''
+        if self.eof:
+            return False
+        data = self.fileobj.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        if not isinstance(data, unicode):
+            data = self.decoder.decode(data)
+        self.text = self.text[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        '''Return the next non-whitespace character ('' at end of file).'''
+        while True:
+            self.pos = _whitespace.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError('Expected %r but found %r' % (char, found))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.text, self.pos)
+            except ValueError:
+                # (probably) incomplete
+                if not self.fill():
+                    raise
+                continue
+            # a number at the end of the text may continue in the next chunk
+            if end < len(self.text) or not self.fill():
+                self.pos = end
+                return value
+
+    def iter_array(self):
+        '''Iterate over the values of an array.'''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(']')
+                return
+
+
 class JsonReader(ReaderBase):
-    def read(self, filepath_or_fileobj=None):
+    # number of bytes read at a time when streaming
+    chunk_size = 64 * 1024
+
+    def read(self, filepath_or_fileobj=None, infer_types=False, stream=False):
         '''Read JSON encoded data from source into a L{TabularData} object.
 
         JSON encoded data should either be:
             * dict (with header and data attributes)
             * list (first row assumed to be the header)
 
+        @param infer_types: infer column types and convert values to them
+            (see `ReaderBase.convert_types`).
+        @param stream: if True the data attribute of the returned
+            TabularData is an iterator parsing the rows as they are needed
+            (see iter_rows).
         @return L{TabularData}
         '''
-        super(JsonReader, self).read(filepath_or_fileobj)
-        jsondata = json.load(self.fileobj)
-        if isinstance(jsondata, dict):
-            return TabularData(header=jsondata.get('header', None),
-                    data=jsondata.get('data', None)
-                    )
-        elif isinstance(jsondata, list):
-            return TabularData(header=jsondata[0], data=jsondata[1:])
+        if stream:
+            rows = self.iter_rows(filepath_or_fileobj)
+            tab = TabularData(header=self.header, data=rows)
         else:
-            raise Exception('Cannot load TabularData from %s' % jsondata)
+            super(JsonReader, self).read(filepath_or_fileobj)
+            jsondata = json.load(self.fileobj)
+            if isinstance(jsondata, dict):
+                tab = TabularData(header=jsondata.get('header', None),
+                        data=jsondata.get('data', None)
+                        )
+            elif isinstance(jsondata, list):
+                tab = TabularData(header=jsondata[0], data=jsondata[1:])
+            else:
+                raise Exception('Cannot load TabularData from %s' % jsondata)
+        if infer_types:
+            self.convert_types(tab)
+        return tab
+
+    def iter_rows(self, filepath_or_fileobj=None):
+        '''Return an iterator over the rows of the data array, parsing them
+        one at a time (so memory use does not depend on the number of rows).
+
+        The header is read first and stored in self.header. (If the data
+        array comes before the header in the file the rows have to be read
+        into memory to find it.)
+        '''
+        super(JsonReader, self).read(filepath_or_fileobj)
+        buf = _JsonBuffer(self.fileobj, self.encoding, self.chunk_size)
+        first = buf.peek()
+        if first == '[':
+            rows = buf.iter_array()
+            self.header = next(rows, None) or []
+            return rows
+        if first != '{':
+            raise ValueError('Cannot load TabularData from JSON starting '
+                'with %r' % first)
+        buf.pos += 1
+        header = None
+        data = None
+        while buf.peek() != '}':
+            key = buf.value()
+            buf.expect(':')
+            if key == 'data' and buf.peek() == '[':
+                if header is not None:
+                    self.header = header
+                    return buf.iter_array()
+                data = list(buf.iter_array())
+            elif key == 'header':
+                header = buf.value()
+            else:
+                buf.value()
+            if buf.peek() == ',':
+                buf.pos += 1
+        self.header = header or []
+        return iter(data or [])
+
 
 class JsonWriter(WriterBase):
 
-    def write(self, tabular_data, fileobj, indent=2):
+    def write(self, tabular_data, fileobj, indent=None):
+        '''Write tabular_data as a JSON dict with header and data
+        attributes.
+
+        The header is written first and then the rows (one per line) so
+        streamed data is written as it is read.
+
+        @param indent: if not None pretty print with this indent (the whole
+            table is then held in memory).
+        '''
         super(JsonWriter, self).write(tabular_data, fileobj)
-        jsondata = { u'header': tabular_data.header,
-                u'data': tabular_data.data
-                }
-        json.dump(jsondata, fileobj, indent=indent)
+        if indent is not None:
+            jsondata = { u'header': tabular_data.header,
+                    u'data': list(tabular_data.data)
+                    }
+            json.dump(jsondata, fileobj, indent=indent)
+            return
+        for text in self.iter_write(tabular_data):
+            fileobj.write(text)
+
+    def iter_write(self, tabular_data, indent=None):
+        if indent is not None:
+            yield self.write_str(tabular_data, indent=indent)
+            return
+        encode = json.JSONEncoder().encode
+        yield '{"header": %s, "data": [' % encode(list(tabular_data.header))
+        separator = '\n'
+        for row in tabular_data.data:
+            if not isinstance(row, (list, tuple)):
+                row = list(row)
+            yield separator + encode(row)
+            separator = ',\n'
+        yield '\n]}\n'
+
+
+class NdjsonReader(ReaderBase):
+    '''Read newline delimited JSON: one JSON array or object per line.'''
+
+    def read(self, filepath_or_fileobj=None, infer_types=False, stream=False,
+            has_header=True):
+        '''
+        @param stream: if True the data attribute of the returned
+            TabularData is an iterator over the rows (read as needed).
+        @param has_header: (for arrays) the first line is the header.
+        @return: L{TabularData}
+        '''
+        rows = self.iter_rows(filepath_or_fileobj, has_header=has_header)
+        if not stream:
+            rows = list(rows)
+        tab = TabularData(header=self.header, data=rows)
+        if infer_types:
+            self.convert_types(tab)
+        return tab
+
+    def iter_rows(self, filepath_or_fileobj=None, has_header=True):
+        '''Return an iterator over the rows of the file.
+
+        If lines are objects the header is the keys of the first object (in
+        order) and every row has a value (None if missing) for each of them.
+        Otherwise if has_header the first line is the header.
+        '''
+        super(NdjsonReader, self).read(filepath_or_fileobj)
+        decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+        encoding = self.encoding
+        lines = ( decoder.decode(line.decode(encoding)
+            if isinstance(line, str) else line)
+            for line in self.fileobj if line.strip() )
+        first = next(lines, None)
+        self.header = []
+        if isinstance(first, dict):
+            self.header = first.keys()
+            return self._iter_objects(itertools.chain([ first ], lines))
+        if first is None:
+            return iter([])
+        if has_header:
+            self.header = first
+            return lines
+        return itertools.chain([ first ], lines)
+
+    def _iter_objects(self, objects):
+        header = self.header
+        for obj in objects:
+            yield [ obj.get(name) for name in header ]
+
+
+class NdjsonWriter(WriterBase):
+    '''Write newline delimited JSON: one line per row.'''
+
+    def __init__(self, objects=False, **kwargs):
+        '''
+        @param objects: write each row as an object mapping the header to the
+            row's values (rather than writing the header as the first line
+            and then each row as an array).
+        '''
+        super(NdjsonWriter, self).__init__(**kwargs)
+        self.objects = objects
+
+    def write(self, tabular_data, fileobj):
+        for line in self.iter_write(tabular_data):
+            fileobj.write(line)
+
+    def iter_write(self, tabular_data):
+        encode = json.JSONEncoder().encode
+        header = list(tabular_data.header)
+        if self.objects and not header:
+            raise ValueError('A header is needed to write rows as objects')
+        if self.objects:
+            for row in tabular_data.data:
+                yield encode(OrderedDict(zip(header, row))) + '\n'
+            return
+        if header:
+            yield encode(header) + '\n'
+        for row in tabular_data.data:
+            if not isinstance(row, (list, tuple)):
+                row = list(row)
+            yield encode(row) + '\n'
 
@@ -1,3 +1,5 @@
+import itertools
+
 from base import WriterBase
 
 class TxtWriter(WriterBase):
@@ -14,39 +16,69 @@ TODO
    
      * wontfix: can let terminal do this: just set width very large ...
 
-3. (?) stream output back rather than returning all at once
+3. (?) stream output back rather than returning all at once. DONE: rows are
+   written as they are formatted (see iter_lines)
 
 4. Add support for limiting number of columns displayed. DONE 2007-08-02
    * TODO: add unittest
 '''
 
-    def __init__(self, output_width=0, number_of_columns=0, **kwargs):
+    formats_values = True
+
+    def __init__(self, output_width=0, number_of_columns=0, sample_size=4,
+            prescan=False, **kwargs):
         '''
         @param output_width: display width (0 means unlimited).
         @param number_of_columns: number of columns to try to display (not
             guaranteed to be this number if this would cause problems). (0
             means all columns)
+        @param sample_size: number of rows (including the header) used to
+            work out the number of columns and their widths.
+        @param prescan: use every row to work out column widths rather than
+            a sample. This takes an extra pass over the data (and streamed
+            data has to be held in memory).
         '''
         super(TxtWriter, self).__init__(**kwargs)
         self.output_width = output_width
         self.number_of_columns = number_of_columns
+        self.sample_size = sample_size
+        self.prescan = prescan
 
     def write(self, tabular_data, fileobj):
-        result = ''
-        formatter = None
-        row_cache = []
-        sample_length = 4
-        rows = tabular_data.data
+        for line in self.iter_lines(tabular_data):
+            fileobj.write(line)
+
+    def iter_write(self, tabular_data):
+        return self.iter_lines(tabular_data)
+
+    def iter_lines(self, tabular_data):
+        '''Yield the formatted output line by line.
+
+        Only the sample rows are read before the first line is produced
+        (unless prescan is set) so output of large or streamed tables starts
+        immediately.
+        '''
+        # values are converted to text once (by per column formatters)
+        rows = self._formatted_data(tabular_data)
         if tabular_data.header:
-            rows = [ tabular_data.header ] + rows
-        # include header in sample rows (do we always want to?)
-        sample_rows = rows[:sample_length]
+            header = [ self.value_to_str(value)
+                for value in tabular_data.header ]
+            rows = itertools.chain([ header ], rows)
+        if self.prescan:
+            rows = list(rows)
+            sample_rows = rows
+        else:
+            # include header in sample rows (do we always want to?)
+            sample_rows = list(itertools.islice(rows, self.sample_size))
+            rows = itertools.chain(sample_rows, rows)
+        if not sample_rows:
+            return
         self._compute_parameters(sample_rows)
-        result += self._write_separator()
+        separator = self._write_separator()
+        yield separator
         for row in rows:
-            result += self._write_row(row)
-            result += self._write_separator()
-        fileobj.write(result)
+            yield self._write_row(row)
+            yield separator
 
     def _compute_parameters(self, sample_rows):
         maxcols = self._get_maxcols(sample_rows)
@@ -66,24 +98,15 @@ this narrow an output window. Column width is: %s''' % self.colwidths[0]
     def _write_row(self, row):
         '''Return the input 'python' row as an appropriately formatted string.
         '''
-        result = '|'
-        count = 0
-        for cell in row[:self.numcols]:
-            width = self.colwidths[count]
-            result += self._format_cell(width, cell)
-            count += 1
+        cells = list(row[:self.numcols])
         # now pad out with extra cols as necessary
-        while count < self.numcols:
-            width = self.colwidths[count]
-            result += self._format_cell(width, ' ')
-            count += 1
-        return result + '\n'
+        cells += [ ' ' ] * (self.numcols - len(cells))
+        return '|' + ''.join([ self._format_cell(width, cell)
+            for width, cell in zip(self.colwidths, cells) ]) + '\n'
 
     def _write_separator(self):
-        result = '+'
-        for width in self.colwidths:
-            result += '-' * (width-1) + '+'
-        return result + '\n'
+        return '+' + ''.join([ '-' * (width-1) + '+'
+            for width in self.colwidths ]) + '\n'
 
     def _get_maxcols(self, sample_rows):
         maxcols = 0
@@ -100,15 +123,21 @@ this narrow an output window. Column width is: %s''' % self.colwidths[0]
         else: # make every col as wide as it needs to be
             self.colwidths = [0] * self.numcols
             for row in sample_rows:
-                for ii in range(self.numcols):
-                    cellwidth = len(self.value_to_str(row[ii]))
+                for ii, value in enumerate(row[:self.numcols]):
+                    cellwidth = len(self._text(value))
                     self.colwidths[ii] = max(self.colwidths[ii],
                             cellwidth
                             )
             self.colwidths = [ x + 1 for x in self.colwidths ]
 
+    def _text(self, value):
+        if isinstance(value, basestring):
+            # already converted
+            return value
+        return self.value_to_str(value)
+
     def _format_cell(self, width, content):
-        content = self.value_to_str(content)
+        content = self._text(content)
         content = content.strip()
         if len(content) > width - 1:
             # TODO: be brutal (this *has* to be fixed)
@@ -8,6 +8,7 @@ except ImportError: # xlrd not installed
     pass
 
 from base import ReaderBase, TabularData
+from filters import compile_where, Predicate
 
 class XlsReader(ReaderBase):
     '''Read Excel (xls) files.
@@ -20,7 +21,7 @@ class XlsReader(ReaderBase):
             self.book = xlrd.open_workbook(file_contents=self.fileobj.read())
         ## TODO: fix the rest of this
 
-    def read(self, fileobj=None, sheet_index=0):
+    def read(self, fileobj=None, sheet_index=0, where=None):
         '''Read an excel file (provide as fileobj) and return the specified
         sheet as a L{TabularData} object.
 
@@ -28,6 +29,8 @@ class XlsReader(ReaderBase):
 
         self.book: xlrd WorkBook object
         
+        @param where: only return rows matching this filter (see
+            extract_sheet).
         @return L{TabularData} object.
         '''
         super(XlsReader, self).read(fileobj)
@@ -35,7 +38,7 @@ class XlsReader(ReaderBase):
             self.book = xlrd.open_workbook(file_contents=self.fileobj.read())
         tab = TabularData()
         booksheet = self.book.sheet_by_index(sheet_index)
-        data = self.extract_sheet(booksheet, self.book)
+        data = self.extract_sheet(booksheet, self.book, where=where)
         tab.data = data
         return tab
 
@@ -64,19 +67,46 @@ class XlsReader(ReaderBase):
             info += str(sh.row(rx)) + '\n'
         return info
 
-    def extract_sheet(self, sheet, book):
+    def extract_sheet(self, sheet, book, where=None):
+        '''Return the values of sheet as a list of rows.
+
+        Rows are read as raw cell values (no Cell objects are created) and
+        only date and boolean cells need converting (see cell_to_python).
+
+        @param where: only return rows matching this filter (a
+            L{filters.Predicate} or a function taking a row). Rows are tested
+            before being added to the output. If a Predicate uses column
+            names they are looked up in the first row of the sheet, which is
+            then always returned.
+        '''
         matrix = []
-        nrows = sheet.nrows
-        ncols = sheet.ncols
-        for rx in range(nrows):
-            outrow = []
-            for cx in range(ncols):
-                cell = sheet.cell(rowx=rx, colx=cx)
-                val = self.cell_to_python(cell, book)
-                outrow.append(val)
-            matrix.append(outrow)
+        start = 0
+        if isinstance(where, Predicate):
+            try:
+                where = where.resolve([])
+            except ValueError: # refers to columns by name
+                if sheet.nrows:
+                    header = self._row_values(sheet, 0, book)
+                    where = where.resolve(header)
+                    matrix.append(header)
+                    start = 1
+        test = compile_where(where)
+        for rx in xrange(start, sheet.nrows):
+            row = self._row_values(sheet, rx, book)
+            if test is None or test(row):
+                matrix.append(row)
         return matrix
 
+    def _row_values(self, sheet, rx, book):
+        row = sheet.row_values(rx)
+        types = sheet.row_types(rx)
+        if xlrd.XL_CELL_DATE in types or xlrd.XL_CELL_BOOLEAN in types:
+            for cx, ctype in enumerate(types):
+                if ctype in (xlrd.XL_CELL_DATE, xlrd.XL_CELL_BOOLEAN):
+                    cell = xlrd.sheet.Cell(ctype, row[cx])
+                    row[cx] = self.cell_to_python(cell, book)
+        return row
+
     def cell_to_python(self, cell, book):
         # annoying need book argument for datemode
         # info on types: http://www.lexicon.net/sjmachin/xlrd.html#xlrd.Cell-class
@@ -1,4 +1,5 @@
 import os
+import datetime
 from StringIO import StringIO
 
 import datautil.tabular
@@ -46,6 +47,43 @@ class TestWriterBase:
         out = w.value_to_str(102.34)
         assert out == u'100', out
 
+    def test_value_formatter(self):
+        # formatters give exactly the same text as value_to_str
+        values = [ 'x', u'\xe9', 1, 102.34, 1.3555, 2.0, True, None,
+            datetime.date(2009, 1, 2), 10 ** 20 ]
+        for ndigits in [ None, 2, 0, -1 ]:
+            w = datautil.tabular.WriterBase(round_ndigits=ndigits)
+            for value_type in [ None, str, unicode, int, float, bool,
+                    long ] + datautil.tabular.schema.TYPES:
+                formatter = w.value_formatter(value_type)
+                for value in values:
+                    exp = w.value_to_str(value)
+                    out = formatter(value)
+                    assert out == exp and type(out) == type(exp), \
+                        (ndigits, value_type, value, out)
+
+    def test_row_formatter(self):
+        w = datautil.tabular.WriterBase(round_ndigits=1)
+        format_row = w.row_formatter(sample_row=[ 'a', 1.25 ])
+        assert format_row([ 'b', 2.25 ]) == [ u'b', '2.3' ]
+        # values of other types and extra columns
+        assert format_row([ None, 3, 4.75 ]) == [ u'', '3', '4.8' ]
+        rows = w.iter_formatted([ [ 1.25, 'x' ], [ None ] ],
+            [ 'float', 'string' ])
+        assert list(rows) == [ [ '1.3', u'x' ], [ u'' ] ]
+
+    def test_escape_text(self):
+        w = datautil.tabular.HtmlWriter(round_ndigits=None)
+        assert w.value_to_str('<a&b>') == '&lt;a&amp;b&gt;'
+        assert w.value_formatter(str)('<a>') == '&lt;a&gt;'
+
+    def test_subclass_value_to_str(self):
+        class Writer(datautil.tabular.WriterBase):
+            def value_to_str(self, value):
+                return 'v'
+        w = Writer()
+        assert w.row_formatter(sample_row=[ 1 ])([ 1, 2 ]) == [ 'v', 'v' ]
+
 
 class TestReaderCsv(object):
     
@@ -87,6 +125,72 @@ u'''"headi\xf1g", "header 2"
         self.tab = reader.read(fileobj, encoding=self.encoding)
 
 
+class TestReaderCsvStream(object):
+    csvdata = '"header1", "header 2"\n' + \
+        ''.join(['%s, %s\n' % (ii, ii * 2) for ii in range(100)])
+
+    def test_iter_rows(self):
+        reader = datautil.tabular.CsvReader()
+        rows = reader.iter_rows(StringIO(self.csvdata))
+        assert reader.header == [ 'header1', 'header 2' ], reader.header
+        assert rows.next() == ['0', '0']
+        assert len(list(rows)) == 99
+
+    def test_read_stream(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(StringIO(self.csvdata), stream=True)
+        assert tab.header == [ 'header1', 'header 2' ]
+        assert not isinstance(tab.data, list)
+        assert repr(tab)
+        rows = list(tab)
+        assert len(rows) == 100
+        assert rows[-1] == ['99', '198'], rows[-1]
+
+    def test_small_sample_size(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(StringIO(self.csvdata), sample_size=50)
+        assert tab.header == [ 'header1', 'header 2' ]
+        assert len(tab.data) == 100
+
+    def test_small_sample_size_encoded(self):
+        csvdata = u'"headi\xf1g", "header 2"\n1, 2\n3, 4\n'.encode('utf-16')
+        reader = datautil.tabular.CsvReader()
+        # cut the sample in the middle of a character
+        tab = reader.read(StringIO(csvdata), encoding='utf-16',
+                sample_size=41)
+        assert tab.header == [ u'headi\xf1g'.encode('utf-8'), 'header 2' ]
+        assert tab.data == [ ['1', '2'], ['3', '4'] ], tab.data
+
+
+class TestReaderCsvColumns(object):
+    csvdata = 'a,b,c\n1,2,3\n4,5,6\n'
+
+    def test_columns(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(StringIO(self.csvdata), columns=['c', 0])
+        assert tab.header == [ 'c', 'a' ]
+        assert tab.data == [ ['3', '1'], ['6', '4'] ], tab.data
+
+    def test_columns_infer_types(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(StringIO(self.csvdata), columns=['b'],
+                infer_types=True)
+        assert tab.header == [ 'b' ]
+        assert tab.schema == [ 'int' ]
+        assert tab.data == [ [2], [5] ], tab.data
+
+    def test_where(self):
+        from datautil.tabular.filters import Col
+        reader = datautil.tabular.CsvReader()
+        # filter on a column which is not selected
+        tab = reader.read(StringIO(self.csvdata), columns=['c'],
+                where=Col('a', int) > 1)
+        assert tab.header == [ 'c' ]
+        assert tab.data == [ ['6'] ], tab.data
+        tab = reader.read(StringIO(self.csvdata), where=lambda row: False)
+        assert tab.data == []
+
+
 class TestCsvWriter:
     def test_writer(self):
         writer = datautil.tabular.CsvWriter()
@@ -102,6 +206,37 @@ class TestCsvWriter:
 3,4\r\n'''
         assert out == exp
 
+    def test_unicode(self):
+        writer = datautil.tabular.CsvWriter()
+        td = datautil.tabular.TabularData([[u'\xf1', 2]], header=[u'h\xe9'])
+        out = writer.write_str(td)
+        assert out == 'h\xc3\xa9\r\n\xc3\xb1,2\r\n', out
+        out = writer.write_str(td, encoding='latin-1')
+        assert out == 'h\xe9\r\n\xf1,2\r\n', out
+
+    def test_stream(self):
+        writer = datautil.tabular.CsvWriter()
+        writer.buffer_size = 10
+        fo = StringIO()
+        rows = ( [ii, ii * 2] for ii in range(100) )
+        with writer.open(fo, ['one', 'two']) as w:
+            w.write_rows(rows)
+            w.write_row([u'x', None])
+            # some output already passed on to fo
+            assert 0 < len(fo.getvalue())
+        out = fo.getvalue().splitlines()
+        assert len(out) == 102
+        assert out[0] == 'one,two'
+        assert out[-2] == '99,198'
+        assert out[-1] == 'x,', out[-1]
+
+    def test_round_ndigits(self):
+        writer = datautil.tabular.CsvWriter(round_ndigits=2)
+        td = datautil.tabular.TabularData([[1.2345, 'a'], [None, 2.5]],
+            header=['one', 'two'])
+        out = writer.write_str(td)
+        assert out == 'one,two\r\n1.23,a\r\n,2.5\r\n', out
+
 
 class TestHtmlReader:
 
@@ -166,6 +301,22 @@ class TestHtmlWriter:
         # no caption but headings
         out1 = self.writer1.write_str(self.indata1, caption, rowHeadings)
         assert expected == out1
+        # the header is not changed
+        assert self.indata1.header == ['x', 'y']
+
+    def test_iter_html(self):
+        rows = iter([ [1, 1], [0, u'\xe9'] ])
+        tdata = datautil.tabular.TabularData(header=['x', 'y'], data=rows)
+        fragments = self.writer1.iter_html(tdata, encoding='utf-8')
+        assert fragments.next().endswith('<tbody>')
+        assert fragments.next() == '<tr><td>1</td><td>1</td></tr>'
+        # rows are only read as needed
+        assert rows.next() == [0, u'\xe9']
+        assert list(fragments) == [ '</tbody></table>' ]
+        fragments = self.writer1.iter_html(
+            datautil.tabular.TabularData(data=[ [u'\xe9'] ]),
+            encoding='utf-8')
+        assert '<td>\xc3\xa9</td>' in ''.join(fragments)
     
     def test_escaping(self):
         tdata = datautil.tabular.TabularData(header=['s&p', 'y<z'])
@@ -197,6 +348,13 @@ r'''\textbf{H1} & \textbf{H2} \\
 '''
     m2l = datautil.tabular.LatexWriter()
 
+    def test_round_ndigits_positional(self):
+        # round_ndigits is still the first argument
+        writer = datautil.tabular.LatexWriter(2)
+        assert writer.round_ndigits == 2
+        assert not writer.longtable
+        assert writer.process_row([ 1.2345 ]).startswith('1.23 ')
+
     def test_escape(self):
         in1 = '& % $ something'
         exp1 = r'\& \% $ something'
@@ -212,6 +370,46 @@ r'''\textbf{H1} & \textbf{H2} \\
         out = self.m2l.write_str(td)
         self.diff(self.exp, out)
         assert out == self.exp
+        # data is not modified
+        assert td.data == self.matrix[1:]
+
+    def test_stream(self):
+        td = datautil.tabular.TabularData(data=iter(self.matrix[1:]),
+                header=self.matrix[0])
+        out = self.m2l.write_str(td)
+        assert out == self.exp
+
+    def test_longtable(self):
+        td = datautil.tabular.TabularData(data=self.matrix[1:],
+                header=self.matrix[0])
+        writer = datautil.tabular.LatexWriter(longtable=True,
+                rows_per_page=1)
+        out = writer.write_str(td)
+        head = '\\textbf{H1} & \\textbf{H2} \\\\\n\\hline\n'
+        exp = '\\begin{longtable}{ll}\n' + head + '\\endfirsthead\n' + \
+            head + '\\endhead\n' + '1 & 2\\% \\\\\n\\hline\n' + \
+            '\\newpage\n' + '3 & 4 \\\\\n\\hline\n' + \
+            '\\end{longtable}\n'
+        self.diff(exp, out)
+        assert out == exp
+
+    def test_write_files(self):
+        import os
+        import shutil
+        import tempfile
+        tmpdir = tempfile.mkdtemp()
+        try:
+            td = datautil.tabular.TabularData(data=iter(self.matrix[1:] * 2),
+                    header=self.matrix[0])
+            paths = self.m2l.write_files(td,
+                    os.path.join(tmpdir, 'part-%d.tex'), 3)
+            assert [ os.path.basename(path) for path in paths ] == [
+                'part-1.tex', 'part-2.tex' ], paths
+            out = open(paths[1]).read()
+            assert out.startswith('\\textbf{H1}')
+            assert len(out.splitlines()) == 4, out
+        finally:
+            shutil.rmtree(tmpdir)
 
     def diff(self, str1, str2):
         import difflib
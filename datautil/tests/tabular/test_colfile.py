@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from datautil.tabular.base import TabularData
+from datautil.tabular.columnar import ColumnarTabularData, DictColumn, \
+    StringColumn
+from datautil.tabular.colfile import ColumnFileWriter, ColumnFileReader
+
+
+class TestColumnFile:
+    header = [ 'id', 'value', 'name', 'label', 'other', 'blank' ]
+    data = [ [ ii, ii / 2.0, 'name %s' % (ii % 3), u'\xe9t\xe9 %s' % ii,
+        [ii] if ii % 2 else 'x', None ] for ii in range(20) ]
+    data[5][0] = None
+    data[6][2] = None
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.col')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _roundtrip(self, table, **kwargs):
+        ColumnFileWriter(**kwargs).write(table, open(self.path, 'wb'))
+        return ColumnFileReader().read(self.path)
+
+    def test_roundtrip(self):
+        table = TabularData(data=self.data, header=self.header)
+        out = self._roundtrip(table)
+        assert isinstance(out, ColumnarTabularData)
+        assert out.header == self.header
+        assert out.to_list() == table.to_list(), out.to_list()[:3]
+        assert out.data[5][0] is None
+        # repeated strings are dictionary encoded, unique ones are not
+        assert isinstance(out.columns[2], DictColumn)
+        assert isinstance(out.columns[3], StringColumn)
+        assert out.column('id')[19] == 19
+
+    def test_codecs(self):
+        table = TabularData(data=self.data, header=self.header)
+        for codec in [ 'zlib', 'bz2', { 'name': 'zlib', 1: 'bz2' } ]:
+            out = self._roundtrip(table, codec=codec)
+            assert out.to_list() == table.to_list(), codec
+
+    def test_unknown_codec(self):
+        table = TabularData(data=self.data, header=self.header)
+        try:
+            ColumnFileWriter(codec='lzma').write(table, StringIO())
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError'
+
+    def test_columns(self):
+        table = TabularData(data=self.data, header=self.header)
+        ColumnFileWriter().write(table, open(self.path, 'wb'))
+        out = ColumnFileReader().read(self.path, columns=[ 'name', 0 ])
+        assert out.header == [ 'name', 'id' ]
+        assert out.data[1] == [ 'name 1', 1 ]
+
+        reader = ColumnFileReader()
+        reader.open(self.path)
+        assert reader.nrows == 20
+        assert list(reader.read_column('value'))[:3] == [ 0.0, 0.5, 1.0 ]
+        reader.close()
+
+    def test_closed(self):
+        table = TabularData(data=self.data, header=self.header)
+        ColumnFileWriter().write(table, open(self.path, 'wb'))
+        reader = ColumnFileReader()
+        out = reader.read(self.path)
+        # file and map released but loaded columns still usable
+        assert reader.fileobj.closed
+        assert reader._buffer is None
+        assert out.to_list() == table.to_list()
+
+        with ColumnFileReader() as reader:
+            reader.open(self.path)
+            assert reader.read_column('id')[3] == 3
+        assert reader.fileobj.closed
+
+        # file objects passed in are left open
+        fileobj = open(self.path, 'rb')
+        ColumnFileReader().read(fileobj)
+        assert not fileobj.closed
+        fileobj.close()
+
+    def test_ragged_and_fileobj(self):
+        table = ColumnarTabularData(data=[ [1, 'a'], [2] ], header=[])
+        fileobj = StringIO()
+        ColumnFileWriter().write(table, fileobj)
+        out = ColumnFileReader().read(StringIO(fileobj.getvalue()))
+        assert out.to_list() == [ [1, 'a'], [2] ], out.to_list()
+
+    def test_dictionary_column_append(self):
+        data = [ ['a'], ['b'], ['a'], ['a'] ]
+        table = self._roundtrip(TabularData(data=data))
+        assert isinstance(table.columns[0], DictColumn)
+        table.append([ 'c' ])
+        table.append([ None ])
+        assert table.to_list() == data + [ ['c'], [None] ]
+
+    def test_empty(self):
+        table = self._roundtrip(TabularData(header=['a'], data=[]))
+        assert table.header == [ 'a' ]
+        assert list(table.data) == []
+
+    def test_dictionary_types(self):
+        # str (in any encoding) and unicode values are kept apart
+        data = [ ['\xc3\xa9'], [u'\xe9'], ['\xc3\xa9'], [u'\xe9'], ['x'],
+            ['x'] ]
+        column = DictColumn()
+        for row in data:
+            column.append(row[0])
+        table = ColumnarTabularData.from_columns([ column ], header=['a'],
+            lengths=None)
+        out = self._roundtrip(table)
+        assert isinstance(out.columns[0], DictColumn)
+        assert [ type(row[0]) for row in out.data ] == \
+            [ type(row[0]) for row in data ]
+        assert list(out.data) == data
+
+    def test_not_a_column_file(self):
+        try:
+            ColumnFileReader().read(StringIO('a,b\n1,2\n'))
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError'
@@ -0,0 +1,63 @@
+import array
+
+import datautil.tabular
+from datautil.tabular.columnar import *
+
+
+class TestColumnarTabularData:
+    header = [ 'name', 'year', 'value', 'note' ]
+    data = [
+        [ 'x', 2004, 1.5, u'a' ],
+        [ 'y', 2005, None, None ],
+        [ 'z', 2006, 3.0, 12 ],
+        ]
+
+    def setUp(self):
+        self.td = datautil.tabular.TabularData(header=list(self.header),
+                data=[ list(row) for row in self.data ])
+        self.ctd = ColumnarTabularData.from_tabular(self.td)
+
+    def test_column_types(self):
+        cols = self.ctd.columns
+        assert isinstance(cols[0], StringColumn)
+        assert isinstance(cols[1], TypedColumn)
+        assert isinstance(cols[2], TypedColumn)
+        assert cols[2].values.typecode == 'd'
+        assert isinstance(cols[3], ListColumn)
+
+    def test_rows(self):
+        assert self.ctd.header == self.header
+        assert self.ctd.nrows == 3
+        assert len(self.ctd.data) == 3
+        assert self.ctd.data[0] == self.data[0]
+        assert self.ctd.data[-1][-1] == 12
+        assert self.ctd.data[1][2] is None
+        assert [ list(row) for row in self.ctd ] == self.data
+
+    def test_column(self):
+        years = self.ctd.column('year')
+        assert isinstance(years, array.array)
+        assert sum(years) == 6015
+        assert list(self.ctd.column(2)) == [ 1.5, None, 3.0 ]
+
+    def test_roundtrip(self):
+        out = self.ctd.to_tabular()
+        assert out.header == self.header
+        assert out.data == self.data
+        assert self.ctd.to_list() == self.td.to_list()
+
+    def test_ragged(self):
+        data = [ [ '1', '2' ], [ '1983' ], [ '3', '4', '5' ] ]
+        ctd = ColumnarTabularData(data=data)
+        assert [ list(row) for row in ctd ] == data
+        assert len(ctd.data[1]) == 1
+
+    def test_leading_nulls(self):
+        ctd = ColumnarTabularData(data=[ [None], [None], [1] ])
+        assert isinstance(ctd.columns[0], TypedColumn)
+        assert list(ctd.column(0)) == [ None, None, 1 ]
+
+    def test_set_data(self):
+        self.ctd.data = [ [ 1, 2 ] ]
+        assert self.ctd.nrows == 1
+        assert self.ctd.data[0] == [ 1, 2 ]
@@ -0,0 +1,74 @@
+import datetime
+
+from datautil.tabular import TabularData, dedupe
+from datautil.tabular.dedupe import BloomFilter
+
+
+class TestDedupe:
+    td = TabularData(header=['Name', 'Year'],
+            data=[
+                ['x', 2004],
+                ['y', 2004],
+                ['x', 2004],
+                ['x', 2005],
+                ['y', 2004],
+            ])
+
+    def test_whole_rows(self):
+        out = dedupe(self.td)
+        assert out.header == [ 'Name', 'Year' ]
+        assert list(out) == [ ['x', 2004], ['y', 2004], ['x', 2005] ]
+
+    def test_keys(self):
+        out = dedupe(self.td, 'Name')
+        assert list(out) == [ ['x', 2004], ['y', 2004] ]
+        out = dedupe(self.td.data, [1], header=[])
+        assert list(out) == [ ['x', 2004], ['x', 2005] ]
+
+    def test_types_distinguished(self):
+        rows = [ ('1',), (1,), (1,), (datetime.date(2000, 1, 1),),
+            (datetime.date(2000, 1, 1),) ]
+        assert len(list(dedupe(rows))) == 3
+
+    def test_spill(self):
+        rows = [ [ ii % 50, 'x' ] for ii in range(200) ]
+        out = list(dedupe(iter(rows), max_hashes=7, partitions=3))
+        assert len(out) == 50, len(out)
+        # rows read back from disk are lists like those kept in memory
+        assert set(type(row) for row in out) == set([ list ])
+        assert sorted(out) == rows[:50]
+        # rows held in memory come first in their original order
+        assert out[:7] == rows[:7]
+
+    def test_approximate(self):
+        rows = [ [ ii % 500 ] for ii in range(2000) ]
+        out = list(dedupe(rows, approximate=True, capacity=1000,
+            error_rate=0.001))
+        # false positives are possible but should be very rare
+        assert 495 <= len(out) <= 500, len(out)
+        assert len(set([ row[0] for row in out ])) == len(out)
+
+
+class TestBloomFilter:
+    def test_bloom(self):
+        bloom = BloomFilter(1000, 0.01)
+        assert not bloom.add('a')
+        assert bloom.add('a')
+        assert 'a' in bloom
+        assert len(bloom) == 1
+        added = [ str(ii) for ii in range(1000) ]
+        for item in added:
+            bloom.add(item)
+        # no false negatives
+        assert all([ item in bloom for item in added ])
+        false_positives = len([ ii for ii in range(1000, 11000)
+            if str(ii) in bloom ])
+        assert false_positives < 300, false_positives
+
+    def test_bad_args(self):
+        try:
+            BloomFilter(10, 1.5)
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError'
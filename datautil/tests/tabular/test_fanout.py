@@ -0,0 +1,76 @@
+from StringIO import StringIO
+
+from datautil.tabular import TabularData, CsvWriter, JsonWriter, \
+    NdjsonWriter, HtmlWriter, LatexWriter, TxtWriter, ColumnFileWriter, \
+    FanoutWriter
+
+
+class CountingHtmlWriter(HtmlWriter):
+    calls = 0
+
+    def iter_formatted(self, rows, types=None):
+        CountingHtmlWriter.calls += 1
+        return super(CountingHtmlWriter, self).iter_formatted(rows, types)
+
+
+class TestFanoutWriter:
+    header = [ 'id', 'value', 'name' ]
+    data = [ [ ii, ii / 3.0, 'n&%s' % ii ] for ii in range(2500) ]
+
+    def _writers(self):
+        return [ (CsvWriter(), {}), (CsvWriter(round_ndigits=1), {}),
+            (JsonWriter(), {}), (NdjsonWriter(), {}),
+            (HtmlWriter(), { 'caption': 'c' }), (HtmlWriter(), {}),
+            (LatexWriter(longtable=True, round_ndigits=2), {}),
+            (TxtWriter(), {}), (ColumnFileWriter(), {}) ]
+
+    def test_same_output(self):
+        writers = self._writers()
+        exp = [ writer.write_str(TabularData(self.data, self.header),
+            **kwargs) for writer, kwargs in writers ]
+        read = []
+        def rows():
+            for row in self.data:
+                read.append(row)
+                yield row
+        fileobjs = [ StringIO() for ii in writers ]
+        FanoutWriter([ (writer, fileobj, kwargs) for (writer, kwargs),
+            fileobj in zip(writers, fileobjs) ]).write(
+                TabularData(rows(), self.header))
+        assert len(read) == len(self.data)
+        for writer, fileobj, out in zip(writers, fileobjs, exp):
+            assert fileobj.getvalue() == out, writer
+
+    def test_interleaved(self):
+        # outputs are written as the rows are read
+        fileobjs = [ StringIO(), StringIO() ]
+        def rows():
+            for ii, row in enumerate(self.data):
+                if ii == 2000:
+                    for fileobj in fileobjs:
+                        assert '1500' in fileobj.getvalue()
+                yield row
+        writer = FanoutWriter(zip([ JsonWriter(), HtmlWriter() ], fileobjs))
+        writer.batch_size = 100
+        writer.write(TabularData(rows(), self.header))
+        assert fileobjs[1].getvalue().endswith('</table>')
+
+    def test_shared_formatting(self):
+        CountingHtmlWriter.calls = 0
+        writers = [ CountingHtmlWriter(), CountingHtmlWriter(),
+            CountingHtmlWriter(round_ndigits=1) ]
+        fileobjs = [ StringIO() for ii in writers ]
+        FanoutWriter(zip(writers, fileobjs)).write(
+            TabularData(self.data, self.header))
+        # once for the two writers which agree and once for the other
+        assert CountingHtmlWriter.calls == 2, CountingHtmlWriter.calls
+        assert fileobjs[0].getvalue() == fileobjs[1].getvalue()
+        assert '<td>0.33</td>' in fileobjs[0].getvalue()
+        assert '<td>0.3</td>' in fileobjs[2].getvalue()
+
+    def test_empty(self):
+        fileobjs = [ StringIO(), StringIO() ]
+        FanoutWriter(zip([ CsvWriter(), JsonWriter() ], fileobjs)).write(
+            TabularData([], [ 'a' ]))
+        assert fileobjs[0].getvalue() == 'a\r\n'
+        assert fileobjs[1].getvalue() == '{"header": ["a"], "data": [\n]}\n'
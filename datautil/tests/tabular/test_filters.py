@@ -0,0 +1,57 @@
+from datautil.misc import floatify
+from datautil.tabular.filters import Col, compile_where
+
+
+class TestFilters:
+    header = [ 'name', 'year', 'value' ]
+    rows = [
+        [ 'x', '2000', '1.5' ],
+        [ 'y', '2001', '-' ],
+        [ 'z', 'n/a', '3' ],
+        [ 'x', '2003' ],
+        ]
+
+    def _names(self, where):
+        test = where.compile(self.header)
+        return [ row[0] + row[1] for row in self.rows if test(row) ]
+
+    def test_compare(self):
+        assert self._names(Col('name') == 'x') == [ 'x2000', 'x2003' ]
+        assert self._names(Col(0) != 'x') == [ 'y2001', 'zn/a' ]
+        # unconvertible values never match
+        assert self._names(Col('year', int) >= 2001) == [ 'y2001', 'x2003' ]
+        assert self._names(Col('year', int) < 2001) == [ 'x2000' ]
+
+    def test_isin_between(self):
+        assert self._names(Col('name').isin(['y', 'z'])) == [ 'y2001',
+            'zn/a' ]
+        out = self._names(Col('year', int).between(2001, 2003))
+        assert out == [ 'y2001', 'x2003' ], out
+
+    def test_nulls(self):
+        # placeholders and missing values are null
+        out = self._names(Col('value').is_null())
+        assert out == [ 'y2001', 'x2003' ], out
+        assert self._names(Col('value').not_null()) == [ 'x2000', 'zn/a' ]
+        # None is not less than anything
+        assert self._names(Col('value', floatify) < 2) == [ 'x2000' ]
+
+    def test_and_or_not(self):
+        where = (Col('name') == 'x') & (Col('value', float) > 1)
+        assert self._names(where) == [ 'x2000' ]
+        where = (Col('name') == 'z') | (Col('value', float) > 1)
+        assert self._names(where) == [ 'x2000', 'zn/a' ]
+        assert self._names(~(Col('name') == 'x')) == [ 'y2001', 'zn/a' ]
+
+    def test_not_boolean(self):
+        try:
+            (Col(0) == 1) and (Col(1) == 2)
+        except TypeError:
+            pass
+        else:
+            assert False, 'expected TypeError'
+
+    def test_compile_where(self):
+        func = lambda row: True
+        assert compile_where(func) is func
+        assert compile_where(Col(0) == 'x')(['x'])
@@ -0,0 +1,53 @@
+import datautil.tabular
+from datautil.tabular import TabularData, LazyTable, group_by
+from datautil.tabular.spill import SpillFile
+from datautil.tabular.rows import compact
+
+
+class TestSpillFile:
+    def test_roundtrip(self):
+        spill = SpillFile()
+        spill.batch_size = 3
+        spill.write_rows([ [ii, str(ii)] for ii in range(10) ])
+        assert len(spill) == 10
+        assert list(spill) == [ [ii, str(ii)] for ii in range(10) ]
+        # can write more and read again
+        spill.write([10, '10'])
+        rows = list(spill)
+        assert len(rows) == 11 and rows[-1] == [10, '10']
+        spill.close()
+
+
+class TestGroupBy:
+    td = TabularData(header=['Name', 'Year', 'Value'],
+            data=[
+                ['x', 2004, 1],
+                ['y', 2004, 2],
+                ['x', 2005, 3],
+                ['x', 2004, 4],
+            ])
+
+    def test_group_by(self):
+        out = group_by(self.td, 'Name',
+                [ ('Value', 'sum'), (None, 'count', 'n') ])
+        assert out.header == [ 'Name', 'sum_Value', 'n' ], out.header
+        assert sorted(out.data) == [ ['x', 8, 3], ['y', 2, 1] ], out.data
+
+    def test_multiple_keys(self):
+        out = group_by(self.td, ['Name', 'Year'], [ ('Value', 'max') ])
+        assert sorted(out.data) == [ ['x', 2004, 4], ['x', 2005, 3],
+            ['y', 2004, 2] ], out.data
+
+    def test_lazy_input(self):
+        lazy = LazyTable(self.td).filter(lambda row: row[1] == 2004)
+        out = group_by(lazy, 1, [ (2, 'mean') ])
+        assert out.header == [ 'Year', 'mean_2' ]
+        assert out.data == [ [2004, 7 / 3.0] ], out.data
+
+    def test_spill(self):
+        data = [ [ii % 50, ii] for ii in range(1000) ]
+        td = compact(TabularData(header=['k', 'v'], data=data))
+        out = group_by(td, 'k', [ ('v', 'sum'), ('v', 'count') ],
+                max_groups=3, partitions=4)
+        exp = [ [k, sum(range(k, 1000, 50)), 20] for k in range(50) ]
+        assert sorted(out.data) == exp, sorted(out.data)
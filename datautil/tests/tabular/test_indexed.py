@@ -0,0 +1,66 @@
+import os
+import time
+import shutil
+import tempfile
+
+from datautil.tabular.indexed import IndexedCsv
+
+
+class TestIndexedCsv:
+    raw = 'a,b\n' + ''.join([ '%s,"x%s"\n' % (ii, '\n' if ii == 3 else '')
+        for ii in range(10) ]) + '10,end'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.csv')
+        open(self.path, 'wb').write(self.raw)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_access(self):
+        table = IndexedCsv(self.path, has_header=True)
+        assert table.header == [ 'a', 'b' ]
+        assert len(table) == 11
+        assert table[0] == [ '0', 'x' ]
+        assert table[3] == [ '3', 'x\n' ], table[3]
+        assert table[-1] == [ '10', 'end' ]
+        assert table[2:5] == [ ['2', 'x'], ['3', 'x\n'], ['4', 'x'] ]
+        assert table[::5] == [ ['0', 'x'], ['5', 'x'], ['10', 'end'] ]
+        assert list(table.iter_rows(9)) == [ ['9', 'x'], ['10', 'end'] ]
+        assert len(list(table)) == 11
+        table.close()
+
+    def test_sniff_header(self):
+        table = IndexedCsv(self.path)
+        assert table.header == [ 'a', 'b' ], table.header
+        table.close()
+
+    def test_index_persisted(self):
+        table = IndexedCsv(self.path, has_header=True)
+        table.close()
+        assert os.path.exists(self.path + '.idx')
+        # corrupt the in-memory builder: a reused index must not call it
+        orig = IndexedCsv._build_index
+        IndexedCsv._build_index = None
+        try:
+            table = IndexedCsv(self.path, has_header=True)
+            assert table[10] == [ '10', 'end' ]
+            table.close()
+        finally:
+            IndexedCsv._build_index = orig
+
+    def test_index_rebuilt_on_change(self):
+        IndexedCsv(self.path, has_header=True).close()
+        open(self.path, 'ab').write('\n11,more\n')
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        table = IndexedCsv(self.path, has_header=True)
+        assert len(table) == 12
+        assert table[11] == [ '11', 'more' ]
+        table.close()
+
+    def test_no_index_file(self):
+        with IndexedCsv(self.path, has_header=True, index_path=False) as table:
+            assert len(table) == 11
+        assert not os.path.exists(self.path + '.idx')
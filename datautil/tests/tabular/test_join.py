@@ -0,0 +1,92 @@
+from datautil.tabular import TabularData, LazyTable, join
+from datautil.tabular.spill import external_sort
+from datautil.tabular.rows import row_class, compact
+
+
+class TestExternalSort:
+    def test_sort(self):
+        rows = [ [ (ii * 7) % 100, ii ] for ii in range(100) ]
+        key = lambda row: row[0]
+        out = list(external_sort(rows, key, max_rows=7))
+        assert out == sorted(rows, key=key)
+        out = list(external_sort(iter(rows), key, max_rows=1000))
+        assert out == sorted(rows, key=key)
+
+    def test_stable(self):
+        rows = [ [ ii % 3, ii ] for ii in range(30) ]
+        key = lambda row: row[0]
+        out = list(external_sort(rows, key, max_rows=4))
+        assert out == sorted(rows, key=key)
+
+    def test_compact_rows(self):
+        # spilled compact rows come back as lists (like spilled lists)
+        Row = row_class([ 'k', 'v' ])
+        rows = [ Row([ (ii * 7) % 10, ii ]) for ii in range(10) ]
+        key = lambda row: row[0]
+        out = list(external_sort(rows, key, max_rows=3))
+        assert out == [ list(row) for row in sorted(rows, key=key) ]
+        assert type(out[0]) is list
+
+
+class TestJoin:
+    left = TabularData(header=['code', 'value'], data=[
+        ['a', 1], ['b', 2], ['c', 3], ['a', 4],
+        ])
+    right = TabularData(header=['id', 'name'], data=[
+        ['a', 'Alpha'], ['b', 'Beta'], ['b', 'Bravo'], ['d', 'Delta'],
+        ])
+
+    def _join(self, how, max_build_rows=1000000):
+        return join(self.left, self.right, 'code', 'id', how=how,
+                max_build_rows=max_build_rows)
+
+    def test_inner(self):
+        out = self._join('inner')
+        assert isinstance(out, LazyTable)
+        assert out.header == [ 'code', 'value', 'id', 'name' ]
+        assert list(out) == [
+            ['a', 1, 'a', 'Alpha'],
+            ['b', 2, 'b', 'Beta'],
+            ['b', 2, 'b', 'Bravo'],
+            ['a', 4, 'a', 'Alpha'],
+            ], list(out)
+
+    def test_left(self):
+        out = list(self._join('left'))
+        assert ['c', 3, None, None] in out
+        assert len(out) == 5
+
+    def test_anti(self):
+        out = self._join('anti')
+        assert out.header == [ 'code', 'value' ]
+        assert list(out) == [ ['c', 3] ]
+
+    def test_merge_join(self):
+        # right side too big for a hash join
+        for how in [ 'inner', 'left', 'anti' ]:
+            hashed = sorted(self._join(how))
+            merged = list(self._join(how, max_build_rows=1))
+            assert merged == sorted(merged)
+            assert sorted(merged) == hashed, (how, merged, hashed)
+
+    def test_merge_join_compact_rows(self):
+        left = compact(TabularData(header=['k', 'x'],
+            data=[ [ ii % 4, ii ] for ii in range(12) ]))
+        right = compact(TabularData(header=['k', 'y'],
+            data=[ [ ii, 'y%s' % ii ] for ii in range(8) ]))
+        merged = list(join(left, right, 'k', max_build_rows=5))
+        hashed = list(join(left, right, 'k'))
+        assert len(merged) == 12
+        assert merged == sorted(hashed), merged
+
+    def test_multiple_keys_and_streams(self):
+        left = LazyTable(iter([ [1, 2, 'x'], [1, 3, 'y'] ]), header=['a', 'b', 'c'])
+        right = iter([ (1, 3, 'match') ])
+        out = list(join(left, right, ['a', 'b'], [0, 1]))
+        assert out == [ [1, 3, 'y', 1, 3, 'match'] ], out
+
+    def test_lazy(self):
+        def right():
+            raise AssertionError('should not be read')
+            yield
+        join(self.left, right(), 'code', 0)
@@ -27,3 +27,78 @@ class TestJson:
         out = writer.write_str(td)
         assert js.json.loads(out) == self.in1
 
+        # rows are written one per line after the header
+        assert out.startswith('{"header": ["a", "b"], "data": [\n[1, 2],\n')
+
+    def test_JsonWriter_stream(self):
+        writer = js.JsonWriter()
+        td = js.TabularData(header=self.in1['header'],
+                data=iter(self.in1['data']))
+        assert js.json.loads(writer.write_str(td)) == self.in1
+        out = writer.write_str(js.TabularData(), indent=2)
+        assert js.json.loads(out) == { 'header': [], 'data': [] }
+
+    def test_JsonReader_stream(self):
+        reader = js.JsonReader()
+        reader.chunk_size = 3
+        for indata in [ self.in1, self.in2,
+                { 'other': {'x': [1]}, 'data': [[1, 2], [3, 4]],
+                    'header': [u'a', u'b'] } ]:
+            text = js.json.dumps(indata, indent=1)
+            out = reader.read(StringIO(text), stream=True)
+            assert out.header == self.in1['header'], out.header
+            assert not isinstance(out.data, list)
+            assert list(out.data) == self.in1['data'], text
+
+        text = js.JsonWriter().write_str(js.TabularData(header=['x'],
+            data=[ [u'\xe9' * 10], [12345], [None] ]))
+        out = reader.read(StringIO(text), stream=True)
+        assert list(out.data) == [ [u'\xe9' * 10], [12345], [None] ]
+
+    def test_JsonReader_stream_error(self):
+        try:
+            js.JsonReader().read(StringIO('{"data": [[1, 2'), stream=True)
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError'
+
+
+class TestNdjson:
+    td = js.TabularData(header=[u'a', u'b'], data=[ [1, u'x'], [2, None] ])
+
+    def test_arrays(self):
+        out = js.NdjsonWriter().write_str(self.td)
+        assert out == '["a", "b"]\n[1, "x"]\n[2, null]\n', out
+        tab = js.NdjsonReader().read(StringIO(out))
+        assert tab.header == self.td.header
+        assert tab.data == self.td.data
+
+    def test_objects(self):
+        out = js.NdjsonWriter(objects=True).write_str(self.td)
+        assert out.splitlines()[0] == '{"a": 1, "b": "x"}', out
+        out += '\n{"b": "y"}\n'
+        tab = js.NdjsonReader().read(StringIO(out), stream=True)
+        assert tab.header == [u'a', u'b']
+        assert list(tab.data) == self.td.data + [ [None, u'y'] ]
+
+    def test_no_header(self):
+        tab = js.NdjsonReader().read(StringIO('[1]\n[2]\n'), has_header=False)
+        assert tab.header == []
+        assert tab.data == [ [1], [2] ]
+
+    def test_objects_need_header(self):
+        td = js.TabularData(data=[ [1, 2] ])
+        try:
+            js.NdjsonWriter(objects=True).write_str(td)
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError'
+
+    def test_encoding(self):
+        data = u'["n"]\n["\xe9t\xe9"]\n'.encode('latin-1')
+        reader = js.NdjsonReader()
+        reader.encoding = 'latin-1'
+        tab = reader.read(StringIO(data))
+        assert tab.data == [ [u'\xe9t\xe9'] ], tab.data
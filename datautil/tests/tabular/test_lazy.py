@@ -0,0 +1,67 @@
+from StringIO import StringIO
+
+import datautil.tabular
+from datautil.tabular import LazyTable, TabularData
+
+
+class TestLazyTable:
+    td = TabularData(header=['Name', 'Year', 'Value'],
+            data=[
+                ['x', 2004, 1],
+                ['y', 2004, 2],
+                ['y', 2005, 4],
+                ['x', 2005, 3],
+            ])
+
+    def test_passthrough(self):
+        table = LazyTable(self.td)
+        assert table.header == self.td.header
+        assert list(table) == self.td.data
+
+    def test_select(self):
+        table = LazyTable(self.td).select('Value', 'Name')
+        assert table.header == [ 'Value', 'Name' ]
+        assert list(table)[0] == (1, 'x')
+        single = LazyTable(self.td).select(1)
+        assert list(single)[-1] == (2005,)
+
+    def test_chain(self):
+        table = LazyTable(self.td)
+        out = table.filter(lambda row: row[0] == 'y') \
+            .map(lambda row: [row[0], row[1], row[2] * 10]) \
+            .rename({'Value': 'Amount'}) \
+            .select('Amount') \
+            .limit(1)
+        assert out.header == [ 'Amount' ]
+        assert list(out) == [ (20,) ]
+        # original untouched
+        assert table.header == self.td.header
+        assert len(list(table)) == 4
+
+    def test_limit_before_filter(self):
+        out = LazyTable(self.td).limit(2).filter(lambda row: row[0] == 'y')
+        assert list(out) == [ ['y', 2004, 2] ]
+
+    def test_lazy(self):
+        seen = []
+        def source():
+            for row in self.td.data:
+                seen.append(row)
+                yield row
+        out = LazyTable(source(), header=self.td.header).limit(1)
+        assert not seen
+        assert list(out) == [ self.td.data[0] ]
+        assert len(seen) == 1
+
+    def test_to_tabular(self):
+        out = LazyTable(self.td).select('Name').to_tabular()
+        assert out.header == [ 'Name' ]
+        assert out.data == [ ['x'], ['y'], ['y'], ['x'] ]
+
+    def test_write_csv(self):
+        reader = datautil.tabular.CsvReader()
+        instream = reader.read(StringIO('a,b\n1,2\n3,4\n'), stream=True)
+        out = LazyTable(instream).select('b').filter(lambda row: row[0] != '2')
+        fo = StringIO()
+        datautil.tabular.CsvWriter().write(out, fo)
+        assert fo.getvalue() == 'b\r\n4\r\n', fo.getvalue()
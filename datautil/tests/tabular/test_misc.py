@@ -14,6 +14,29 @@ class TestTranspose:
         out = datautil.tabular.transpose(inlist)
         assert out == exp, out
 
+    def test_blocked_in_memory(self):
+        rows = [ [ 1, 2, 3 ], [ 4, 5 ] ]
+        out = list(datautil.tabular.transpose_blocked(rows))
+        assert out == [ [1, 4], [2, 5], [3, None] ], out
+
+    def test_blocked_spilled(self):
+        rows = [ [ ii * 10 + jj for jj in range(7) ] for ii in range(30) ]
+        rows[3] = rows[3][:2]
+        rows.append(range(9))
+        exp = [ list(col) for col in map(None, *rows) ]
+        # small enough that rows are spilled in 3 blocks and each block is
+        # read in several passes
+        out = datautil.tabular.transpose_blocked(iter(rows), max_cells=40,
+                block_width=3)
+        out = list(out)
+        assert out == exp, out
+
+    def test_blocked_tabular(self):
+        td = datautil.tabular.TabularData(header=['Year', 'A'],
+                data=[ [2000, 1], [2001, 2] ])
+        out = list(datautil.tabular.transpose_blocked(td, max_cells=3))
+        assert out == [ ['Year', 2000, 2001], ['A', 1, 2] ], out
+
 class TestPivot:
     td = datautil.tabular.TabularData(
             header=['Name','Year','Value'],
@@ -38,3 +61,81 @@ class TestPivot:
         out = datautil.tabular.pivot(self.td.data, 1, 0, 2)
         assert out.data[0] == [2004, 1, 2]
 
+
+class TestPivotReducers:
+    td = datautil.tabular.TabularData(
+            header=['Name','Year','Value'],
+            data=[
+                ['x',2004,1],
+                ['y',2004,2],
+                ['x',2004,'5'],
+                ['x',2005,3],
+                ['x',2005,''],
+            ],
+        )
+
+    def test_sum(self):
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value',
+                reducer='sum')
+        assert out.header == [ 'Year', 'x', 'y' ]
+        assert out.data == [ [2004, 6.0, 2], [2005, 3, ''] ], out.data
+
+    def test_count_mean(self):
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value',
+                reducer='count')
+        assert out.data[0] == [2004, 2, 1]
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value',
+                reducer='mean')
+        assert out.data == [ [2004, 3.0, 2.0], [2005, 3.0, ''] ], out.data
+
+    def test_first_last(self):
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value',
+                reducer='first')
+        assert out.data[0] == [2004, 1, 2]
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value')
+        assert out.data[1] == [2005, '', ''], out.data
+
+    def test_sparse(self):
+        out = datautil.tabular.pivot(self.td, 'Year', 'Name', 'Value',
+                reducer='min', sparse=True)
+        assert out.header == [ 'Year', 'Name', 'Value' ]
+        assert out.data == [ [2004, 'x', 1], [2004, 'y', 2], [2005, 'x', 3] ], out.data
+
+    def test_min_max_strings(self):
+        # e.g. csv data
+        td = datautil.tabular.TabularData(data=[ ['x', '2004', '9'],
+            ['x', '2004', '10'], ['y', '2004', '7'], ['y', '2004', ''] ])
+        out = datautil.tabular.pivot(td, 1, 0, 2, reducer='max')
+        assert out.data == [ ['2004', 10, 7] ], out.data
+        out = datautil.tabular.pivot(td, 1, 0, 2, reducer='min')
+        assert out.data == [ ['2004', 9, 7] ], out.data
+
+    def test_bad_value(self):
+        td = datautil.tabular.TabularData(data=[ ['x', 2004, 'abc'] ])
+        try:
+            datautil.tabular.pivot(td, 1, 0, 2, reducer='sum')
+        except ValueError:
+            pass
+        else:
+            assert False, 'should have raised'
+
+class TestSelectColumns:
+    matrix = [ [ 0, 1, 2 ], [ 3, 4, 5 ] ]
+
+    def test_select_columns(self):
+        cols = [ 2, 0 ]
+        out = datautil.tabular.select_columns(self.matrix, cols)
+        # in ascending order (as always) without sorting cols
+        assert out == [ (0, 2), (3, 5) ], out
+        assert cols == [ 2, 0 ]
+        out = datautil.tabular.select_columns(self.matrix, [1])
+        assert out == [ (1,), (4,) ], out
+
+    def test_project(self):
+        td = datautil.tabular.TabularData(header=[ 'a', 'b', 'c' ],
+                data=self.matrix)
+        view = datautil.tabular.project(td, [ 'c', 'a' ])
+        assert view.header == [ 'c', 'a' ]
+        assert list(view) == [ (2, 0), (5, 3) ]
+        # view can be iterated again when the source is a list
+        assert len(list(view)) == 2
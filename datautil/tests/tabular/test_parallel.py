@@ -0,0 +1,63 @@
+import os
+import csv
+import tempfile
+from StringIO import StringIO
+
+import datautil.tabular
+from datautil.tabular import parallel
+
+
+class TestParallelCsv:
+    rows = [ [ str(ii), 'line\nbreak "%s"' % ii if ii % 7 == 0 else 'x',
+        str(ii * 2) ] for ii in range(200) ]
+
+    def setUp(self):
+        fo = StringIO()
+        datautil.tabular.CsvWriter().write(
+            datautil.tabular.TabularData(header=['a', 'b', 'c'],
+                data=self.rows), fo)
+        self.raw = fo.getvalue()
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        os.write(fd, self.raw)
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_record_offsets(self):
+        fo = open(self.path, 'rb')
+        offsets = parallel.record_offsets(fo, 10)
+        fo.close()
+        assert offsets[0] == 0
+        assert offsets[-1] == len(self.raw)
+        # every range must contain whole records
+        count = 0
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            chunk = self.raw[start:end]
+            assert chunk.endswith('\n')
+            count += len(list(csv.reader(StringIO(chunk))))
+        assert count == len(self.rows) + 1
+
+    def test_read_parallel(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(self.path, parallel=2)
+        assert tab.header == [ 'a', 'b', 'c' ]
+        assert tab.data == self.rows
+
+    def test_columns_parallel(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(self.path, parallel=2, columns=['c', 'a'])
+        assert tab.header == [ 'c', 'a' ]
+        assert tab.data == [ [ row[2], row[0] ] for row in self.rows ]
+
+    def test_where_parallel(self):
+        from datautil.tabular.filters import Col
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(self.path, parallel=2, columns=['b'],
+                where=Col('c', int).between(10, 20))
+        assert tab.data == [ [ row[1] ] for row in self.rows[5:11] ], tab.data
+
+    def test_stream_parallel(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(self.path, parallel=2, stream=True)
+        assert list(tab) == self.rows
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+from datautil.tabular import TabularData, CsvWriter, profile
+from datautil.tabular.profiling import HyperLogLog, ColumnProfile, \
+    profile_csv
+
+
+class TestProfile:
+    td = TabularData(header=['name', 'value'],
+            data=[
+                ['x', '1'],
+                ['y', '2,000'],
+                ['x', '-'],
+                ['x', None],
+                ['z', '3'],
+                ['w'],
+            ])
+
+    def test_profile(self):
+        prof = profile(self.td)
+        assert prof.nrows == 6
+        name = prof['name']
+        assert name.count == 6 and name.nulls == 0
+        assert name.numeric_count == 0
+        assert (name.min, name.max) == ('w', 'z')
+        assert name.distinct == 4, name.distinct
+        assert name.top(1) == [ ('x', 3) ], name.top()
+
+        value = prof[1]
+        assert value.name == 'value'
+        assert value.count == 6
+        assert value.nulls == 2, value.nulls # None and missing
+        assert value.placeholders == 1
+        assert value.numeric_count == 3
+        assert (value.min, value.max) == (1, 2000)
+        assert value.mean == 668.0, value.mean
+        assert value.variance == 1330669.0, value.variance
+        assert value.quantiles([0, 0.5, 0.75, 1]) == [ 1, 3, 1001.5, 2000 ]
+        assert prof.as_dict()['columns'][1]['mean'] == 668.0
+
+    def test_merge(self):
+        rows = [ [ ii % 7, 'v%s' % (ii % 3) ] for ii in range(100) ]
+        whole = profile(rows, sample_size=1000)
+        part = profile(rows[:30], sample_size=1000)
+        part.merge(profile(rows[30:], sample_size=1000))
+        for ii in range(2):
+            exp = whole[ii].as_dict()
+            out = part[ii].as_dict()
+            for key in [ 'mean', 'variance' ]:
+                if exp[key] is not None:
+                    assert abs(out[key] - exp[key]) < 1e-9, key
+                    del out[key], exp[key]
+            assert out == exp, (out, exp)
+
+    def test_merge_new_columns(self):
+        prof = profile([ [1] ])
+        prof.merge(profile([ [2, 3] ]))
+        assert prof.nrows == 2
+        assert prof[1].count == 2 and prof[1].nulls == 1
+
+    def test_top_k_bounded(self):
+        column = ColumnProfile(top_k=2)
+        for ii in range(1000):
+            column.add(ii % 100 if ii % 2 else 'common')
+        assert len(column.counters) <= 20
+        assert column.top(1)[0][0] == 'common'
+
+    def test_profile_csv(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        data = [ [ str(ii), str(ii % 5) ] for ii in range(200) ]
+        CsvWriter().write(TabularData(header=['a', 'b'], data=data),
+                open(path, 'wb'))
+        try:
+            prof = profile_csv(path, processes=2)
+        finally:
+            os.remove(path)
+        assert prof.header == [ 'a', 'b' ]
+        assert prof.nrows == 200
+        assert prof['a'].mean == 99.5
+        assert prof['b'].distinct == 5
+        assert (prof['a'].min, prof['a'].max) == (0, 199)
+
+
+class TestHyperLogLog:
+    def test_estimate(self):
+        hll = HyperLogLog(12)
+        for ii in range(20000):
+            hll.add(str(ii))
+        assert abs(len(hll) - 20000) < 20000 * 0.05, len(hll)
+        other = HyperLogLog(12)
+        for ii in range(10000, 30000):
+            other.add(str(ii))
+        hll.merge(other)
+        assert abs(len(hll) - 30000) < 30000 * 0.05, len(hll)
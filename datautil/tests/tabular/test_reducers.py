@@ -0,0 +1,43 @@
+from datautil.tabular.reducers import *
+
+
+class TestReducers:
+    values = [ 3, '1,000', None, '-', 2.5 ]
+
+    def _reduce(self, name, values):
+        acc = get_reducer(name)()
+        for value in values:
+            acc.add(value)
+        return acc
+
+    def test_reducers(self):
+        assert self._reduce('sum', self.values).result() == 1005.5
+        assert self._reduce('count', self.values).result() == 5
+        assert self._reduce('mean', self.values).result() == 1005.5 / 3
+        assert self._reduce('min', [ 3, None, 1 ]).result() == 1
+        assert self._reduce('max', [ 3, None, 1 ]).result() == 3
+        assert self._reduce('first', [ None, 1 ]).result() is None
+        assert self._reduce('last', [ 1, 2 ]).result() == 2
+        assert self._reduce('mean', []).result() is None
+
+    def test_min_max_strings(self):
+        # compared as numbers (not strings) and blanks are ignored
+        values = [ '9', '10', '', '-', ' 7 ', None ]
+        assert self._reduce('max', values).result() == 10
+        assert self._reduce('min', values).result() == 7
+        assert self._reduce('min', [ '', None ]).result() is None
+
+    def test_merge(self):
+        for name in REDUCERS:
+            acc = self._reduce(name, [ 1, 2 ])
+            acc.merge(self._reduce(name, [ 3 ]))
+            exp = self._reduce(name, [ 1, 2, 3 ]).result()
+            assert acc.result() == exp, (name, acc.result(), exp)
+
+    def test_unknown(self):
+        try:
+            get_reducer('median')
+        except ValueError:
+            pass
+        else:
+            assert False
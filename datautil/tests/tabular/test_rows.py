@@ -0,0 +1,59 @@
+import cPickle
+
+from datautil.tabular import TabularData
+from datautil.tabular.rows import *
+
+
+class TestRowClass:
+    Row = row_class(['Name', 'Year', 'my value', 'get'])
+
+    def test_access(self):
+        row = self.Row(['x', 2004, 1, 'g'])
+        assert row[1] == 2004
+        assert row[-1] == 'g'
+        assert row.get('Year') == 2004
+        assert row.get('my value') == 1
+        assert row.get('missing', 'default') == 'default'
+        assert row.Name == 'x'
+        assert row.Year == 2004
+        # clashes with methods are not turned into attributes
+        assert row.get('get') == 'g'
+        assert row == ('x', 2004, 1, 'g')
+        assert row.as_dict()['Name'] == 'x'
+        # still a sequence
+        assert row.index(2004) == 1
+        assert row.count('x') == 1
+
+    def test_compact(self):
+        row = self.Row(['x', 2004, 1, 'g'])
+        assert not hasattr(row, '__dict__')
+        assert self.Row.field_index is \
+            self.Row(['y', 2005, 2, 'h']).field_index
+
+    def test_short_row(self):
+        row = self.Row(['x'])
+        assert row.get('Year') is None
+
+    def test_pickle(self):
+        row = self.Row(['x', 2004, 1, 'g'])
+        for protocol in [ 0, 2 ]:
+            out = cPickle.loads(cPickle.dumps([ row, row ], protocol))
+            assert out[0] == row
+            assert out[0].Year == 2004
+            assert out[0].get('my value') == 1
+            assert out[0].__class__.__name__ == 'Row'
+            assert out[0].__class__ is out[1].__class__
+
+
+class TestCompact:
+    def test_compact(self):
+        td = TabularData(header=['a', 'b'], data=[ [1, 2], [3, 4] ])
+        out = compact(td)
+        assert out.header == td.header
+        assert out.data == [ (1, 2), (3, 4) ]
+        assert out.data[1].b == 4
+
+    def test_compact_iterator(self):
+        td = TabularData(header=['a'], data=iter([ [1], [2] ]))
+        out = compact(td)
+        assert [ row.a for row in out.data ] == [ 1, 2 ]
@@ -0,0 +1,100 @@
+import datetime
+from StringIO import StringIO
+
+import datautil.tabular
+from datautil.tabular.schema import *
+
+
+class TestInferTypes:
+    rows = [
+        [ '1', '1.5', 'yes', '2004-01-02', 'abc', '' ],
+        [ '2', '3', 'No', '2005-12-31', '1', '' ],
+        [ '-', '', 'true', '', 'x', '' ],
+        ]
+
+    def test_infer_types(self):
+        out = infer_types(self.rows)
+        assert out == [ 'int', 'float', 'bool', 'date', 'string', 'string' ], out
+
+    def test_infer_python_values(self):
+        out = infer_types([ [ 1, 2.0, True, None ], [ 2, 3, False, u'x' ] ])
+        assert out == [ 'int', 'float', 'bool', 'string' ], out
+
+    def test_sample_size(self):
+        rows = [ ['1'], ['2'], ['abc'] ]
+        assert infer_types(rows, sample_size=2) == [ 'int' ]
+        assert infer_types(rows) == [ 'string' ]
+
+    def test_convert_columns(self):
+        types = infer_types(self.rows)
+        out = convert_columns(self.rows, types)
+        assert out[0] == [ 1, 1.5, True, datetime.date(2004, 1, 2), 'abc', '' ]
+        assert out[1] == [ 2, 3.0, False, datetime.date(2005, 12, 31), '1', '' ]
+        assert out[2] == [ None, None, True, None, 'x', '' ], out[2]
+
+    def test_convert_column_fallback(self):
+        out = convert_column([ '1', '1,030', ' 7 ', 'abc', ' - ' ], 'int')
+        assert out == [ 1, 1030, 7, 'abc', None ], out
+
+    def test_bool_blanks(self):
+        rows = [ [ 'true', 1 ], [ '', 2 ], [ 'no', '-' ] ]
+        types = infer_types(rows)
+        assert types == [ 'bool', 'int' ], types
+        out = convert_columns(rows, types)
+        assert out == [ [True, 1], [None, 2], [False, None] ], out
+        assert convert_column([ '-', True, False ], 'bool') == \
+            [ None, True, False ]
+
+    def test_compile_row_converter(self):
+        convert = compile_row_converter([ 'int', 'float' ])
+        assert convert([ '1', '2', 'extra' ]) == [ 1, 2.0, 'extra' ]
+        assert convert([ '1' ]) == [ 1 ]
+
+
+class TestReaderInferTypes:
+    csvdata = '''"year", "value", "name"
+2004, 1.5, x
+2005, , y
+'''
+
+    def test_csv(self):
+        reader = datautil.tabular.CsvReader()
+        tab = reader.read(StringIO(self.csvdata), infer_types=True)
+        assert reader.schema == [ 'int', 'float', 'string' ]
+        assert tab.schema == reader.schema
+        assert tab.data == [ [2004, 1.5, 'x'], [2005, None, 'y'] ], tab.data
+
+    def test_csv_stream(self):
+        reader = datautil.tabular.CsvReader()
+        reader.type_sample_size = 1
+        tab = reader.read(StringIO(self.csvdata), stream=True,
+                infer_types=True)
+        assert tab.schema == [ 'int', 'float', 'string' ]
+        assert list(tab) == [ [2004, 1.5, 'x'], [2005, None, 'y'] ]
+
+    def test_json(self):
+        reader = datautil.tabular.JsonReader()
+        indata = StringIO('{"header": ["a", "b"], "data": [["1", 2], ["3", 4]]}')
+        tab = reader.read(indata, infer_types=True)
+        assert tab.schema == [ 'int', 'int' ]
+        assert tab.data == [ [1, 2], [3, 4] ]
+
+    def test_json_nested_values(self):
+        reader = datautil.tabular.JsonReader()
+        indata = StringIO('{"header": ["a", "b", "c"], "data": '
+            '[[[1, 2], {"x": 1}, "1"], ["y", null, [3]]]}')
+        tab = reader.read(indata, infer_types=True)
+        assert tab.schema == [ 'string', 'string', 'string' ], tab.schema
+        assert tab.data[0] == [ [1, 2], {'x': 1}, '1' ], tab.data
+        # nested values in a typed column are left unchanged
+        assert convert_column([ '1', [2], {} ], 'int') == [ 1, [2], {} ]
+        assert infer_types([ [ '1', [1, 2] ], [ '2', '' ] ]) == \
+            [ 'int', 'string' ]
+
+    def test_html(self):
+        reader = datautil.tabular.HtmlReader()
+        indata = StringIO('<table><tr><td>1</td><td>2.5</td></tr>'
+                '<tr><td>1983</td></tr></table>')
+        tab = reader.read(indata, infer_types=True)
+        assert tab.schema == [ 'int', 'float' ]
+        assert tab.data == [ [1, 2.5], [1983] ], tab.data
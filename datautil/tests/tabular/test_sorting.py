@@ -0,0 +1,53 @@
+from datautil.tabular import TabularData, CsvReader, sort_table
+from datautil.tabular.rows import compact
+from StringIO import StringIO
+
+
+class TestSortTable:
+    td = TabularData(header=['name', 'year', 'value'], data=[
+        ['b', '1990', '10'],
+        ['a', '2000', '9'],
+        ['b', '1985', '100'],
+        ['a', '1990', '1,000'],
+        ])
+
+    def test_single_column(self):
+        out = sort_table(self.td, 'name')
+        assert out.header == self.td.header
+        # stable
+        assert [ row[1] for row in out ] == [ '2000', '1990', '1990', '1985' ]
+
+    def test_directions(self):
+        out = sort_table(self.td, [ 'name', ('year', 'desc') ])
+        assert [ row[:2] for row in out ] == [ ['a', '2000'], ['a', '1990'],
+            ['b', '1990'], ['b', '1985'] ], list(out)
+
+    def test_keyfunc(self):
+        out = sort_table(self.td, [ ('value', 'desc', 'float') ])
+        assert [ row[2] for row in out ] == [ '1,000', '100', '10', '9' ]
+        out = sort_table(self.td, [ (2, 'asc', 'float') ])
+        assert [ row[2] for row in out ] == [ '9', '10', '100', '1,000' ]
+
+    def test_dates(self):
+        td = TabularData(data=[ ['1890'], ['c. 1850'], ['-200'], ['1870'] ])
+        out = sort_table(td, [ (0, 'asc', 'date') ])
+        assert [ row[0] for row in out ] == [ '-200', 'c. 1850', '1870', '1890' ], list(out)
+
+    def test_external(self):
+        data = [ [ str(ii % 17), ii ] for ii in range(200) ]
+        out = sort_table(data, [ (0, 'desc'), (1, 'asc') ], max_rows=10)
+        exp = sorted(data, key=lambda row: (row[0], -row[1]), reverse=True)
+        assert list(out) == exp
+
+    def test_external_compact_rows(self):
+        td = compact(TabularData(header=['k', 'v'],
+            data=[ [ ii % 7, ii ] for ii in range(50) ]))
+        out = list(sort_table(td, 'k', max_rows=10))
+        exp = sorted([ list(row) for row in td.data ], key=lambda row: row[0])
+        assert out == exp, out
+
+    def test_stream(self):
+        csvdata = 'a,b\n3,30\n1,10\n2,20\n'
+        table = CsvReader().read(StringIO(csvdata), stream=True)
+        out = sort_table(table, [ ('a', 'asc', int) ], max_rows=1)
+        assert list(out) == [ ['1', '10'], ['2', '20'], ['3', '30'] ]
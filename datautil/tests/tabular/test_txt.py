@@ -89,3 +89,19 @@ class TestTxtWriter:
         print self.expected
         assert self.expected == out, out
 
+
+    def test_stream(self):
+        rows = iter([ range(3), [10, 11, 12], [100] ])
+        writer = TxtWriter(sample_size=1)
+        lines = writer.iter_lines(TabularData(data=rows))
+        # only the sample is read before output starts
+        assert lines.next() == '+-+-+-+\n'
+        assert lines.next() == '|0|1|2|\n'
+        assert rows.next() == [10, 11, 12]
+        assert list(lines)[-2] == '|1| | |\n'
+
+    def test_prescan(self):
+        indata = TabularData(data=[ [1, 2], [333, 4] ], header=['a', 'b'])
+        out = TxtWriter(sample_size=1, prescan=True).write_str(indata)
+        assert out.splitlines()[5] == '|333|4|', out
+        assert TxtWriter().write_str(TabularData()) == ''
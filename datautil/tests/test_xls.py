@@ -1,6 +1,7 @@
 import pkg_resources
 
 import datautil.tabular
+from datautil.tabular.filters import Col
 
 class TestXlsReader:
 
@@ -12,3 +13,11 @@ class TestXlsReader:
         assert tab.data[0][0] == 1850
         assert tab.data[19][1] == 12.3
 
+
+    def test_where(self):
+        fo = pkg_resources.resource_stream('datautil',
+            'tests/data/xls_reader_test.xls')
+        reader = datautil.tabular.XlsReader(fo)
+        tab = reader.read(where=Col(1) >= 13.0)
+        assert [ row[0] for row in tab.data ] == [ 1854, 1855, 1856, 1857,
+            1867, 1868 ], tab.data